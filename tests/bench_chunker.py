@@ -0,0 +1,87 @@
+"""cost of splitting long text into chunks, by old recursive `split_line` and by `iter_chunks`.
+
+    python tests/bench_chunker.py [--size MB] [--limit N]
+
+old `split_line` copies rest of text per chunk and recurses per chunk,
+so it is quadratic and fails over `sys.getrecursionlimit()` chunks. it is run on `--old-size` only.
+`iter_chunks` is run on `--size` MB of traceback like lines, from str, from `StringIO` and from file.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+from io import StringIO
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'virtual-market-dev'))
+
+from lib.util import iter_chunks  # noqa: E402
+
+
+def old_split_line(string: str, num: int):
+    string, num = str(string), int(num)
+    if len(string) <= num:
+        yield string
+        return
+    str1, str2 = string[:num], string[num:]
+    str1_split = str1.splitlines(keepends=True)
+    if len(str1_split) > 1:
+        str1 = ''.join(str1_split[:-1])
+        str2 = str1_split[-1] + str2
+    yield str1
+    if len(str2) > num:
+        yield from old_split_line(str2, num)
+    else:
+        yield str2
+
+
+def make_text(size: int)-> str:
+    lines = []
+    length = 0
+    i = 0
+    while length < size:
+        line = f'  File "/app/lib/module_{i % 97}.py", line {i}, in func_{i % 13}\n    value = compute({i})\n'
+        if i % 50 == 0:
+            line += '```py\n' if i % 100 == 0 else '```\n'
+        lines.append(line)
+        length += len(line)
+        i += 1
+    return ''.join(lines)[:size]
+
+
+def measure(name: str, func, text: str):
+    start = perf_counter()
+    count = 0
+    for _ in func():
+        count += 1
+    seconds = perf_counter() - start
+    print(f'{name:24s} {len(text) / 1e6:6.2f}MB {count:8d} chunks {seconds * 1000:9.1f}ms {len(text) / seconds / 1e6:8.1f}MB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=float, default=10.0, help='MB of text for iter_chunks')
+    parser.add_argument('--old-size', type=float, default=0.5, help='MB of text for old split_line')
+    parser.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args()
+
+    small = make_text(int(args.old_size * 1e6))
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), len(small) // args.limit * 2 + 100))
+    measure('old split_line', lambda: old_split_line(small, args.limit), small)
+    measure('iter_chunks', lambda: iter_chunks(small, args.limit), small)
+
+    text = make_text(int(args.size * 1e6))
+    measure('iter_chunks', lambda: iter_chunks(text, args.limit), text)
+    measure('iter_chunks fences', lambda: iter_chunks(text, args.limit, fences=True), text)
+    measure('iter_chunks StringIO', lambda: iter_chunks(StringIO(text), args.limit), text)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'text.txt'
+        path.write_text(text)
+        with path.open() as file:
+            measure('iter_chunks file', lambda: iter_chunks(file, args.limit), text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""query and read of a key of `Currency.ext`, before and after it is promoted to indexed column.
+
+    python tests/bench_currency_ext.py [--url URL] [--currencies N] [--queries Q]
+
+N currencies have ext with key `tier` (100 distinct values) and some other keys.
+`tier` is promoted by `promote_key()` and `migrate_hot_keys()` between before and after.
+default url is in-memory sqlite.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'virtual-market-dev'))
+
+from sqlalchemy import Integer, insert, select  # noqa: E402
+
+from lib.database import Database, migrate_hot_keys, shcema  # noqa: E402
+from lib.market import Currency  # noqa: E402
+
+currency = shcema.Currency.__table__
+
+
+async def measure(db: Database, queries: int, label: str):
+    tiers = [random.randrange(100) for _ in range(queries)]
+    start = perf_counter()
+    found = 0
+    for tier in tiers:
+        result = await db.execute(Currency.select().where(Currency.ext_condition(db, 'tier', tier)))
+        found += len(result.all())
+    query = (perf_counter() - start) / queries
+
+    column = shcema.Currency.hot_keys.get('tier')
+    start = perf_counter()
+    result = await db.execute(select(currency.c.c_id, currency.c.ext['tier'].as_integer() if column is None else column))
+    rows = len(result.all())
+    scan = perf_counter() - start
+
+    result = await db.execute(Currency.select().where(currency.c.c_id <= 1000))
+    currencies = [Currency.from_schema(db, row) for row in result]
+    start = perf_counter()
+    for c in currencies:
+        c.get_ext('tier')
+    read = (perf_counter() - start) / len(currencies)
+    print(
+        f'{label}: find {query * 1000:8.2f}ms/query ({found // queries} rows)  '
+        f'scan {rows} rows {scan * 1000:8.1f}ms  get_ext {read * 1e6:6.2f}us'
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url')
+    parser.add_argument('--currencies', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+    db = Database(args.url or 'sqlite:///:memory:')
+    await db.create_all()
+    async with db.transaction() as conn:
+        await conn.execute(insert(currency), [
+            {
+                'c_id': i,
+                'onwer_id': i,
+                'bank_id': 1,
+                'name': f'currency {i}',
+                'code': f'{i:03d}'[-3:],
+                'rate': 1,
+                'amount': 0,
+                'ext': {
+                    'tier': i % 100,
+                    'region': f'region {i % 50}',
+                    'description': 'x' * 200,
+                    'tags': [f'tag {j}' for j in range(10)],
+                },
+            }
+            for i in range(1, args.currencies + 1)
+        ])
+
+    await measure(db, args.queries, 'before')
+    shcema.promote_key('tier', Integer)
+    start = perf_counter()
+    filled = await migrate_hot_keys(db)
+    print(f'migrate: {(perf_counter() - start) * 1000:.1f}ms {filled}')
+    await measure(db, args.queries, 'after ')
+    await db.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
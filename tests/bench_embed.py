@@ -0,0 +1,55 @@
+"""cost of copying embed, by `to_dict()` and `from_dict()` (old `Embed.copy()`) and by fast `Embed.copy()`.
+
+    python tests/bench_embed.py [--number N]
+
+`default` is embed of `Bot.default_embed` (which is built from template now), `fields` has footer, author and 24 fields.
+`success` is embed of `Context.success()`, built by `Embed()` before and from template now.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from timeit import repeat
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'virtual-market-dev'))
+
+from discord import Colour  # noqa: E402
+
+from lib import Embed, EmbedTemplate  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=100000)
+    args = parser.parse_args()
+
+    default = Embed(color=0x3498db)
+    fields = Embed(title='traceback', description='x' * 1000, color=0x3498db)
+    fields.set_footer(text='footer').set_author(name='author')
+    for i in range(24):
+        fields.add_field(name=f'field {i}', value='y' * 500, inline=False)
+    template = EmbedTemplate(Embed(colour=Colour.green()), '✅ ')
+    default_template = EmbedTemplate(default)
+
+    cases = [
+        ('default', 'old', lambda: Embed.from_dict(default.to_dict())),
+        ('default', 'new', default.copy),
+        ('default', 'template', default_template.build),
+        ('fields', 'old', lambda: Embed.from_dict(fields.to_dict())),
+        ('fields', 'new', fields.copy),
+        ('success', 'construct', lambda: Embed(title='✅ done', description='', colour=Colour.green())),
+        ('success', 'template', lambda: template.build(title='done', description='')),
+    ]
+    for name, kind, func in cases:
+        seconds = min(repeat(func, number=args.number, repeat=5)) / args.number
+        line = f'{name:8s} {kind:10s} {seconds * 1e6:8.2f}us'
+        if kind in ('old', 'construct'):
+            before = seconds
+        else:
+            line += f'  x{before / seconds:.1f}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
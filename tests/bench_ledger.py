@@ -0,0 +1,83 @@
+"""throughput and latency of `Bank.move` with group commit at some batch sizes.
+
+    python tests/bench_ledger.py [--url URL] [--accounts N] [--transfers K] [--concurrency C]
+
+default url is in-memory sqlite.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+from pathlib import Path
+from statistics import quantiles
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'virtual-market-dev'))
+
+from lib.database import Database  # noqa: E402
+from lib.market import Account, Bank  # noqa: E402
+
+
+async def setup(url: str, accounts: int)-> tuple[Database, Bank, list[Account]]:
+    db = Database(url)
+    await db.create_all()
+    async with db.unit_of_work():
+        bank = Bank.from_new(db, {'owner_id': 0, 'name': 'bench'})
+    async with db.unit_of_work():
+        accs = [
+            Account.from_new(db, owner_id=i, bank_id=bank.id, c_id=1, balance=10 ** 12)
+            for i in range(accounts)
+        ]
+    return db, bank, accs
+
+
+async def run(
+    db: Database,
+    bank: Bank,
+    accs: list[Account],
+    transfers: int,
+    concurrency: int,
+    max_batch: int,
+    window: float,
+):
+    db.ledger.max_batch = max_batch
+    db.ledger.window = window
+    db.ledger.stats.reset()
+    latencies = []
+
+    async def client():
+        for _ in range(transfers // concurrency):
+            before, after = random.sample(accs, 2)
+            start = perf_counter()
+            await bank.move(before, after, 1)
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    transfers = len(latencies)
+    elapsed = perf_counter() - start
+    p50, p99 = (q * 1000 for q in quantiles(latencies, n=100)[49::49])
+    print(
+        f'max_batch={max_batch:5d} window={window * 1000:4.1f}ms '
+        f'{transfers / elapsed:9.0f} transfers/s  p50 {p50:7.2f}ms  p99 {p99:7.2f}ms  '
+        f'avg batch {db.ledger.stats.average_batch:.1f}'
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url')
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--transfers', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=500)
+    args = parser.parse_args()
+    db, bank, accs = await setup(args.url or 'sqlite:///:memory:', args.accounts)
+    for max_batch, window in ((1, 0.0), (10, 0.002), (100, 0.002), (1000, 0.002)):
+        await run(db, bank, accs, args.transfers, args.concurrency, max_batch, window)
+    await db.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,337 @@
+"""benchmark suite of market core, with synthetic data in in-process database.
+
+    python tests/bench_market.py [--accounts N] [--currencies M] [--transfers K] [--output FILE]
+    python tests/bench_market.py --baseline FILE [--threshold 0.1] [--repeat 5] [--warmup 1]
+
+results are written as json to `--output` (stdout if it is not given). save it as baseline,
+and later runs with `--baseline` compare `ops_per_sec` of each benchmark with it.
+each benchmark runs `--warmup` times unmeasured, then `--repeat` times, and best run is kept
+with `spread`, relative distance of slowest run to best one.
+benchmark is regressed if it is slower than baseline by more than `--threshold` and than sum of both spreads,
+so noisy benchmarks are not reported by chance. exit status is 1 if some benchmark is regressed.
+default url is in-memory sqlite, so this needs no network.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from statistics import quantiles
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'virtual-market-dev'))
+
+import sqlalchemy  # noqa: E402
+
+from lib.database import Database, rebuild_summary  # noqa: E402
+from lib.market import (  # noqa: E402
+    BUY, SELL, Account, AccountCache, AccountColumns, Bank, Currency, Order, OrderBook, cross_rates,
+)
+
+Result = dict[str, Any]
+
+
+def result(ops: int, seconds: float, latencies: Optional[list[float]]= None)-> Result:
+    data: Result= {'ops': ops, 'seconds': round(seconds, 6), 'ops_per_sec': round(ops / seconds, 1)}
+    if latencies is not None and len(latencies) > 1:
+        cuts = quantiles(latencies, n=100, method='inclusive')
+        data['p50_ms'] = round(cuts[49] * 1000, 3)
+        data['p99_ms'] = round(cuts[98] * 1000, 3)
+    return data
+
+
+class Dataset:
+    """`currencies` currencies and `accounts` accounts spread over them, in one bank."""
+
+    def __init__(self, db: Database, bank: Bank, currencies: list[Currency], accounts: list[Account]):
+        self.db = db
+        self.bank = bank
+        self.currencies = currencies
+        self.accounts = accounts
+        self.by_currency: dict[int, list[Account]]= {}
+        for account in accounts:
+            self.by_currency.setdefault(account.c_id, []).append(account)
+
+    @classmethod
+    async def build(cls, url: str, accounts: int, currencies: int)-> Dataset:
+        db = Database(url)
+        await db.create_all()
+        async with db.unit_of_work():
+            bank = Bank.from_new(db, {'owner_id': 0, 'name': 'bench'})
+        async with db.unit_of_work():
+            currs = [
+                Currency.from_new(
+                    db,
+                    c_id=c_id,
+                    owner_id=c_id,
+                    bank_id=bank.id,
+                    name=f'currency {c_id}',
+                    code=f'C{c_id:02d}'[-3:],
+                    rate=str(random.randint(1, 10000) / 100),
+                    amount=10 ** 15,
+                )
+                for c_id in range(1, currencies + 1)
+            ]
+        async with db.unit_of_work():
+            accs = [
+                Account.from_new(db, owner_id=i, bank_id=bank.id, c_id=i % currencies + 1, balance=10 ** 12)
+                for i in range(accounts)
+            ]
+        return cls(db, bank, currs, accs)
+
+
+async def bench_transfer(data: Dataset, transfers: int, concurrency: int)-> Result:
+    """`Bank.move` in same currency, from `concurrency` tasks at once."""
+    groups = [group for group in data.by_currency.values() if len(group) > 1]
+    latencies: list[float]= []
+
+    async def client():
+        for _ in range(transfers // concurrency):
+            before, after = random.sample(random.choice(groups), 2)
+            start = perf_counter()
+            await data.bank.move(before, after, 1)
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return result(len(latencies), perf_counter() - start, latencies)
+
+
+async def bench_exchange_transfer(data: Dataset, transfers: int, concurrency: int)-> Result:
+    """`Bank.move` with `exchange=True` between random accounts."""
+    latencies: list[float]= []
+
+    async def client():
+        for _ in range(transfers // concurrency):
+            before, after = random.sample(data.accounts, 2)
+            start = perf_counter()
+            await data.bank.move(before, after, 1000, exchange=True)
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return result(len(latencies), perf_counter() - start, latencies)
+
+
+def bench_convert(data: Dataset, count: int)-> Result:
+    c_ids = [currency.c_id for currency in data.currencies]
+    pairs = [(random.randint(1, 10 ** 9), *random.sample(c_ids, 2)) for _ in range(count)]
+    start = perf_counter()
+    for amount, src, dst in pairs:
+        cross_rates.convert(amount, src, dst)
+    return result(count, perf_counter() - start)
+
+
+def bench_convert_many(data: Dataset, count: int)-> Result:
+    src, dst = data.currencies[0].c_id, data.currencies[-1].c_id
+    amounts = [random.randint(1, 10 ** 9) for _ in range(count)]
+    start = perf_counter()
+    cross_rates.convert_many(amounts, src, dst)
+    return result(count, perf_counter() - start)
+
+
+async def bench_lookup_cold(data: Dataset, count: int)-> Result:
+    """`AccountCache.get` of accounts which are not cached, so each is a query."""
+    cache = AccountCache(data.db, max_size=len(data.accounts))
+    ids = random.sample([account.id for account in data.accounts], min(count, len(data.accounts)))
+    latencies: list[float]= []
+    start = perf_counter()
+    for id in ids:
+        t = perf_counter()
+        await cache.get(id)
+        latencies.append(perf_counter() - t)
+    return result(len(ids), perf_counter() - start, latencies)
+
+
+async def bench_lookup_cached(data: Dataset, count: int)-> Result:
+    cache = AccountCache(data.db, max_size=len(data.accounts))
+    for account in data.accounts:
+        cache.add(account)
+    ids = [random.choice(data.accounts).id for _ in range(count)]
+    start = perf_counter()
+    for id in ids:
+        (await cache.get(id)).balance
+    return result(count, perf_counter() - start)
+
+
+def bench_lookup_columnar(data: Dataset, count: int)-> Result:
+    columns = AccountColumns.from_accounts(data.accounts)
+    ids = [random.choice(data.accounts).id for _ in range(count)]
+    start = perf_counter()
+    for id in ids:
+        columns.balance(id)
+    return result(count, perf_counter() - start)
+
+
+def bench_order_match(orders: int, resting: int)-> Result:
+    """place `orders` to book of `resting` orders. 20% of them cross the spread."""
+    mid = 100_000
+    book = OrderBook(1, 2)
+    accounts = (Account(None, id=1, owner_id=0, bank_id=0, c_id=1), Account(None, id=2, owner_id=0, bank_id=0, c_id=2))
+    for i in range(resting):
+        if i % 2:
+            book.place(Order(BUY, mid - random.randint(1, 5000), random.randint(1, 100), *accounts))
+        else:
+            book.place(Order(SELL, mid + random.randint(1, 5000), random.randint(1, 100), *accounts))
+    new = []
+    for _ in range(orders):
+        side = random.choice((BUY, SELL))
+        offset = random.randint(-100, 5000) if random.random() < 0.2 else random.randint(1, 5000)
+        price = mid + offset if side == BUY else mid - offset
+        new.append(Order(side, max(price, 1), random.randint(1, 100), *accounts))
+    fills = 0
+    start = perf_counter()
+    for order in new:
+        fills += len(book.place(order))
+    data = result(orders, perf_counter() - start)
+    data['fills'] = fills
+    return data
+
+
+async def bench_aggregate(data: Dataset, count: int)-> Result:
+    """`Bank.get_log_amount` of last day, which is what periodic report reads."""
+    since = datetime.now(timezone.utc) - timedelta(days=1)
+    latencies: list[float]= []
+    start = perf_counter()
+    for _ in range(count):
+        t = perf_counter()
+        await data.bank.get_log_amount(since)
+        latencies.append(perf_counter() - t)
+    return result(count, perf_counter() - start, latencies)
+
+
+async def bench_rebuild_summary(data: Dataset)-> Result:
+    """regenerate summary from whole ledger. ops is count of ledger entries."""
+    await data.db.ledger.drain()
+    start = perf_counter()
+    await rebuild_summary(data.db)
+    return result(data.db.ledger.stats.transfers * 2, perf_counter() - start)
+
+
+async def best_of(repeat: int, warmup: int, func: Callable[[], Awaitable[Result]])-> Result:
+    """best of `repeat` runs after `warmup` runs, with `spread` of them."""
+    for _ in range(warmup):
+        await func()
+    results = [await func() for _ in range(repeat)]
+    best = max(results, key=lambda r: r['ops_per_sec'])
+    slowest = min(r['ops_per_sec'] for r in results)
+    best['spread'] = round(1 - slowest / best['ops_per_sec'], 4)
+    return best
+
+
+async def run(args: argparse.Namespace, url: str)-> dict[str, Any]:
+    random.seed(args.seed)
+    data = await Dataset.build(url, args.accounts, args.currencies)
+    k, repeat = args.transfers, args.repeat
+
+    async def sync(func, *a):
+        return func(*a)
+
+    benchmarks: list[tuple[str, Callable[[], Awaitable[Result]]]]= [
+        ('transfer', lambda: bench_transfer(data, k, args.concurrency)),
+        ('exchange_transfer', lambda: bench_exchange_transfer(data, k, args.concurrency)),
+        ('convert', lambda: sync(bench_convert, data, k * 10)),
+        ('convert_many', lambda: sync(bench_convert_many, data, k * 10)),
+        ('lookup_cold', lambda: bench_lookup_cold(data, k)),
+        ('lookup_cached', lambda: bench_lookup_cached(data, k * 10)),
+        ('lookup_columnar', lambda: sync(bench_lookup_columnar, data, k * 10)),
+        ('order_match', lambda: sync(bench_order_match, k * 10, args.resting)),
+        ('aggregate', lambda: bench_aggregate(data, 100)),
+        ('rebuild_summary', lambda: bench_rebuild_summary(data)),
+    ]
+    results: dict[str, Result]= {}
+    try:
+        for name, func in benchmarks:
+            if args.only and name not in args.only:
+                continue
+            results[name] = await best_of(repeat, args.warmup, func)
+            print(f'{name:20s} {results[name]["ops_per_sec"]:14,.0f} ops/s', file=sys.stderr)
+    finally:
+        await data.db.close()
+    return {
+        'meta': {
+            'at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'dialect': url.split(':', 1)[0],
+            'params': {
+                'accounts': args.accounts,
+                'currencies': args.currencies,
+                'transfers': args.transfers,
+                'concurrency': args.concurrency,
+                'resting': args.resting,
+                'repeat': args.repeat,
+                'warmup': args.warmup,
+                'seed': args.seed,
+            },
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float)-> list[str]:
+    """print ratio of each benchmark to baseline, and return names of regressed ones.
+    allowed slowdown is `threshold`, or sum of spreads of both runs if it is larger.
+    """
+    if current['meta']['params'] != baseline['meta']['params']:
+        print('warning: params are different from baseline', file=sys.stderr)
+    regressions = []
+    for name, now in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f'{name:20s} (not in baseline)', file=sys.stderr)
+            continue
+        ratio = now['ops_per_sec'] / before['ops_per_sec']
+        allowed = max(threshold, now.get('spread', 0.0) + before.get('spread', 0.0))
+        mark = ''
+        if ratio < 1 - allowed:
+            regressions.append(name)
+            mark = '  REGRESSION'
+        print(
+            f'{name:20s} {before["ops_per_sec"]:14,.0f} -> {now["ops_per_sec"]:14,.0f} ops/s'
+            f'  x{ratio:.2f} (allowed x{1 - allowed:.2f}){mark}',
+            file=sys.stderr,
+        )
+    return regressions
+
+
+async def main()-> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url')
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--currencies', type=int, default=10)
+    parser.add_argument('--transfers', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--resting', type=int, default=100000, help='resting orders of book for order_match')
+    parser.add_argument('--repeat', type=int, default=5, help='keep best of this count of runs')
+    parser.add_argument('--warmup', type=int, default=1, help='unmeasured runs before them')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', type=lambda s: s.split(','), help='comma separated names of benchmarks')
+    parser.add_argument('--output', type=Path)
+    parser.add_argument('--baseline', type=Path)
+    parser.add_argument('--threshold', type=float, default=0.1, help='least allowed slowdown to baseline')
+    args = parser.parse_args()
+
+    report = await run(args, args.url or 'sqlite:///:memory:')
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + '\n')
+    if args.baseline is not None:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.threshold)
+        if regressions:
+            print(f'regressed: {", ".join(regressions)}', file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,59 @@
+"""bytes per account of each representation at 100k accounts.
+
+    python tests/bench_memory.py [--accounts N]
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'virtual-market-dev'))
+
+from lib.market import Account, AccountColumns  # noqa: E402
+
+
+class DictAccount:
+    """same attributes as `Account` without `__slots__`."""
+
+    def __init__(self, id, owner_id, bank_id, c_id, balance):
+        self._db = None
+        self.id = id
+        self.owner_id = owner_id
+        self.bank_id = bank_id
+        self.c_id = c_id
+        self.balance = balance
+        self.created_at = None
+        self.ext = {}
+        self._cache = None
+        self._cache_dirty = False
+
+
+def measure(name: str, build, n: int):
+    gc.collect()
+    tracemalloc.start()
+    obj = build(n)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:10s} {size / n:8.1f} bytes/account  {size / 2 ** 20:7.1f} MiB')
+    return obj
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts', type=int, default=100_000)
+    args = parser.parse_args()
+    big = 10 ** 17  # like discord user id
+    measure('dict', lambda n: [DictAccount(i, big + i, 1, 1, i * 100) for i in range(n)], args.accounts)
+    slotted = measure(
+        'slots',
+        lambda n: [Account(None, id=i, owner_id=big + i, bank_id=1, c_id=1, balance=i * 100) for i in range(n)],
+        args.accounts,
+    )
+    measure('columnar', lambda n: AccountColumns.from_accounts(slotted), args.accounts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""orders per second of `OrderBook` with 10k, 100k and 1M resting orders.
+
+    python tests/bench_orderbook.py [--orders M] [--sizes 10000,100000,1000000]
+
+each run places M orders to a book which already has given count of resting orders.
+20% of them cross the spread, 20% are cancels of resting orders, and others rest.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'virtual-market-dev'))
+
+from lib.market import BUY, SELL, Account, Order, OrderBook  # noqa: E402
+
+MID = 100_000
+ACCOUNTS = (Account(None, id=1, owner_id=0, bank_id=0, c_id=1), Account(None, id=2, owner_id=0, bank_id=0, c_id=2))
+
+
+def build(resting: int)-> tuple[OrderBook, list[int]]:
+    book = OrderBook(1, 2)
+    ids = []
+    for i in range(resting):
+        if i % 2:
+            order = Order(BUY, MID - random.randint(1, 5000), random.randint(1, 100), *ACCOUNTS)
+        else:
+            order = Order(SELL, MID + random.randint(1, 5000), random.randint(1, 100), *ACCOUNTS)
+        book.place(order)
+        ids.append(order.id)
+    return book, ids
+
+
+def run(resting: int, orders: int):
+    book, ids = build(resting)
+    ops = []
+    for _ in range(orders):
+        r = random.random()
+        side = random.choice((BUY, SELL))
+        if r < 0.2:
+            price = MID + 5000 if side == BUY else MID - 5000
+            ops.append(Order(side, price, random.randint(1, 50), *ACCOUNTS))
+        elif r < 0.4:
+            ops.append(random.choice(ids))
+        else:
+            offset = random.randint(1, 5000)
+            ops.append(Order(side, MID - offset if side == BUY else MID + offset, random.randint(1, 100), *ACCOUNTS))
+    fills = 0
+    start = perf_counter()
+    for op in ops:
+        if op.__class__ is int:
+            book.cancel(op)
+        else:
+            fills += len(book.place(op))
+    elapsed = perf_counter() - start
+    print(f'resting={resting:8d} {orders / elapsed:10.0f} orders/s  fills={fills}  left={len(book)}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    args = parser.parse_args()
+    for size in map(int, args.sizes.split(',')):
+        run(size, args.orders)
+
+
+if __name__ == '__main__':
+    main()
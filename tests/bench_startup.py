@@ -0,0 +1,61 @@
+"""startup time of market state, full reload from database vs snapshot and log replay.
+
+    python tests/bench_startup.py [--url URL] [--accounts N] [--transfers K]
+
+K transfers are made after snapshot, so they are replayed from log.
+default url is in-memory sqlite.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'virtual-market-dev'))
+
+from sqlalchemy import insert  # noqa: E402
+
+from lib.database import Database, shcema  # noqa: E402
+from lib.market import Account, Bank, MarketSnapshot, MarketState  # noqa: E402
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url')
+    parser.add_argument('--accounts', type=int, default=200000)
+    parser.add_argument('--transfers', type=int, default=10000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(args.url or 'sqlite:///:memory:')
+        await db.create_all()
+        async with db.unit_of_work():
+            bank = Bank.from_new(db, {'owner_id': 0, 'name': 'bench'})
+        async with db.transaction() as conn:
+            await conn.execute(insert(shcema.Account.__table__), [
+                {'owner_id': i, 'bank_id': bank.id, 'c_id': 1, 'balance': 10 ** 12} for i in range(args.accounts)
+            ])
+
+        snapshot = MarketSnapshot(db, f'{tmp}/snapshot', fsync=False)
+        await snapshot.recover()
+        await snapshot.write()
+        accs = [await Account.get(db, id) for id in random.sample(range(1, args.accounts + 1), 1000)]
+        for _ in range(args.transfers // 100):
+            await asyncio.gather(*(bank.move(*random.sample(accs, 2), 1) for _ in range(100)))
+        await db.ledger.drain()
+        snapshot.close()
+
+        start = perf_counter()
+        await MarketState.load(db)
+        print(f'database: {(perf_counter() - start) * 1000:8.1f}ms for {args.accounts} accounts')
+        start = perf_counter()
+        await MarketSnapshot(db, f'{tmp}/snapshot').recover()
+        print(f'snapshot: {(perf_counter() - start) * 1000:8.1f}ms with {args.transfers} transfers replayed')
+        await db.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
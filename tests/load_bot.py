@@ -0,0 +1,308 @@
+"""offline load test of whole command path, from `Bot.process_commands` to sent messages.
+
+    python tests/load_bot.py [--command 'help'] [--command 'top C01'] [--rate R] [--concurrency C] [--messages N]
+
+fake messages of `--users` users are dispatched at `--rate` per second (0 is as fast as possible),
+and at most `--concurrency` of them are processed at once. http client of bot is replaced by recorder,
+so nothing is sent to discord. latency is from arrival of message to end of `process_commands`,
+so time waiting for concurrency slot is included. service is time in `process_commands` only.
+event loop lag is overshoot of `--lag-interval` sleeps while running.
+bot is built as `main.py` does, with sqlite in temporary directory, so every extension in `cogs` must be installed.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+from itertools import count
+from pathlib import Path
+from statistics import quantiles
+from time import perf_counter
+from typing import Any, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'virtual-market-dev'))
+
+import discord  # noqa: E402
+from discord.abc import Messageable  # noqa: E402
+
+_ids = count(10 ** 9)  # not to collide with ids of users
+
+
+class RecordingHTTP:
+    """replaces `HTTPClient` of bot. sends are recorded per channel id, and other requests do nothing."""
+
+    def __init__(self):
+        self.sent: dict[int, list[dict[str, Any]]]= {}
+
+    async def send_message(self, channel_id: int, content: Optional[str], **kwargs)-> dict[str, Any]:
+        return self._record(channel_id, content, kwargs)
+
+    async def send_files(self, channel_id: int, *, files, content: Optional[str]= None, **kwargs)-> dict[str, Any]:
+        return self._record(channel_id, content, {'files': [file.filename for file in files], **kwargs})
+
+    def _record(self, channel_id: int, content: Optional[str], kwargs: dict[str, Any])-> dict[str, Any]:
+        self.sent.setdefault(channel_id, []).append({'content': content, **kwargs})
+        return {
+            'id': next(_ids), 'content': content or '', 'attachments': [], 'embeds': [],
+            'edited_timestamp': None, 'type': 0, 'pinned': False, 'mention_everyone': False, 'tts': False,
+        }
+
+    async def request(self, route, *, json: dict[str, Any])-> dict[str, Any]:
+        """only for message of some embeds, which `send()` of discord.py 1.7 can not send."""
+        return self._record(route.channel_id, json.get('content'), json)
+
+    async def add_reaction(self, channel_id: int, message_id: int, emoji: str):
+        pass
+
+    async def remove_reaction(self, channel_id: int, message_id: int, emoji: str, member_id: int):
+        pass
+
+    async def remove_own_reaction(self, channel_id: int, message_id: int, emoji: str):
+        pass
+
+    async def clear_reactions(self, channel_id: int, message_id: int):
+        pass
+
+    async def edit_message(self, channel_id: int, message_id: int, **fields)-> dict[str, Any]:
+        return self._record(channel_id, fields.get('content'), {'edit': message_id, **fields})
+
+    async def delete_message(self, channel_id: int, message_id: int, *, reason: Optional[str]= None):
+        pass
+
+    async def send_typing(self, channel_id: int):
+        pass
+
+
+class RecordingChannel(Messageable):
+    """DM like channel. its sends go to `RecordingHTTP`, same as `Context.send` does."""
+
+    def __init__(self, id: int, state: Any):
+        self.id = id
+        self._state = state
+        self.guild = None
+
+    async def _get_channel(self):
+        return self
+
+    def permissions_for(self, member)-> discord.Permissions:
+        return discord.Permissions.all()
+
+    @property
+    def sent(self)-> list[dict[str, Any]]:
+        return self._state.http.sent.get(self.id, [])
+
+
+class FakeUser(RecordingChannel):
+    """user whose DM is the user itself, so messages to owner are recorded too."""
+
+    def __init__(self, id: int, name: str, *, state: Any, bot: bool= False):
+        super().__init__(id, state)
+        self.name = name
+        self.display_name = name
+        self.discriminator = '0000'
+        self.bot = bot
+        self.mention = f'<@{id}>'
+        self.avatar_url = ''
+
+    def __str__(self)-> str:
+        return f'{self.name}#{self.discriminator}'
+
+
+class FakeMessage:
+    """message from user. enough of `discord.Message` for commands and `Context.reply`."""
+
+    def __init__(self, content: str, *, author: Optional[FakeUser], channel: RecordingChannel, state: Any):
+        self.id = next(_ids)
+        self._state = state
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = None
+        self.mentions: list[FakeUser]= []
+        self.role_mentions: list[Any]= []
+        self.channel_mentions: list[Any]= []
+        self.attachments: list[Any]= []
+        self.reactions: list[Any]= []
+
+    def to_message_reference_dict(self)-> dict[str, Any]:
+        return {'message_id': self.id, 'channel_id': self.channel.id}
+
+    async def reply(self, content: Optional[str]= None, **kwargs)-> discord.Message:
+        return await self.channel.send(content, reference=self, **kwargs)
+
+    async def add_reaction(self, emoji):
+        self.reactions.append(emoji)
+
+    async def remove_reaction(self, emoji, member):
+        pass
+
+    async def clear_reactions(self):
+        self.reactions.clear()
+
+    async def edit(self, **kwargs):
+        pass
+
+    async def delete(self, *, delay: Optional[float]= None):
+        pass
+
+
+def summary(values: list[float])-> dict[str, float]:
+    if len(values) < 2:
+        return {'count': len(values)}
+    cuts = quantiles(values, n=100, method='inclusive')  # within min and max of samples
+    return {
+        'count': len(values),
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'max_ms': round(max(values) * 1000, 3),
+    }
+
+
+async def build_bot(args: argparse.Namespace, tmp: str):
+    os.environ.setdefault('DEFAULT_EMBED_COLOR', str(0x3498db))
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{tmp}/market.db')
+    os.environ.setdefault('SNAPSHOT_DIR', tmp)
+    from bot import Bot
+    from lib.market import Account, Bank, Currency
+
+    bot = Bot()
+    await bot.prepare()
+    bot.accounts.flusher.start()  # loops of Bot.start which commands depend on
+    bot.rate_history.pruner.start()
+    state = bot._connection
+    state.http = RecordingHTTP()
+    state.user = FakeUser(next(_ids), 'bot', bot=True, state=state)
+    owner = FakeUser(next(_ids), 'owner', state=state)
+    bot.owner_id = owner.id
+    state._users[owner.id] = owner
+    db = bot.db
+    async with db.unit_of_work():
+        bank = Bank.from_new(db, {'owner_id': owner.id, 'name': 'load'})
+    async with db.unit_of_work():
+        for c_id in range(1, args.currencies + 1):
+            Currency.from_new(
+                db, c_id=c_id, owner_id=owner.id, bank_id=bank.id,
+                name=f'currency {c_id}', code=f'C{c_id:02d}'[-3:], rate='1', amount=10 ** 15,
+            )
+    async with db.unit_of_work():
+        for i in range(args.accounts):
+            Account.from_new(
+                db, owner_id=i % args.users, bank_id=bank.id, c_id=i % args.currencies + 1,
+                balance=random.randint(0, 10 ** 9),
+            )
+    return bot, owner, state
+
+
+async def run(args: argparse.Namespace)-> dict[str, Any]:
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        bot, owner, state = await build_bot(args, tmp)
+        users = [FakeUser(i, f'user {i}', state=state) for i in range(args.users)]
+        channels = [RecordingChannel(next(_ids), state) for _ in range(args.channels)]
+        errors: list[str]= []
+
+        async def on_command_error(ctx, exc):
+            errors.append(f'{type(exc).__name__}: {exc}')
+
+        bot.add_listener(on_command_error)
+
+        lags: list[float]= []
+        running = True
+
+        async def monitor():
+            loop = asyncio.get_running_loop()
+            while running:
+                start = loop.time()
+                await asyncio.sleep(args.lag_interval)
+                lags.append(loop.time() - start - args.lag_interval)
+
+        latencies: list[float]= []
+        services: list[float]= []
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def dispatch(arrival: float, message: FakeMessage):
+            async with slots:
+                start = perf_counter()
+                await bot.process_commands(message)
+                end = perf_counter()
+            services.append(end - start)
+            latencies.append(end - arrival)
+
+        monitor_task = asyncio.create_task(monitor())
+        tasks = []
+        start = perf_counter()
+        for i in range(args.messages):
+            if args.rate:
+                delay = start + i / args.rate - perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            message = FakeMessage(
+                f'/{random.choice(args.command)}',
+                author=random.choice(users), channel=random.choice(channels), state=state,
+            )
+            tasks.append(asyncio.create_task(dispatch(perf_counter(), message)))
+            if not args.rate and i % args.concurrency == 0:
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        elapsed = perf_counter() - start
+        running = False
+        await monitor_task
+
+        for task in asyncio.all_tasks():  # menus waiting for reactions
+            if task is not asyncio.current_task():
+                task.cancel()
+        bot.accounts.flusher.cancel()
+        bot.rate_history.pruner.cancel()
+        await bot.db.ledger.drain()
+        bot.market.close()
+        await bot.db.close()
+
+    sent = sum(len(messages) for messages in state.http.sent.values())
+    return {
+        'params': {
+            key: getattr(args, key)
+            for key in ('command', 'messages', 'rate', 'concurrency', 'users', 'accounts', 'currencies', 'seed')
+        },
+        'seconds': round(elapsed, 3),
+        'commands_per_sec': round(args.messages / elapsed, 1),
+        'sent': sent,
+        'owner_messages': len(owner.sent),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'latency': summary(latencies),
+        'service': summary(services),
+        'loop_lag': summary(lags),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--command', action='append', help='command without prefix. chosen at random per message')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=200.0, help='messages per second. 0 is as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--currencies', type=int, default=10)
+    parser.add_argument('--lag-interval', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path)
+    args = parser.parse_args()
+    args.command = args.command or ['help', 'top C01']
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
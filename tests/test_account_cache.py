@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+from lib.database import Database
+from lib.market import Account, AccountCache
+
+
+async def open_db(directory: Path, count: int)-> tuple[Database, list[int]]:
+    db = Database(f'sqlite:///{directory}/market.db')
+    await db.create_all()
+    async with db.unit_of_work():
+        accounts = [Account.from_new(db, owner_id=i, bank_id=1, c_id=1, balance=100) for i in range(count)]
+    return db, [account.id for account in accounts]
+
+
+def test_get_is_cached(tmp_path: Path):
+    async def main():
+        db, ids = await open_db(tmp_path, 2)
+        cache = AccountCache(db)
+        account = await cache.get(ids[0])
+        assert await cache.get(ids[0]) is account
+        assert await cache.get(12345) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+        assert ids[0] in cache
+        assert len(cache) == 1
+        await db.close()
+    asyncio.run(main())
+
+
+def test_save_out_of_unit_of_work_is_written_at_flush(tmp_path: Path):
+    async def main():
+        db, ids = await open_db(tmp_path, 1)
+        cache = AccountCache(db)
+        account = await cache.get(ids[0])
+        account.ext['note'] = 'x'
+        account.save()
+        assert cache.dirty_count == 1
+        assert (await Account.get(db, ids[0])).setting == {}
+        assert await cache.flush() == 1
+        assert cache.dirty_count == 0
+        assert (await Account.get(db, ids[0])).setting == {'note': 'x'}
+        assert await cache.flush() == 0
+        await db.close()
+    asyncio.run(main())
+
+
+def test_evicted_dirty_account_is_kept_until_flush(tmp_path: Path):
+    async def main():
+        db, ids = await open_db(tmp_path, 3)
+        cache = AccountCache(db, max_size=2)
+        first = await cache.get(ids[0])
+        first.ext['note'] = 'first'
+        first.save()
+        await cache.get(ids[1])
+        await cache.get(ids[2])  # evicts first
+        assert ids[0] not in cache
+        assert cache.peek(ids[0]) is first
+        assert await cache.get(ids[0]) is first  # not loaded again, so change is kept
+        await cache.get(ids[1])
+        await cache.get(ids[2])
+        assert await cache.flush() == 1
+        assert cache.peek(ids[0]) is None
+        assert (await Account.get(db, ids[0])).setting == {'note': 'first'}
+        await db.close()
+    asyncio.run(main())
+
+
+def test_rollbacked_save_drops_account(tmp_path: Path):
+    async def main():
+        db, ids = await open_db(tmp_path, 1)
+        cache = AccountCache(db)
+        account = await cache.get(ids[0])
+        async with db.unit_of_work() as uow:
+            account.ext['note'] = 'x'
+            account.save()
+            uow.rollback()
+        assert ids[0] not in cache
+        assert cache.dirty_count == 0
+        reloaded = await cache.get(ids[0])
+        assert reloaded is not account
+        assert reloaded.setting == {}
+        await db.close()
+    asyncio.run(main())
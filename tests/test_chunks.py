@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+from io import StringIO
+
+import pytest
+
+from lib.util import iter_chunks
+
+
+def test_short_text_is_one_chunk():
+    assert list(iter_chunks('abc\ndef', 100)) == ['abc\ndef']
+    assert list(iter_chunks('', 100)) == ['']
+
+
+def test_chunks_end_at_line_break():
+    text = ''.join(f'line {i}\n' for i in range(100))
+    chunks = list(iter_chunks(text, 50))
+    assert ''.join(chunks) == text
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert all(chunk.endswith('\n') for chunk in chunks)
+
+
+def test_long_line_is_cut_at_limit():
+    assert list(iter_chunks('a' * 25, 10)) == ['a' * 10, 'a' * 10, 'a' * 5]
+
+
+def test_file_is_same_as_str():
+    text = ''.join(f'{i}: ' + 'x' * (i % 37) + '\n' for i in range(500))
+    assert list(iter_chunks(StringIO(text), 100, read_size=64)) == list(iter_chunks(text, 100))
+
+
+def test_fences_close_and_reopen_code_block():
+    text = 'head\n```py\n' + ''.join(f'print({i})\n' for i in range(50)) + '```\ntail\n'
+    chunks = list(iter_chunks(text, 100, fences=True))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    for chunk in chunks[1:-1]:
+        assert chunk.startswith('```py\n')
+        assert chunk.endswith('```')
+    assert chunks[0].startswith('head\n```py\n')
+    assert chunks[-1].endswith('```\ntail\n')
+
+
+def test_long_fence_line_is_reopened_shorter():
+    fence = '```py ' + 'x' * 40
+    text = fence + '\n' + 'code\n' * 30 + '```\n'
+    chunks = list(iter_chunks(text, 64, fences=True))
+    assert all(len(chunk) <= 64 for chunk in chunks)
+    assert all(chunk.startswith('```py\n') for chunk in chunks[1:])
+
+
+def test_fences_need_some_limit():
+    with pytest.raises(ValueError):
+        list(iter_chunks('abc', 15, fences=True))
+    assert list(iter_chunks('abc', 15)) == ['abc']
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+from sqlalchemy import select
+
+from lib.database import Database, shcema
+from lib.market import Currency
+
+currency = shcema.Currency.__table__
+
+
+def new_currency(db: Database, c_id: int, **ext)-> Currency:
+    return Currency.from_new(
+        db, c_id=c_id, owner_id=1, bank_id=1, name=f'currency {c_id}', code=f'C{c_id:02d}', rate='1.5', ext=ext
+    )
+
+
+async def open_db(directory: Path)-> Database:
+    db = Database(f'sqlite:///{directory}/market.db')
+    await db.create_all()
+    return db
+
+
+def test_to_row_leaves_out_ext_which_is_not_read(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path)
+        async with db.unit_of_work():
+            new_currency(db, 901, tier=1)
+        loaded = await Currency.get(db, 901)
+        assert 'ext' not in loaded.to_row()
+        assert loaded.ext == {'tier': 1}
+        assert loaded.to_row()['ext'] == {'tier': 1}
+        await db.close()
+    asyncio.run(main())
+
+
+def test_persist_rows_with_different_columns(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path)
+        async with db.unit_of_work():
+            new_currency(db, 911, tier=1)
+            new_currency(db, 912, tier=2)
+        first = await Currency.get(db, 911)
+        second = await Currency.get(db, 912)
+        async with db.unit_of_work():
+            first.ext['tier'] = 3
+            first.save()
+            second.name = 'renamed'
+            second.save()
+        result = await db.execute(
+            select(currency.c.c_id, currency.c.name, currency.c.ext).where(currency.c.c_id.in_([911, 912]))
+        )
+        assert sorted(result) == [(911, 'currency 911', {'tier': 3}), (912, 'renamed', {'tier': 2})]
+        await db.close()
+    asyncio.run(main())
+
+
+def test_rollback_writes_nothing(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path)
+        async with db.unit_of_work() as uow:
+            new_currency(db, 921)
+            uow.rollback()
+        assert await Currency.get(db, 921) is None
+        await db.close()
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import pytest
+
+from lib import Embed, EmbedLimit, EmbedTemplate
+
+
+def base()-> Embed:
+    embed = Embed(title='title', description='description', color=0x00ffff)
+    embed.set_footer(text='footer')
+    embed.add_field(name='a', value='1')
+    return embed
+
+
+def test_copy_equals_and_is_independent():
+    embed = base()
+    copy = embed.copy()
+    assert type(copy) is Embed
+    assert copy.to_dict() == embed.to_dict()
+    copy.add_field(name='b', value='2')
+    copy.set_field_at(0, name='c', value='3')
+    copy.set_footer(text='other')
+    copy.title = 'other'
+    assert embed.to_dict() == base().to_dict()
+
+
+def test_copy_of_empty_embed():
+    embed = Embed()
+    assert Embed().copy().to_dict() == embed.to_dict()
+    embed.copy().add_field(name='a', value='1')
+    assert not embed.fields
+
+
+def test_template_build():
+    template = EmbedTemplate(base(), title_prefix='> ')
+    embed = template.build('name', 'text')
+    assert (embed.title, embed.description) == ('> name', 'text')
+    assert embed.footer.text == 'footer'
+    assert template.build().title == 'title'
+    embed.add_field(name='b', value='2')
+    assert len(template.build().fields) == 1
+
+
+def test_template_checks_limits():
+    template = EmbedTemplate(base())
+    with pytest.raises(ValueError):
+        template.build('x' * EmbedLimit.title)
+    with pytest.raises(ValueError):
+        template.build(description='x' * EmbedLimit.description)
+    embed = Embed()
+    embed.title = 'x' * EmbedLimit.title  # set directly, so it is not checked yet
+    with pytest.raises(ValueError):
+        EmbedTemplate(embed)
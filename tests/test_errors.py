@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+
+from lib import ErrorAggregator, ErrorEntry
+
+
+def raise_at(place: str):
+    if place == 'a':
+        raise ValueError('a')
+    raise KeyError(place)
+
+
+def error(place: str)-> BaseException:
+    try:
+        raise_at(place)
+    except Exception as exc:
+        return exc
+
+
+class Reporter:
+    def __init__(self, result: bool= True):
+        self.result = result
+        self.digests: list[tuple[list[tuple[str, int, bool]], int]]= []
+
+    async def __call__(self, entries: list[ErrorEntry], dropped: int)-> bool:
+        self.digests.append(([(entry.where, entry.pending, entry.reported) for entry in entries], dropped))
+        return self.result
+
+
+def test_same_place_is_one_entry():
+    aggregator = ErrorAggregator(Reporter())
+    first = aggregator.record(error('a'), 'cmd1')
+    assert aggregator.record(error('a'), 'cmd2') is first
+    assert aggregator.record(error('b'), 'cmd1') is not first
+    assert (first.count, first.where, first.summary) == (2, 'cmd1', 'ValueError: a')
+    assert 'raise_at' in first.traceback
+    assert len(aggregator) == 2
+    assert aggregator.recorded == 3
+
+
+def test_digest_has_only_new_errors():
+    async def main():
+        reporter = Reporter()
+        aggregator = ErrorAggregator(reporter)
+        assert not await aggregator.digest()
+        aggregator.record(error('a'), 'cmd1')
+        aggregator.record(error('a'), 'cmd1')
+        assert await aggregator.digest()
+        assert not await aggregator.digest()
+        aggregator.record(error('a'), 'cmd1')
+        assert await aggregator.digest()
+        assert reporter.digests == [([('cmd1', 2, False)], 0), ([('cmd1', 1, True)], 0)]
+    asyncio.run(main())
+
+
+def test_failed_report_is_sent_next_time():
+    async def main():
+        reporter = Reporter(False)
+        aggregator = ErrorAggregator(reporter)
+        aggregator.record(error('a'), 'cmd1')
+        assert not await aggregator.digest()
+        reporter.result = True
+        aggregator.record(error('a'), 'cmd1')
+        assert await aggregator.digest()
+        assert reporter.digests[-1] == ([('cmd1', 2, False)], 0)
+    asyncio.run(main())
+
+
+def test_least_recently_seen_is_dropped():
+    async def main():
+        reporter = Reporter()
+        aggregator = ErrorAggregator(reporter, max_size=1)
+        aggregator.record(error('a'), 'cmd1')
+        aggregator.record(error('b'), 'cmd2')
+        assert len(aggregator) == 1
+        assert aggregator.dropped == 1
+        assert await aggregator.digest()
+        assert reporter.digests == [([('cmd2', 1, False)], 1)]
+    asyncio.run(main())
+
+
+def test_error_while_sending_is_in_next_digest():
+    async def main():
+        reporter = Reporter()
+        aggregator = ErrorAggregator(reporter)
+
+        async def report(entries: list[ErrorEntry], dropped: int)-> bool:
+            sent = await reporter(entries, dropped)
+            if len(reporter.digests) == 1:
+                aggregator.record(error('a'), 'cmd1')
+            return sent
+
+        aggregator.report = report
+        aggregator.record(error('a'), 'cmd1')
+        assert await aggregator.digest()
+        assert await aggregator.digest()
+        assert reporter.digests == [([('cmd1', 1, False)], 0), ([('cmd1', 1, True)], 0)]
+    asyncio.run(main())
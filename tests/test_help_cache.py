@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from discord.ext import commands
+
+from lib import HelpCache
+
+
+def make_commands()-> list[commands.Command]:
+    async def callback(ctx):
+        pass
+
+    def owner_only(ctx)-> bool:
+        return False
+
+    return [
+        commands.Command(callback, name='a'),
+        commands.Command(callback, name='b', checks=[owner_only]),
+        commands.Command(callback, name='c', hidden=True),
+    ]
+
+
+def test_plan_is_collected_once_per_category():
+    cache = HelpCache()
+    calls = []
+
+    def command_list():
+        calls.append(1)
+        return make_commands()
+
+    plan = cache.plan('cog', command_list, False)
+    assert cache.plan('cog', command_list, False) is plan
+    assert len(calls) == 1
+    assert [command.name for command in plan.visible(None)] == ['a', 'b']
+    assert len(plan.checks) == 2  # global checks and owner_only
+    assert [command.name for command in plan.visible((True, False))] == ['a']
+
+
+def test_rendered_is_least_recently_used():
+    cache = HelpCache(max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert len(cache) == 2
+
+
+def test_invalidate_drops_plans_and_rendered():
+    cache = HelpCache()
+    old = cache.plan('cog', make_commands, False)
+    cache.set('key', 'rendered')
+    cache.invalidate()
+    assert cache.get('key') is None
+    assert len(cache) == 0
+    new = cache.plan('cog', lambda: make_commands()[:1], False)
+    assert new is not old
+    assert [command.name for command in new.visible(None)] == ['a']
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from importlib import import_module
+
+import pytest
+
+from lib.market import Account, CrossRates, instrument
+
+module = import_module('lib.market.instrument')  # shadowed by class of same name
+
+
+def account(id: int, bank_id: int, c_id: int= 1)-> Account:
+    return Account(None, id=id, owner_id=id, bank_id=bank_id, c_id=c_id, balance=1000)
+
+
+def test_entries_are_in_bank_of_each_account():
+    transfer = instrument.from_new(None, account(1, 10), account(2, 20), 30, 1)
+    debit, credit = transfer.entries()
+    assert (debit['account_id'], debit['bank_id'], debit['amount']) == (1, 10, -30)
+    assert (credit['account_id'], credit['bank_id'], credit['amount']) == (2, 20, 30)
+    assert debit['transfer_id'] == credit['transfer_id'] == transfer.id
+
+
+def test_exchange_entries(monkeypatch: pytest.MonkeyPatch):
+    rates = CrossRates()
+    rates.set_rate(1, '2')
+    rates.set_rate(2, '1')
+    monkeypatch.setattr(module, 'cross_rates', rates)
+    transfer = instrument.from_new(None, account(1, 10, 1), account(2, 20, 2), 30, 1, exchange=True)
+    debit, credit = transfer.entries()
+    assert (debit['bank_id'], debit['c_id'], debit['amount']) == (10, 1, -30)
+    assert (credit['bank_id'], credit['c_id'], credit['amount']) == (20, 2, 60)
+
+
+@pytest.mark.parametrize('to, amount, currency', [
+    (account(1, 10), 1, 1), (account(2, 10), 0, 1), (account(2, 10), 1, 2),
+])
+def test_invalid_transfer(to, amount, currency):
+    with pytest.raises(ValueError):
+        instrument.from_new(None, account(1, 10), to, amount, currency)
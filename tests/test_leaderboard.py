@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+from sqlalchemy import update
+
+from lib.database import Database, shcema
+from lib.market import Account, Leaderboards, TopK
+
+
+def test_board_without_floor_keeps_every_account():
+    board = TopK(2, 4)
+    board.load([(1, 10), (2, 30)])
+    assert board.floor is None
+    board.update(3, 1)
+    board.update(1, 0)
+    assert board.top(3) == [(2, 30), (3, 1), (1, 0)]
+    assert not board.stale
+
+
+def test_overflow_sets_floor_and_rejects_lower():
+    board = TopK(2, 3)
+    board.load([(1, 40), (2, 30), (3, 20)])
+    assert board.floor == 20
+    board.update(4, 20)  # not larger than floor, an unkept account may be equal
+    assert 4 not in board
+    board.update(5, 50)
+    assert board.top(3) == [(5, 50), (1, 40), (2, 30)]
+    assert 3 not in board
+    assert board.floor == 20
+
+
+def test_slack_absorbs_drops_until_stale():
+    board = TopK(2, 4)
+    board.load([(1, 40), (2, 30), (3, 20), (4, 10)])
+    assert board.floor == 10
+    board.update(1, 5)  # below floor, some unkept account may be larger
+    assert 1 not in board
+    assert board.top(2) == [(2, 30), (3, 20)]
+    assert not board.stale
+    board.update(2, 0)
+    board.update(3, 10)  # equal to floor is still kept
+    assert board.top(3) == [(3, 10), (4, 10)]
+    assert not board.stale
+    board.remove(4)
+    assert board.stale
+
+
+def test_stale_board_is_rebuilt(tmp_path: Path):
+    async def main():
+        db = Database(f'sqlite:///{tmp_path}/market.db')
+        await db.create_all()
+        async with db.unit_of_work():
+            accounts = [Account.from_new(db, owner_id=i, bank_id=1, c_id=1, balance=i * 10) for i in range(1, 6)]
+        boards = Leaderboards(size=2, slack=1)
+        table = shcema.Account.__table__
+        assert await boards.top(db, 1, limit=2) == [(accounts[4].id, 50), (accounts[3].id, 40)]
+        dropped = [account.id for account in accounts[3:]]
+        async with db.transaction() as conn:  # as ledger writes balances
+            await conn.execute(update(table).where(table.c.id.in_(dropped)).values(balance=0))
+        for account in accounts[3:]:
+            account.balance = 0
+            boards.update(account)
+        assert boards.rebuilds == 1
+        assert await boards.top(db, 1, limit=2) == [(accounts[2].id, 30), (accounts[1].id, 20)]
+        assert boards.rebuilds == 2
+        await db.close()
+    asyncio.run(main())
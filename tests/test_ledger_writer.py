@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+
+from lib.database import Database, next_transfer_id, shcema
+
+account = shcema.Account.__table__
+ledger = shcema.Ledger.__table__
+
+
+class Move:
+    """transfer of `amount` between two accounts of one bank and currency."""
+
+    def __init__(self, from_id: int, to_id: int, amount: int):
+        self.id = next_transfer_id()
+        self.from_id = from_id
+        self.to_id = to_id
+        self.amount = amount
+
+    def entries(self):
+        return [
+            {
+                'transfer_id': self.id, 'account_id': self.from_id, 'counter_id': self.to_id,
+                'bank_id': 1, 'c_id': 1, 'amount': -self.amount,
+            },
+            {
+                'transfer_id': self.id, 'account_id': self.to_id, 'counter_id': self.from_id,
+                'bank_id': 1, 'c_id': 1, 'amount': self.amount,
+            },
+        ]
+
+    def deltas(self):
+        return [(self.from_id, -self.amount), (self.to_id, self.amount)]
+
+
+class Broken(Move):
+    def entries(self):
+        raise ValueError('broken transfer')
+
+
+async def open_db(directory: Path, **kwargs)-> Database:
+    db = Database(f'sqlite:///{directory}/market.db', **kwargs)
+    await db.create_all()
+    async with db.transaction() as conn:
+        await conn.execute(account.insert(), [{'id': 1, 'balance': 100}, {'id': 2, 'balance': 100}])
+    return db
+
+
+async def written(db: Database)-> tuple[int, list[int]]:
+    count = (await db.execute(select(func.count()).select_from(ledger))).scalar_one()
+    balances = (await db.execute(select(account.c.balance).order_by(account.c.id))).scalars().all()
+    return count, list(balances)
+
+
+def test_submissions_are_written_in_one_batch(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path, ledger_window=0.05)
+        await asyncio.gather(*(db.ledger.submit(Move(1, 2, 10)) for _ in range(3)))
+        assert await written(db) == (6, [70, 130])
+        assert (db.ledger.stats.batches, db.ledger.stats.transfers) == (1, 3)
+        await db.close()
+    asyncio.run(main())
+
+
+def test_failed_batch_writes_nothing(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path, ledger_window=0.05)
+        results = await asyncio.gather(
+            db.ledger.submit(Move(1, 2, 10)), db.ledger.submit(Broken(1, 2, 10)), return_exceptions=True
+        )
+        assert all(isinstance(result, ValueError) for result in results)
+        assert await written(db) == (0, [100, 100])
+        # writer goes on after failure
+        await db.ledger.submit(Move(1, 2, 10))
+        assert await written(db) == (2, [90, 110])
+        await db.close()
+    asyncio.run(main())
+
+
+def test_cancelled_caller_waits_write(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path, ledger_window=0.05)
+        task = asyncio.ensure_future(db.ledger.submit(Move(1, 2, 10)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # CancelledError is raised after transfers are written
+        assert await written(db) == (2, [90, 110])
+        await db.close()
+    asyncio.run(main())
+
+
+def test_cancelled_writer_fails_pending_submissions(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path, ledger_window=0.05)
+        task = asyncio.ensure_future(db.ledger.submit(Move(1, 2, 10)))
+        await asyncio.sleep(0.01)
+        db.ledger._worker.cancel()
+        with pytest.raises(RuntimeError):
+            await task
+        assert await written(db) == (0, [100, 100])
+        await db.close()
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from lib.market import AccountLocks
+
+
+def test_accounts_are_locked_in_order_of_id():
+    async def main():
+        locks = AccountLocks()
+        order = []
+
+        async def transfer(name: str, *ids: int):
+            async with locks.hold(*ids):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        # both lock 1 first whatever order ids are given, so they can not deadlock
+        await asyncio.wait_for(asyncio.gather(transfer('a', 1, 2), transfer('b', 2, 1)), 1)
+        assert order == ['a', 'b']
+        assert len(locks) == 0
+        assert locks.wait.count == 1
+        assert [id for id, _ in locks.most_contended()] == [1]
+    asyncio.run(main())
+
+
+def test_owner_does_not_lock_again():
+    async def main():
+        locks = AccountLocks()
+        owner = object()
+        async with locks.hold(1, 2, owner=owner):
+            async with locks.hold(2, 3, owner=owner):
+                assert locks.highest(owner) == 3
+            assert locks.highest(owner) == 2
+        assert locks.highest(owner) is None
+        assert len(locks) == 0
+    asyncio.run(main())
+
+
+def test_owner_locks_lower_free_account():
+    async def main():
+        locks = AccountLocks()
+        owner = object()
+        async with locks.hold(5, owner=owner):
+            async with locks.hold(1, owner=owner):
+                assert locks.highest(owner) == 5
+    asyncio.run(main())
+
+
+def test_owner_does_not_wait_lower_account():
+    async def main():
+        locks = AccountLocks()
+        owner = object()
+        async with locks.hold(1):
+            async with locks.hold(5, owner=owner):
+                with pytest.raises(RuntimeError):
+                    async with locks.hold(1, owner=owner):
+                        pass
+                # higher account is waited as usual
+                async with locks.hold(6, owner=owner):
+                    pass
+        assert len(locks) == 0
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+from lib.database import Database
+from lib.market import Currency, CurrencyIndex
+
+NAMES = [(801, 'USD', 'Dollar'), (802, 'USX', 'Dolphin'), (803, 'JPY', 'Yen'), (804, 'EUR', 'Euro')]
+
+
+async def open_db(directory: Path)-> Database:
+    db = Database(f'sqlite:///{directory}/market.db')
+    await db.create_all()
+    async with db.unit_of_work():
+        for c_id, code, name in NAMES:
+            Currency.from_new(db, c_id=c_id, owner_id=1, bank_id=1, name=name, code=code, rate='1')
+    return db
+
+
+def codes(currencies: list[Currency])-> list[str]:
+    return [currency.code for currency in currencies]
+
+
+def test_resolve_by_id_code_and_name(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path)
+        index = CurrencyIndex()
+        assert (await index.resolve(db, '803')).code == 'JPY'
+        assert (await index.resolve(db, 'jpy')).c_id == 803
+        assert (await index.resolve(db, 'YEN')).c_id == 803
+        assert await index.resolve(db, 'GBP') is None
+        assert len(index) == len(NAMES)
+        await db.close()
+    asyncio.run(main())
+
+
+def test_complete_by_prefix_of_code_or_name(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path)
+        index = CurrencyIndex()
+        assert codes(await index.complete(db, 'us')) == ['USD', 'USX']
+        assert codes(await index.complete(db, 'DOL')) == ['USD', 'USX']
+        assert codes(await index.complete(db, 'e')) == ['EUR']
+        assert codes(await index.complete(db, 'us', limit=1)) == ['USD']
+        assert await index.complete(db, 'zz') == []
+        await db.close()
+    asyncio.run(main())
+
+
+def test_suggest_close_keys(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path)
+        index = CurrencyIndex()
+        assert codes(await index.suggest(db, 'Dollor')) == ['USD']
+        assert codes(await index.suggest(db, 'eu')) == ['EUR']
+        assert await index.suggest(db, 'qqqqqq') == []
+        await db.close()
+    asyncio.run(main())
+
+
+def test_update_and_remove_reindex(tmp_path: Path):
+    async def main():
+        db = await open_db(tmp_path)
+        index = CurrencyIndex()
+        currency = await index.get(db, 804)
+        currency.code = 'EUX'
+        index.update(currency)
+        assert await index.by_code(db, 'EUR') is None
+        assert await index.by_code(db, 'eux') is currency
+        assert codes(await index.complete(db, 'eu')) == ['EUX']
+        index.remove(804)
+        assert await index.complete(db, 'eu') == []
+        assert await index.by_name(db, 'euro') is None
+        await db.close()
+    asyncio.run(main())
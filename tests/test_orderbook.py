@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+from itertools import count
+from pathlib import Path
+
+import pytest
+
+from lib.database import Database
+from lib.market import BUY, SELL, Account, Exchange, Order, OrderBook
+
+
+_ids = count(1)
+
+
+def account()-> Account:
+    return Account(None, id=next(_ids), owner_id=1, bank_id=1, c_id=1)
+
+
+def order(side: str, price: int, quantity: int)-> Order:
+    return Order(side, price, quantity, account(), account())
+
+
+def test_match_by_price_then_time():
+    book = OrderBook(1, 2)
+    first = order(SELL, 101, 5)
+    second = order(SELL, 100, 5)
+    third = order(SELL, 100, 5)
+    for maker in (first, second, third):
+        assert book.place(maker) == []
+    taker = order(BUY, 101, 12)
+    fills = book.place(taker)
+    assert [(fill.maker, fill.price, fill.quantity) for fill in fills] == [
+        (second, 100, 5), (third, 100, 5), (first, 101, 2),
+    ]
+    assert first.remaining == 3
+    assert taker.remaining == 0
+    assert book.best_ask == 101
+    assert book.best_bid is None
+    assert len(book) == 1
+
+
+def test_remaining_rests_in_book():
+    book = OrderBook(1, 2)
+    book.place(order(SELL, 100, 5))
+    taker = order(BUY, 99, 5)
+    assert book.place(taker) == []
+    assert book.best_bid == 99
+    assert book.get(taker.id) is taker
+    assert book.depth(BUY) == [(99, 5)]
+
+
+def test_cancelled_order_is_not_matched():
+    book = OrderBook(1, 2)
+    cancelled = order(SELL, 100, 5)
+    living = order(SELL, 101, 5)
+    book.place(cancelled)
+    book.place(living)
+    assert book.cancel(cancelled.id) is cancelled
+    fills = book.place(order(BUY, 101, 5))
+    assert [fill.maker for fill in fills] == [living]
+    assert len(book) == 0
+
+
+def test_undo_restores_makers_and_priority():
+    book = OrderBook(1, 2)
+    filled = order(SELL, 100, 5)
+    partial = order(SELL, 100, 5)
+    book.place(filled)
+    book.place(partial)
+    taker = order(BUY, 100, 7)
+    fills = book.place(taker)
+    book.undo(taker, fills)
+    assert taker.id is None
+    assert taker.remaining == 7
+    assert (filled.remaining, partial.remaining) == (5, 5)
+    assert len(book) == 2
+    assert book.depth(SELL) == [(100, 10)]
+    # same fills again, so time priority is kept
+    again = book.place(taker)
+    assert [(fill.maker, fill.quantity) for fill in again] == [(filled, 5), (partial, 2)]
+
+
+def test_undo_removes_resting_taker():
+    book = OrderBook(1, 2)
+    maker = order(SELL, 100, 3)
+    book.place(maker)
+    taker = order(BUY, 100, 5)
+    fills = book.place(taker)
+    assert book.best_bid == 100
+    book.undo(taker, fills)
+    assert book.best_bid is None
+    assert book.best_ask == 100
+    assert len(book) == 1
+    assert maker.remaining == 3
+
+
+@pytest.mark.parametrize('side, price, quantity', [(BUY, 0, 1), (BUY, 1, 0), ('hold', 1, 1)])
+def test_invalid_order(side, price, quantity):
+    with pytest.raises(ValueError):
+        Order(side, price, quantity, account(), account())
+
+
+def test_order_needs_accounts():
+    with pytest.raises(ValueError):
+        Order(BUY, 1, 1, account(), None)
+
+
+def test_self_crossing_maker_is_cancelled():
+    book = OrderBook(1, 2)
+    own = order(SELL, 100, 5)
+    other = order(SELL, 101, 5)
+    book.place(own)
+    book.place(other)
+    taker = Order(BUY, 101, 5, own.base_account, account())
+    fills = book.place(taker)
+    assert [(fill.maker, fill.quantity) for fill in fills] == [(other, 5)]
+    assert own.cancelled
+    assert book.get(own.id) is None
+    assert book.best_ask is None
+    book.undo(taker, fills)
+    assert book.depth(SELL) == [(101, 5)]
+
+
+def test_exchange_skips_own_orders(tmp_path: Path):
+    async def main():
+        db = Database(f'sqlite:///{tmp_path}/market.db')
+        await db.create_all()
+        async with db.unit_of_work():
+            a_base, a_quote, b_base, b_quote = (
+                Account.from_new(db, owner_id=owner, bank_id=1, c_id=c_id, balance=1000)
+                for owner in (1, 2) for c_id in (1, 2)
+            )
+        exchange = Exchange(db)
+        assert await exchange.trade(1, 2, Order(SELL, 1, 5, a_base, a_quote)) == []
+        assert await exchange.trade(1, 2, Order(SELL, 2, 5, b_base, b_quote)) == []
+        transfers = await exchange.trade(1, 2, Order(BUY, 2, 5, a_base, a_quote))
+        assert [(t.from_id, t.to_id, t.amount) for t in transfers] == [
+            (b_base.id, a_base.id, 5), (a_quote.id, b_quote.id, 10),
+        ]
+        assert (a_base.balance, a_quote.balance, b_base.balance, b_quote.balance) == (1005, 990, 995, 1010)
+        assert len(exchange.book(1, 2)) == 0
+        await db.close()
+    asyncio.run(main())
+
+
+def test_undone_entry_is_dropped_lazily():
+    book = OrderBook(1, 2)
+    book.place(order(SELL, 100, 3))
+    taker = order(BUY, 100, 5)
+    fills = book.place(taker)
+    book.undo(taker, fills)
+    assert book.place(order(SELL, 100, 1)) == []  # undone bid is dead, so it is not matched
+    taker.price = 99
+    book.place(taker)  # placed again with new id, old entry in heap is dead
+    assert book.depth(BUY) == [(99, 5)]
+    seller = order(SELL, 99, 5)
+    assert [(fill.maker, fill.quantity) for fill in book.place(seller)] == [(taker, 5)]
+    assert book.best_bid is None
+    assert book.depth(SELL) == [(100, 4)]
+    assert len(book) == 2
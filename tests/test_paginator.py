@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import pytest
+
+from lib import Embed, EmbedLimit, EmbedPaginator, EmbedTemplate
+
+
+def sizes(paginator: EmbedPaginator)-> list[int]:
+    return [len(page.fields) for page in paginator.pages]
+
+
+def test_new_page_over_field_count():
+    paginator = EmbedPaginator(Embed(title='help'))
+    for i in range(EmbedLimit.fields + 3):
+        paginator.add_field(name=f'n{i}', value='v')
+    assert sizes(paginator) == [EmbedLimit.fields, 3]
+    assert all(page.title == 'help' for page in paginator.pages)
+
+
+def test_new_page_over_total_size():
+    paginator = EmbedPaginator(Embed(title='t'))
+    value = 'x' * 1000
+    for _ in range(7):
+        paginator.add_field(name='n', value=value)
+    assert sizes(paginator) == [5, 2]
+    assert all(len(page) <= EmbedLimit.total for page in paginator.pages)
+
+
+def test_base_fields_count_to_limit():
+    embed = Embed()
+    for i in range(EmbedLimit.fields - 1):
+        embed.add_field(name=f'n{i}', value='v')
+    paginator = EmbedPaginator(EmbedTemplate(embed))
+    paginator.add_field(name='a', value='1').add_field(name='b', value='2')
+    assert sizes(paginator) == [EmbedLimit.fields, EmbedLimit.fields]
+
+
+def test_messages_are_packed_by_size_and_count():
+    paginator = EmbedPaginator(Embed())
+    for _ in range(20):  # five fields of 1001 in a page, so two pages are over total of a message
+        paginator.add_field(name='n', value='x' * 1000)
+    assert len(paginator) == 4
+    assert [len(message) for message in paginator.messages()] == [1] * 4
+
+    small = EmbedPaginator(Embed())
+    for i in range(EmbedLimit.fields * 12):
+        small.add_field(name='n', value=str(i))
+    assert len(small) == 12
+    assert [len(message) for message in small.messages()] == [EmbedLimit.embeds, 2]
+
+
+def test_empty_paginator_has_base_page():
+    paginator = EmbedPaginator(Embed(title='empty'))
+    (message,) = paginator.messages()
+    assert [page.title for page in message] == ['empty']
+
+
+def test_add_chunks_wraps_each_chunk():
+    paginator = EmbedPaginator(Embed())
+    paginator.add_chunks('out', ['a', 'b'], prefix='```\n', suffix='```')
+    assert [field.value for field in paginator.pages[0].fields] == ['```\na```', '```\nb```']
+    assert [field.inline for field in paginator.pages[0].fields] == [False, False]
+
+
+def test_too_large():
+    paginator = EmbedPaginator(Embed(description='x' * 2000))
+    with pytest.raises(ValueError):
+        paginator.add_field(name='n', value='x' * EmbedLimit.field_value)
+    embed = Embed()
+    for i in range(EmbedLimit.fields):
+        embed.add_field(name=f'n{i}', value='v')
+    with pytest.raises(ValueError):
+        EmbedPaginator(embed)
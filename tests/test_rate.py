@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from fractions import Fraction
+
+import pytest
+
+from lib.market import CrossRates
+
+
+def rates(**kwargs)-> CrossRates:
+    table = CrossRates()
+    for c_id, rate in kwargs.items():
+        table.set_rate(int(c_id[1:]), rate)
+    return table
+
+
+def test_rate_is_exact_fraction():
+    table = rates(c1='1.5', c2='0.3')
+    assert table.rate(1, 2) == Fraction(5)
+    assert table.rate(2, 1) == Fraction(1, 5)
+    assert table.rate(1, 1) == 1
+
+
+def test_convert_rounds_down():
+    table = rates(c1='1', c2='3')
+    assert table.convert(10, 1, 2) == 3
+    assert table.convert_many([10, 11, 12], 1, 2) == [3, 3, 4]
+    assert table.convert_many([10, 11], 2, 1) == [30, 33]
+
+
+def test_pair_follows_rate_update():
+    table = rates(c1='2', c2='1', c3='4')
+    assert table.rate(1, 2) == 2
+    assert table.rate(3, 1) == 2
+    table.set_rate(1, '8')
+    assert table.rate(1, 2) == 8
+    assert table.rate(2, 1) == Fraction(1, 8)
+    assert table.rate(3, 1) == Fraction(1, 2)
+    assert table.rate(3, 2) == 4
+
+
+def test_removed_currency_has_no_rate():
+    table = rates(c1='2', c2='1')
+    assert table.rate(1, 2) == 2
+    table.remove(1)
+    assert 1 not in table
+    assert len(table) == 1
+    with pytest.raises(KeyError):
+        table.rate(1, 2)
+    with pytest.raises(KeyError):
+        table.rate(2, 1)
+
+
+def test_update_drops_only_pairs_of_currency():
+    table = rates(c1='2', c2='1', c3='4')
+    for src, dst in ((1, 1), (1, 2), (2, 1), (2, 3), (3, 2)):
+        table.rate(src, dst)
+    table.set_rate(1, '3')
+    assert table._matrix == {2: {3: Fraction(1, 4)}, 3: {2: 4}}
+    assert table._columns == {3: {2}, 2: {3}}
+    table.remove(2)
+    assert table._matrix == table._columns == {}
+    assert table.rate(1, 1) == 1
+
+
+@pytest.mark.parametrize('rate', ['0', '-1'])
+def test_rate_must_be_positive(rate):
+    with pytest.raises(ValueError):
+        rates(c1=rate)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import pytest
+
+from lib.market import CrossRates, Settlement, SettlementRule, settlement
+
+RULES = {
+    1: SettlementRule(interest_bps=100),  # 1%
+    2: SettlementRule(fee=30),
+    3: SettlementRule(interest_bps=-50, fee=10, fee_c_id=9),
+}
+# (id, bank_id, c_id, balance)
+ACCOUNTS = [
+    (1, 1, 1, 1000),
+    (2, 1, 1, 99),  # interest is rounded down to 0
+    (3, 1, 2, 12345),
+    (4, 2, 1, 100),
+    (5, 2, 1, 20),  # fee is not more than balance
+    (6, 3, 1, 2000),
+    (7, 3, 2, 2000),
+]
+EXPECTED = [
+    (1, 1, 1, 10),
+    (3, 1, 2, 123),
+    (4, 2, 1, -30),
+    (5, 2, 1, -20),
+    (6, 3, 1, -10 - 10),
+    (7, 3, 2, -10 - 5),  # fee is converted from currency 9
+]
+
+PATHS = [
+    pytest.param(Settlement._compute_numpy, marks=pytest.mark.skipif(settlement.np is None, reason='numpy')),
+    Settlement._compute_array,
+]
+
+
+@pytest.fixture(autouse=True)
+def rates(monkeypatch: pytest.MonkeyPatch):
+    table = CrossRates()
+    table.set_rate(1, '1')
+    table.set_rate(2, '2')
+    table.set_rate(9, '1')
+    monkeypatch.setattr(settlement, 'cross_rates', table)
+
+
+@pytest.mark.parametrize('compute', PATHS)
+def test_compute_keeps_only_changed_accounts(compute):
+    result = compute(RULES, *zip(*ACCOUNTS))
+    assert isinstance(result, Settlement)
+    assert list(zip(result.ids, result.bank_ids, result.c_ids, result.amounts)) == EXPECTED
+    assert len(result) == len(EXPECTED)
+
+
+@pytest.mark.parametrize('compute', PATHS)
+def test_compute_rounds_negative_interest_down(compute):
+    rules = {1: SettlementRule(interest_bps=-1)}
+    result = compute(rules, [1, 2], [1, 1], [1, 1], [15000, 5])
+    assert list(result.deltas()) == [(1, -2), (2, -1)]
+
+
+def test_compute_of_no_account():
+    assert not Settlement.compute(RULES, [], [], [], [])
+
+
+def test_entries_have_no_counter_account():
+    result = Settlement._compute_array(RULES, *zip(*ACCOUNTS))
+    entries = list(result.entries())
+    assert {entry['counter_id'] for entry in entries} == {0}
+    assert {entry['transfer_id'] for entry in entries} == {result.id}
+    assert [entry['amount'] for entry in entries] == [amount for *_, amount in EXPECTED]
+
+
+def test_rule_from_setting():
+    assert SettlementRule.from_setting({}) is None
+    rule = SettlementRule.from_setting({'interest_bps': '5', 'fee': 3, 'fee_c_id': '2'})
+    assert (rule.interest_bps, rule.fee, rule.fee_c_id) == (5, 3, 2)
+    with pytest.raises(ValueError):
+        SettlementRule.from_setting({'fee': -1})
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+from sqlalchemy import delete
+
+from lib.database import BUCKET_MS, Database, bucket_of, next_transfer_id, read_summary, rebuild_summary, shcema
+
+summary = shcema.LedgerSummary.__table__
+
+
+class Entries:
+    """transfer of given `(account_id, counter_id, bank_id, c_id, amount)` entries."""
+
+    def __init__(self, *entries: tuple[int, int, int, int, int]):
+        self.id = next_transfer_id()
+        self._entries = entries
+
+    def entries(self):
+        return [
+            {
+                'transfer_id': self.id, 'account_id': account_id, 'counter_id': counter_id,
+                'bank_id': bank_id, 'c_id': c_id, 'amount': amount,
+            }
+            for account_id, counter_id, bank_id, c_id, amount in self._entries
+        ]
+
+    def deltas(self):
+        return [(account_id, amount) for account_id, _, _, _, amount in self._entries]
+
+
+def test_bucket_is_on_the_hour():
+    transfer_id = next_transfer_id()
+    assert bucket_of(transfer_id) <= transfer_id
+    assert bucket_of(bucket_of(transfer_id)) == bucket_of(transfer_id)
+    assert BUCKET_MS == 3600 * 1000
+
+
+def test_rebuild_is_same_as_incremental(tmp_path: Path):
+    async def main():
+        db = Database(f'sqlite:///{tmp_path}/market.db')
+        await db.create_all()
+        await db.ledger.submit(
+            Entries((1, 2, 1, 1, -30), (2, 1, 1, 1, 30)),
+            Entries((1, 3, 1, 1, -20), (3, 1, 2, 1, 20)),
+            Entries((3, 1, 2, 2, -5), (1, 3, 1, 2, 5)),
+            Entries((1, 0, 1, 1, -7)),  # fee of settlement is not volume
+        )
+        incremental = (await read_summary(db, 1), await read_summary(db, 2))
+        assert incremental == ({1: (50, 2)}, {2: (5, 1)})
+        async with db.transaction() as conn:
+            await conn.execute(delete(summary))
+        assert await read_summary(db, 1) == {}
+        assert await rebuild_summary(db) == 2
+        assert (await read_summary(db, 1), await read_summary(db, 2)) == incremental
+        await db.close()
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from lib.database import Database
+from lib.market import Account, Bank, MarketSnapshot
+
+
+def entries(transfer_id: int, from_id: int, to_id: int, amount: int)-> list[dict]:
+    return [
+        {'transfer_id': transfer_id, 'account_id': from_id, 'amount': -amount},
+        {'transfer_id': transfer_id, 'account_id': to_id, 'amount': amount},
+    ]
+
+
+async def write_log(directory: Path)-> tuple[list[int], Path, int]:
+    """snapshot of two accounts, then two committed writes in log.
+    return ids of accounts, segment file and its size after first write.
+    """
+    db = Database(f'sqlite:///{directory}/market.db')
+    await db.create_all()
+    snapshot = MarketSnapshot(db, str(directory))
+    await snapshot.recover()
+    async with db.unit_of_work():
+        bank = Bank.from_new(db, {'owner_id': 0, 'name': 'bank'})
+    async with db.unit_of_work():
+        accounts = [Account.from_new(db, owner_id=i, bank_id=bank.id, c_id=1, balance=100) for i in (1, 2)]
+    await snapshot.write()
+    ids = [account.id for account in accounts]
+    log = snapshot.log
+    path = log.path(log.segment)
+    log.commit(await log.prepare(entries(1, ids[0], ids[1], 10), ()))
+    size = path.stat().st_size
+    log.commit(await log.prepare(entries(2, ids[0], ids[1], 20), ()))
+    assert snapshot.state.accounts.balance(ids[0]) == 70
+    snapshot.close()
+    await db.close()
+    return ids, path, size
+
+
+async def recover(directory: Path, ids: list[int])-> list[int]:
+    db = Database(f'sqlite:///{directory}/market.db')
+    snapshot = MarketSnapshot(db, str(directory))
+    state = await snapshot.recover()
+    snapshot.close()
+    await db.close()
+    return [state.accounts.balance(id) for id in ids]
+
+
+def test_replay_committed_writes(tmp_path: Path):
+    ids, _, _ = asyncio.run(write_log(tmp_path))
+    assert asyncio.run(recover(tmp_path, ids)) == [70, 130]
+
+
+@pytest.mark.parametrize('cut', [1, 20, 40])
+def test_replay_stops_at_truncated_record(tmp_path: Path, cut: int):
+    ids, path, _ = asyncio.run(write_log(tmp_path))
+    data = path.read_bytes()
+    path.write_bytes(data[:-cut])
+    # second write is torn, or in doubt and not in database
+    assert asyncio.run(recover(tmp_path, ids)) == [90, 110]
+
+
+def test_replay_stops_at_corrupt_record(tmp_path: Path):
+    ids, path, size = asyncio.run(write_log(tmp_path))
+    data = bytearray(path.read_bytes())
+    data[size + 20] ^= 0xFF  # payload of second BEGIN
+    path.write_bytes(bytes(data))
+    assert asyncio.run(recover(tmp_path, ids)) == [90, 110]
+
+
+def test_records_after_corrupt_one_are_ignored(tmp_path: Path):
+    ids, path, _ = asyncio.run(write_log(tmp_path))
+    data = bytearray(path.read_bytes())
+    data[20] ^= 0xFF  # payload of first BEGIN
+    path.write_bytes(bytes(data))
+    assert asyncio.run(recover(tmp_path, ids)) == [100, 100]
+
+
+def test_commit_during_rotate_is_replayed_once(tmp_path: Path):
+    async def main()-> list[int]:
+        ids, _, _ = await write_log(tmp_path)
+        db = Database(f'sqlite:///{tmp_path}/market.db')
+        snapshot = MarketSnapshot(db, str(tmp_path))
+        await snapshot.recover()
+        log = snapshot.log
+        lsn = await log.prepare(entries(3, ids[0], ids[1], 5), ())
+        writing = asyncio.ensure_future(snapshot.write())
+        await asyncio.sleep(0)  # segment is switched, and new one is being synced
+        log.commit(lsn)
+        await writing
+        assert snapshot.state.accounts.balance(ids[0]) == 65
+        snapshot.close()
+        await db.close()
+        return await recover(tmp_path, ids)
+    assert asyncio.run(main()) == [65, 135]
@@ -2,7 +2,8 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import traceback
+import sys
+from datetime import timedelta
 from io import StringIO
 from logging import getLogger
 from os import getenv
@@ -11,10 +12,18 @@ from discord import AllowedMentions, File, Game, Intents
 from discord.ext import commands
 
 from cogs import extension
-from lib import Context, Embed, Help, split_line
+from lib import (
+    Context, Embed, EmbedPaginator, EmbedTemplate, ErrorAggregator, ErrorEntry, Help, Metrics, MetricsServer, help_cache,
+    iter_chunks,
+)
+from lib.database import Database, migrate_hot_keys, shcema
+from lib.market import AccountCache, Exchange, MarketSnapshot, RateHistory, SettlementEngine, currency_index, leaderboards
 
 logger = getLogger(__name__)
 
+TRACEBACK_MESSAGES = 3  # longer tracebacks of digest are sent as file
+DIGEST_LINES = 20  # errors listed in digest, in order of count
+
 
 class Bot(commands.Bot):
     def __init__(self):
@@ -32,7 +41,42 @@ class Bot(commands.Bot):
             intents=intents,
         )
 
-        self.__default_embed: Embed= Embed(color=self.default_embed_color)
+        self.__default_embed = EmbedTemplate(Embed(color=self.default_embed_color))
+        shcema.promote_keys(getenv('CURRENCY_HOT_KEYS', ''))  # before tables are used
+        self.db = Database.from_env()
+        self.accounts = AccountCache(
+            self.db,
+            max_size=int(getenv('ACCOUNT_CACHE_SIZE', 10000)),
+            flush_interval=float(getenv('ACCOUNT_FLUSH_INTERVAL', 5.0)),
+        )
+        self.exchange = Exchange(self.db)
+        self.rate_history = RateHistory(
+            self.db,
+            tick_retention=timedelta(days=float(getenv('RATE_TICK_RETENTION_DAYS', 7))),
+        )
+        self.market = MarketSnapshot(
+            self.db,
+            getenv('SNAPSHOT_DIR', 'data'),
+            interval=float(getenv('SNAPSHOT_INTERVAL', 300.0)),
+            fsync=getenv('SNAPSHOT_FSYNC', '1') != '0',
+        )
+        self.settlement = SettlementEngine(
+            self.db,
+            self.accounts,
+            interval=float(getenv('SETTLEMENT_INTERVAL', 3600.0)),
+        )
+        self.error_aggregator = ErrorAggregator(
+            self.send_error_digest,
+            interval=float(getenv('ERROR_DIGEST_INTERVAL', 60.0)),
+            max_size=int(getenv('ERROR_DIGEST_SIZE', 256)),
+        )
+        self.metrics = Metrics(lag_interval=float(getenv('METRICS_LAG_INTERVAL', 1.0)))
+        self.before_invoke(self.metrics.before_invoke)
+        self._add_gauges()
+        metrics_port = getenv('METRICS_PORT')
+        self.metrics_server = None if not metrics_port else MetricsServer(
+            self.metrics, int(metrics_port), getenv('METRICS_HOST', '127.0.0.1')
+        )
 
         for cog in extension:
             self.load_extension(cog)
@@ -43,11 +87,85 @@ class Bot(commands.Bot):
 
     @property
     def default_embed(self)-> Embed:
-        return self.__default_embed.copy()
+        return self.__default_embed.build()
+
+    def _add_gauges(self):
+        gauge = self.metrics.gauge
+
+        def counter(name: str, help: str, func):
+            gauge(name, help, func, 'counter')
+
+        pool = self.db.engine.pool
+        gauge('discord_gateway_latency_seconds', 'latency between heartbeat and its ack.', lambda: self.latency)
+        gauge('db_pool_size', 'connections kept in pool.', pool.size)
+        gauge('db_pool_checked_out', 'connections in use.', pool.checkedout)
+        gauge('db_pool_overflow', 'connections opened over pool size.', pool.overflow)
+        counter('db_pool_wait_seconds_total', 'time waiting for connection.', lambda: self.db.stats.pool_wait.total)
+        counter('db_query_seconds_total', 'time of queries.', lambda: self.db.stats.query.total)
+        counter('db_queries_total', 'count of queries.', lambda: self.db.stats.query.count)
+        counter('ledger_batches_total', 'committed ledger batches.', lambda: self.db.ledger.stats.batches)
+        counter('ledger_transfers_total', 'committed transfers.', lambda: self.db.ledger.stats.transfers)
+        gauge('account_cache_size', 'cached accounts.', lambda: len(self.accounts))
+        gauge('account_cache_dirty', 'accounts not flushed yet.', lambda: self.accounts.dirty_count)
+        counter('account_cache_hits_total', 'account cache hits.', lambda: self.accounts.hits)
+        counter('account_cache_misses_total', 'account cache misses.', lambda: self.accounts.misses)
+        gauge('currency_index_size', 'indexed currencies.', lambda: len(currency_index))
+        counter('leaderboard_rebuilds_total', 'leaderboards loaded from database.', lambda: leaderboards.rebuilds)
+        counter('help_cache_hits_total', 'help found rendered.', lambda: help_cache.hits)
+        counter('help_cache_misses_total', 'help rendered.', lambda: help_cache.misses)
+        counter('errors_recorded_total', 'errors recorded for digests.', lambda: self.error_aggregator.recorded)
+        gauge('error_fingerprints', 'kinds of errors kept for digests.', lambda: len(self.error_aggregator))
 
     def run(self):
         return super().run(getenv('DISCORD_BOT_TOKEN'))
 
+    async def prepare(self):
+        """create tables which do not exist yet, add columns of hot keys and recover market. called by `start`."""
+        await self.db.create_all()
+        await migrate_hot_keys(self.db)
+        await self.market.recover()
+
+    async def start(self, *args, **kwargs):
+        await self.prepare()
+        self.accounts.flusher.start()
+        self.rate_history.pruner.start()
+        self.market.snapshotter.start()
+        self.settlement.settler.start()
+        self.metrics.sampler.start()
+        self.error_aggregator.digester.start()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+        await super().start(*args, **kwargs)
+
+    async def close(self):
+        await super().close()
+        self.accounts.flusher.cancel()
+        self.rate_history.pruner.cancel()
+        self.market.snapshotter.cancel()
+        self.settlement.settler.cancel()
+        self.metrics.sampler.cancel()
+        self.error_aggregator.digester.cancel()
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+        await self.accounts.flush()
+        await self.db.ledger.drain()
+        if self.market.state is not None:
+            await self.market.write()
+        self.market.close()
+        await self.db.close()
+
+    async def get_context(self, message, *, cls=Context)-> Context:
+        return await super().get_context(message, cls=cls)
+
+    async def invoke(self, ctx: Context):
+        try:
+            async with self.db.unit_of_work() as uow:
+                await super().invoke(ctx)
+                if ctx.command_failed:
+                    uow.rollback()
+        finally:
+            self.metrics.after_invoke(ctx)
+
     async def on_ready(self):
         logger.info('login success')
         await self.change_presence(activity=Game('/help'))
@@ -61,27 +179,51 @@ class Bot(commands.Bot):
         if isinstance(exc, commands.MissingRequiredArgument):
             await ctx.re_error(f'`{exc.param.name}`は必須です。')
             return
-        log_msg = f'Ignoring exception in command {ctx.command}:'
-        err_msg = f'{log_msg}\n{"".join(traceback.format_exception(type(exc), exc, exc.__traceback__))}'
-        logger.exception(log_msg, exc_info=exc)
-        if len(err_msg) < 5000:
-            embed = self.default_embed
-            embed.title = 'traceback (on_command_error)'
-            for msg in split_line(err_msg, 1000):
-                embed.add_field(name='traceback', value=f'```py\n{msg}\n```', inline=False)
-            await self.get_user(self.owner_id).send(embed=embed)
-        else:
-            await self.get_user(self.owner_id).send(file=File(fp=StringIO(err_msg), filename='tb_command_error.py'))
+        if isinstance(exc, commands.BadArgument):
+            await ctx.re_error(str(exc))
+            return
+        self.record_error(exc, f'command {ctx.command}', f'Ignoring exception in command {ctx.command}:')
 
     async def on_error(self, event_method, *args, **kwargs):
-        log_msg = f'Ignoring exception in {event_method}:'
-        err_msg = f'{log_msg}\n{traceback.format_exc()}'
-        logger.exception(log_msg)
-        if len(err_msg) < 5000:
-            embed = self.default_embed
-            embed.title = 'traceback (on_error)'
-            for msg in split_line(err_msg, 1000):
-                embed.add_field(name='traceback', value=f'```py\n{msg}\n```', inline=False)
-            await self.get_user(self.owner_id).send(embed=embed)
+        self.record_error(sys.exc_info()[1], f'event {event_method}', f'Ignoring exception in {event_method}:')
+
+    def record_error(self, exc: BaseException, where: str, log_msg: str):
+        """count `exc` for next digest to owner. traceback is logged only for first one of its fingerprint."""
+        entry = self.error_aggregator.record(exc, where)
+        if entry.count == 1:
+            logger.error(log_msg, exc_info=exc)
+        else:
+            logger.warning(f'{log_msg} {type(exc).__name__}: {str(exc)[:200]} (x{entry.count}, {entry.fingerprint})')
+
+    async def send_error_digest(self, entries: list[ErrorEntry], dropped: int)-> bool:
+        """send digest of `error_aggregator` to owner. tracebacks of new fingerprints are sent as pages of embeds,
+        or as one file if they need over `TRACEBACK_MESSAGES` messages.
+        """
+        owner = self.get_user(self.owner_id) if self.owner_id is not None else None
+        if owner is None:  # not ready
+            return False
+        entries = sorted(entries, key=lambda entry: entry.pending, reverse=True)
+        lines = [
+            f'`{entry.fingerprint}` x{entry.pending} ({entry.count} in total) {entry.where}: {entry.summary[:200]}'
+            for entry in entries[:DIGEST_LINES]
+        ]
+        if len(entries) > DIGEST_LINES:
+            lines.append(f'and {len(entries) - DIGEST_LINES} more kinds of errors')
+        if dropped:
+            lines.append(f'{dropped} kinds of errors are dropped from store')
+        embed = self.default_embed
+        embed.title = f'errors ({sum(entry.pending for entry in entries)})'
+        summary = '\n'.join(lines)
+        new = [entry for entry in entries if not entry.reported]
+        paginator = EmbedPaginator(embed).add_chunks('errors', iter_chunks(summary, 1000), inline=False)
+        for entry in new:
+            paginator.add_chunks(
+                f'traceback `{entry.fingerprint}`', iter_chunks(entry.traceback, 1000), prefix='```py\n', suffix='\n```'
+            )
+        if len(paginator.messages()) <= TRACEBACK_MESSAGES:
+            await paginator.send(owner)
         else:
-            await self.get_user(self.owner_id).send(file=File(fp=StringIO(err_msg), filename='tb_error.py'))
+            text = '\n\n'.join(f'# {entry.fingerprint} {entry.where}\n{entry.traceback}' for entry in new)
+            paginator = EmbedPaginator(embed).add_chunks('errors', iter_chunks(summary, 1000), inline=False)
+            await paginator.send(owner, files=[File(fp=StringIO(text), filename='tracebacks.py')])
+        return True
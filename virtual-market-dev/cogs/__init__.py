@@ -2,6 +2,7 @@ __all__ = ('extension',)
 
 my_extension = tuple(
     f'{__name__}.{name}' for name in (
+        'market',
         'owner',
     )
 )
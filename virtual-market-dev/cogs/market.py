@@ -2,17 +2,126 @@ from __future__ import annotations
 
 
 from logging import getLogger
+from typing import TYPE_CHECKING, Optional
 
 
-from discord.ext import commands
+from discord.ext import commands, menus
+
+from lib.market import Account, Currency, account_ids, currency_index, leaderboards
+
+if TYPE_CHECKING:
+    from bot import Bot
+    from lib import Context, Embed
 
 
 logger = getLogger(__name__)
 
 
+class CurrencyConverter(commands.Converter):
+    """c_id, code or name of currency. it is resolved from `currency_index`, not from database."""
+
+    async def convert(self, ctx: Context, argument: str)-> Currency:
+        return await ctx.memoize(('currency', argument.casefold()), lambda: self.resolve(ctx, argument))
+
+    async def resolve(self, ctx: Context, argument: str)-> Currency:
+        currency = await currency_index.resolve(ctx.bot.db, argument)
+        if currency is not None:
+            return currency
+        suggestions = await currency_index.suggest(ctx.bot.db, argument)
+        message = f'通貨`{argument}`は見つかりません。'
+        if suggestions:
+            message += ' もしかして: ' + ', '.join(f'`{c.code}` ({c.name})' for c in suggestions)
+        raise commands.BadArgument(message)
+
+
+class AccountConverter(commands.Converter):
+    """account id (`123` or `#123`), or `member:currency`.
+    member is author if it is omitted (`:currency`), and currency can be omitted if member has only one account.
+    ids of `member:currency` are kept in `account_ids` across invocations, and accounts are from `Bot.accounts`.
+    """
+
+    async def convert(self, ctx: Context, argument: str)-> Account:
+        if ':' not in argument and argument.lstrip('#').isdecimal():
+            return await self.by_id(ctx, int(argument.lstrip('#')))
+        member_part, _, currency_part = argument.rpartition(':') if ':' in argument else (argument, '', '')
+        if member_part:
+            member = await ctx.memoize(
+                ('member', member_part), lambda: commands.MemberConverter().convert(ctx, member_part)
+            )
+        else:
+            member = ctx.author
+        currency = await CurrencyConverter().convert(ctx, currency_part) if currency_part else None
+        c_id = None if currency is None else currency.c_id
+        ids = await ctx.memoize(('account_ids', member.id, c_id), lambda: self.ids_of(ctx, member.id, c_id))
+        if not ids:
+            raise commands.BadArgument(f'{member.display_name}の口座は見つかりません。')
+        if len(ids) > 1:
+            raise commands.BadArgument(f'{member.display_name}は複数の口座を持っています。`member:通貨`で指定してください。')
+        return await self.by_id(ctx, ids[0])
+
+    async def by_id(self, ctx: Context, id: int)-> Account:
+        account = await ctx.memoize(('account', id), lambda: ctx.bot.accounts.get(id))
+        if account is None:
+            raise commands.BadArgument(f'口座`#{id}`は見つかりません。')
+        return account
+
+    async def ids_of(self, ctx: Context, owner_id: int, c_id: Optional[int])-> list[int]:
+        ids = account_ids.get((owner_id, c_id))
+        if ids is None:
+            ids = await Account.ids_of(ctx.bot.db, owner_id, c_id)
+            if ids:  # new account can be made soon, so missing is not kept
+                account_ids.set((owner_id, c_id), ids)
+        return ids
+
+
+class LeaderboardSource(menus.ListPageSource):
+    """pages of `(account id, balance)` ranking. owner of account is read from `Bot.accounts` at each page."""
+
+    def __init__(self, title: str, currency: Currency, entries: list[tuple[int, int]], per_page: int= 10):
+        super().__init__(entries, per_page=per_page)
+        self.title = title
+        self.currency = currency
+
+    async def format_page(self, menu: menus.MenuPages, entries: list[tuple[int, int]])-> Embed:
+        ctx: Context = menu.ctx
+        offset = menu.current_page * self.per_page
+        lines = []
+        for rank, (id, balance) in enumerate(entries, start=offset + 1):
+            account = await ctx.bot.accounts.get(id)
+            owner = '?' if account is None else f'<@{account.owner_id}>'
+            lines.append(f'`{rank:>3}.` {owner} `#{id}` {balance:,} {self.currency.code}')
+        embed = ctx._info(title=self.title, description='\n'.join(lines))
+        embed.set_footer(text=f'{menu.current_page + 1}/{self.get_max_pages()}')
+        return embed
+
+
 class Market(commands.Cog):
-    def __init__(self, bot):
+    def __init__(self, bot: Bot):
         self.bot = bot
+        ids = account_ids
+        bot.metrics.gauge('account_id_cache_hits_total', 'account id cache hits.', lambda: ids.hits, 'counter')
+        bot.metrics.gauge('account_id_cache_misses_total', 'account id cache misses.', lambda: ids.misses, 'counter')
+
+    def cog_unload(self):
+        self.bot.metrics.remove_gauge('account_id_cache_hits_total')
+        self.bot.metrics.remove_gauge('account_id_cache_misses_total')
+
+    @commands.command()
+    async def top(self, ctx: 'Context', currency: CurrencyConverter, bank_id: Optional[int]= None):
+        """show accounts of largest balance of currency.
+        Args:
+            currency (str): c_id, code or name of currency.
+            bank_id (int): rank only accounts in this bank.
+        """
+        entries = await leaderboards.top(self.bot.db, currency.c_id, bank_id=bank_id, limit=leaderboards.size)
+        if not entries:
+            await ctx.re_info(f'{currency.name}の口座はありません。')
+            return
+        title = f'{currency.name} ({currency.code}) 残高ランキング'
+        if bank_id is not None:
+            title += f' 銀行#{bank_id}'
+        pages = menus.MenuPages(LeaderboardSource(title, currency, entries), clear_reactions_after=True)
+        await pages.start(ctx)
 
 
 def setup(bot):
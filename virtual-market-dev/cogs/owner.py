@@ -8,17 +8,22 @@ from pprint import pformat
 from textwrap import indent
 from typing import TYPE_CHECKING
 
-from lib.util import split_line
+from lib.database import rebuild_summary
+from lib.market import account_locks, currency_index
+from lib import EmbedPaginator, help_cache
+from lib.util import iter_chunks
 from discord.ext import commands
 from discord.file import File
 
 if TYPE_CHECKING:
     from bot import Bot
-    from lib import Context, Embed
+    from lib import Context
 
 
 logger = getLogger(__name__)
 
+INLINE_LIMIT = 6000  # longer output of eval is sent as file
+
 
 class Owner(commands.Cog):
     def __init__(self, bot: Bot):
@@ -49,8 +54,13 @@ class Owner(commands.Cog):
             if not args_:
                 args_ = exts
             args_.sort()
-            for ext in args_:
-                self.bot.reload_extension(ext)
+            await self.bot.accounts.flush()
+            currency_index.invalidate()
+            try:
+                for ext in args_:
+                    self.bot.reload_extension(ext)
+            finally:  # extensions before failed one are reloaded
+                help_cache.invalidate()
         args_string = ', '.join(args_)
         logger.info(f'reload success {args_string}')
         await ctx.success(title='reload success', description=args_string, delete_after=10.0)
@@ -73,7 +83,7 @@ class Owner(commands.Cog):
         env.update(globals())
         code = self.cleanup_code(code)
         func_code = f'async def func():\n{indent(code,"    ")}'
-        embed: Embed = self.bot.default_embed
+        paginator = EmbedPaginator(self.bot.default_embed)
         stdout = StringIO()
         files = []
         try:
@@ -83,9 +93,8 @@ class Owner(commands.Cog):
                 returned = await func()
         except Exception:
             string = traceback.format_exc()
-            if len(string) < 2000:
-                for msg in split_line(string, 1000):
-                    embed.add_field(name='traceback', value=f'```py\n{msg}\n```', inline=False)
+            if len(string) < INLINE_LIMIT:
+                paginator.add_chunks('traceback', iter_chunks(string, 1000), prefix='```py\n', suffix='\n```')
             else:
                 files.append(File(fp=StringIO(string), filename='traceback.py'))
         else:
@@ -97,25 +106,20 @@ class Owner(commands.Cog):
                 self._last_result = returned
                 if not isinstance(returned, str):
                     returned = pformat(returned, indent=1, compact=True)
-                if len(returned) < 2000:
-                    for msg in split_line(returned, 1000):
-                        embed.add_field(name='return', value=f'```py\n{msg}```', inline=False)
+                if len(returned) < INLINE_LIMIT:
+                    paginator.add_chunks('return', iter_chunks(returned, 1000), prefix='```py\n', suffix='\n```')
                 else:
                     files.append(File(fp=StringIO(returned), filename='returned.py'))
         finally:
             stdouted = stdout.getvalue()
             if stdouted:
-                if len(stdouted) < 2000:
-                    for msg in split_line(stdouted, 1000):
-                        embed.add_field(name='stdout', value=f'```py\n{msg}```', inline=False)
-                elif stdouted:
-                    files.append(File(fp=StringIO(stdout), filename='stdout.py'))
-            elif not embed:
-                if not files:
-                    embed.add_field(name='anything', value='No data', inline=False)
+                if len(stdouted) < INLINE_LIMIT:
+                    paginator.add_chunks('stdout', iter_chunks(stdouted, 1000), prefix='```py\n', suffix='\n```')
                 else:
-                    embed.description = 'see files'
-            await ctx.reply(embed=embed, files=files)
+                    files.append(File(fp=StringIO(stdouted), filename='stdout.py'))
+            elif not paginator:
+                paginator.add_field(name='anything', value='see files' if files else 'No data', inline=False)
+            await paginator.send(ctx.channel, reference=ctx.message, files=files or None)
 
     @commands.command(aliases=['ext'])
     async def extensions(self, ctx: 'Context'):
@@ -125,6 +129,82 @@ class Owner(commands.Cog):
             description='\n'.join(sorted([f'`{s}`' for s in self.bot.extensions.keys()]))
         )
 
+    @commands.command(aliases=['db'])
+    async def dbstats(self, ctx: 'Context', reset: bool= False):
+        """get pool wait time and query time.
+        Args:
+            reset (bool): reset stats after show.
+        """
+        stats = self.bot.db.stats
+        await ctx.info(
+            title='database stats',
+            description=(
+                f'pool: `{stats.pool_status()}`\n'
+                f'pool wait: `{stats.pool_wait}`\n'
+                f'query: `{stats.query}`\n'
+                f'ledger: `{self.bot.db.ledger.stats}`'
+            )
+        )
+        if reset:
+            stats.reset()
+            self.bot.db.ledger.stats.reset()
+
+    @commands.command()
+    async def metrics(self, ctx: 'Context', reset: bool= False):
+        """get command latency, event loop lag, gateway latency and hit rate of caches.
+        Args:
+            reset (bool): reset command latency and event loop lag after show.
+        """
+        metrics = self.bot.metrics
+        gauges = metrics.read_gauges()
+
+        def rate(name: str)-> str:
+            hits, misses = gauges.get(f'{name}_hits_total', 0), gauges.get(f'{name}_misses_total', 0)
+            return f'{hits / (hits + misses):.1%} of {hits + misses:.0f}' if hits + misses else 'no lookup'
+
+        lines = [f'`{name}`: {histogram}' for name, histogram in metrics.slowest()]
+        await ctx.info(
+            title='metrics',
+            description=(
+                f'gateway latency: `{self.bot.latency * 1000:.1f}ms`\n'
+                f'event loop lag: `{metrics.loop_lag}`\n'
+                f'db pool: `{self.bot.db.stats.pool_status()}`\n'
+                f'account cache: `{rate("account_cache")}`\n'
+                f'account id cache: `{rate("account_id_cache")}`\n'
+                f'errors: `{sum(metrics.errors.values())}`\n'
+                + ('\n'.join(lines) or 'no command')
+            )
+        )
+        if reset:
+            metrics.reset()
+
+    @commands.command()
+    async def locks(self, ctx: 'Context', reset: bool= False):
+        """get wait time of account locks.
+        Args:
+            reset (bool): reset stats after show.
+        """
+        lines = [f'`{id}`: {timing}' for id, timing in account_locks.most_contended()]
+        await ctx.info(
+            title='account locks',
+            description=(
+                f'live locks: `{len(account_locks)}`\n'
+                f'contended wait: `{account_locks.wait}`\n'
+                + ('\n'.join(lines) or 'no contention')
+            )
+        )
+        if reset:
+            account_locks.reset()
+
+    @commands.command(name='rebuild_summary')
+    async def rebuild_summary_(self, ctx: 'Context'):
+        """regenerate ledger summary from whole ledger. transfers while rebuilding may be counted wrongly."""
+        if not await ctx.confirm(title='rebuild ledger summary?', description='this scans whole ledger.'):
+            return
+        await self.bot.db.ledger.drain()
+        count = await rebuild_summary(self.bot.db)
+        await ctx.success(title='rebuild success', description=f'{count} rows')
+
 
 def setup(bot: Bot):
     bot.add_cog(Owner(bot))
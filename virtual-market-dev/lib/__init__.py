@@ -1,6 +1,8 @@
 from .context import *
+from .errors import *
 from .help_command import *
+from .metrics import *
 from .util import *
 from .wraped_embed import *
 
-__all__ = context.__all__ + help_command.__all__ + util.__all__ + wraped_embed.__all__
+__all__ = context.__all__ + errors.__all__ + help_command.__all__ + metrics.__all__ + util.__all__ + wraped_embed.__all__
@@ -1,17 +1,27 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import Any, Awaitable, Callable, Hashable, Optional, TypeVar
 
 from discord import Colour, Guild, Message
 from discord.abc import Messageable
 from discord.ext import menus
 from discord.ext.commands import Context as _Context
 
-from .wraped_embed import Embed
+from .database import find_unit_of_work
+
+from .wraped_embed import Embed, EmbedTemplate
 
 __all__ = ('Context', )
 
 
+T = TypeVar('T')
+
+SUCCESS = EmbedTemplate(Embed(colour=Colour.green()), '\u2705 ')
+ERROR = EmbedTemplate(Embed(colour=Colour.dark_red()), '\u26a0 ')
+INFO = EmbedTemplate(Embed(colour=Colour.blue()), '\u2139\ufe0f ')
+CONFIRM = EmbedTemplate(Embed(colour=Colour.gold()), '\u2754 ')
+
+
 class Confirm(menus.Menu):
     def __init__(self, title: str, description: str= None):
         super().__init__(timeout=None, delete_message_after=True)
@@ -44,8 +54,34 @@ class Context(_Context):
 
     def __init__(self, **attrs):
         self.invoked_error = False
+        self.memo: dict[Hashable, Any]= {}
+        self.invoked_at: Optional[float]= None  # set by `Metrics.before_invoke`
         super().__init__(**attrs)
 
+    async def commit(self):
+        """commit unit of work of this invocation, so its locks are released before waiting discord.
+        it is called before every reply and confirm. changes of failed command are not committed.
+        """
+        uow = find_unit_of_work()
+        if uow is not None and not self.command_failed:
+            await uow.commit()
+
+    async def send(self, *args, **kwargs)-> Message:
+        await self.commit()
+        return await super().send(*args, **kwargs)
+
+    async def reply(self, *args, **kwargs)-> Message:
+        await self.commit()
+        return await super().reply(*args, **kwargs)
+
+    async def memoize(self, key: Hashable, factory: Callable[[], Awaitable[T]])-> T:
+        """`await factory()` only at first call with `key` in this invocation."""
+        try:
+            return self.memo[key]
+        except KeyError:
+            value = self.memo[key] = await factory()
+            return value
+
     @property
     def invoked_error(self)-> bool:
         return self.__invoked_error and self.command_failed
@@ -55,32 +91,16 @@ class Context(_Context):
         self.__invoked_error = bool(value)
 
     def _success(self, title: str, description: str= None)-> Embed:
-        return Embed(
-            title=f'\u2705 {title!s}',
-            description=description if description is not None else '',
-            colour=Colour.green()
-        )
+        return SUCCESS.build(title=title, description=description if description is not None else '')
 
     def _error(self, title: str, description: str= None)-> Embed:
-        return Embed(
-            title=f'\u26a0 {title!s}',
-            description=description if description is not None else '',
-            colour=Colour.dark_red()
-        )
+        return ERROR.build(title=title, description=description if description is not None else '')
 
     def _info(self, title: str, description: str= None)-> Embed:
-        return Embed(
-            title=f'\u2139\ufe0f {title!s}',
-            description=description if description is not None else '',
-            colour=Colour.blue()
-        )
+        return INFO.build(title=title, description=description if description is not None else '')
 
     def _confirm(self, title: str, description: str= None)-> Embed:
-        return Embed(
-            title=f'\u2754 {title!s}',
-            description=description if description is not None else '',
-            color=Colour.gold()
-        )
+        return CONFIRM.build(title=title, description=description if description is not None else '')
 
     async def embed(self, embed: Embed, **kwargs)-> Message:
         return await self.send(embed=embed, **kwargs)
@@ -107,4 +127,5 @@ class Context(_Context):
         return await self.re_embed(self._info(title=title, description=description), **kwargs)
 
     async def confirm(self, title: str, description: str= None)-> bool:
+        await self.commit()
         return await Confirm(title=title, description=description).send(self)
@@ -0,0 +1,17 @@
+from .backend import *
+from .engine import *
+from .journal import *
+from .ledger import *
+from .migration import *
+from .snowflake import *
+from .summary import *
+
+__all__ = (
+    backend.__all__
+    + engine.__all__
+    + journal.__all__
+    + ledger.__all__
+    + migration.__all__
+    + snowflake.__all__
+    + summary.__all__
+)
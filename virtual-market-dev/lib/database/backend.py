@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Union
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+if TYPE_CHECKING:
+    from sqlalchemy import Table
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+__all__ = ('Backend', 'PostgresBackend', 'SQLiteBackend', 'upsert')
+
+
+class Backend(ABC):
+    """database specific part of `Database`: engine creation, tuning and dialect statements.
+    subclasses are chosen by backend name of url, see `Backend.from_url()`, and must define `create_engine` and `insert`.
+    """
+
+    name: str
+    driver: str  # async driver used when url has no driver
+    _backends: dict[str, type[Backend]]= {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        Backend._backends[cls.name] = cls
+
+    def __init__(self, url: URL):
+        if '+' not in url.drivername:
+            url = url.set(drivername=f'{url.drivername}+{self.driver}')
+        self.url = url
+
+    @classmethod
+    def from_url(cls, url: Union[str, URL])-> Backend:
+        """
+        Raises:
+            ValueError: backend of url is not supported.
+        """
+        url = make_url(url)
+        backend = cls._backends.get(url.get_backend_name())
+        if backend is None:
+            raise ValueError(f'database {url.get_backend_name()} is not supported')
+        return backend(url)
+
+    @abstractmethod
+    def create_engine(
+        self,
+        *,
+        pool_size: int,
+        max_overflow: int,
+        pool_timeout: float,
+        statement_cache_size: int,
+    )-> AsyncEngine:
+        ...
+
+    @staticmethod
+    @abstractmethod
+    def insert(table: Table):
+        """insert statement which has `on_conflict_do_update()`."""
+
+    def close(self):
+        """called after engine is disposed."""
+
+
+class PostgresBackend(Backend):
+    name = 'postgresql'
+    driver = 'asyncpg'
+
+    def create_engine(self, *, pool_size, max_overflow, pool_timeout, statement_cache_size):
+        connect_args = {}
+        if self.url.get_driver_name() == 'asyncpg':
+            connect_args['prepared_statement_cache_size'] = statement_cache_size
+        return create_async_engine(
+            self.url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_pre_ping=True,
+            query_cache_size=statement_cache_size,
+            connect_args=connect_args,
+        )
+
+    insert = staticmethod(postgresql.insert)
+
+
+class SQLiteBackend(Backend):
+    """sqlite file in WAL mode, for tests, benchmarks and small deployment in one process.
+    `:memory:` is a temporary file with no sync, removed at close.
+    memory database of sqlite is per connection, so it can not be used by pool.
+    writes are already batched by `LedgerWriter` and `AccountCache`,
+    so this makes each commit cheap (synchronous=NORMAL, which syncs at checkpoint only in WAL mode).
+    """
+
+    name = 'sqlite'
+    driver = 'aiosqlite'
+
+    def __init__(self, url: URL):
+        super().__init__(url)
+        self._temporary = None
+        self.pragmas = {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 30000,
+            'cache_size': -65536,  # KiB
+            'temp_store': 'MEMORY',
+        }
+        if self.url.database in (None, '', ':memory:'):
+            fd, self._temporary = tempfile.mkstemp(suffix='.db', prefix='market-')
+            os.close(fd)
+            self.url = self.url.set(database=self._temporary)
+            self.pragmas['synchronous'] = 'OFF'
+
+    def create_engine(self, *, pool_size, max_overflow, pool_timeout, statement_cache_size):
+        engine = create_async_engine(
+            self.url,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            query_cache_size=statement_cache_size,
+        )
+        event.listen(engine.sync_engine, 'connect', self._on_connect)
+        return engine
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for key, value in self.pragmas.items():
+            cursor.execute(f'PRAGMA {key}={value}')
+        cursor.close()
+
+    insert = staticmethod(sqlite.insert)
+
+    def close(self):
+        if self._temporary is not None:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(self._temporary + suffix)
+                except FileNotFoundError:
+                    pass
+            self._temporary = None
+
+
+def upsert(conn: AsyncConnection, table: Table):
+    """insert statement of dialect of `conn`, which has `on_conflict_do_update()`."""
+    return Backend._backends[conn.dialect.name].insert(table)
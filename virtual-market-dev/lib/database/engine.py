@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from logging import getLogger
+from os import getenv
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, Iterable, Optional
+
+from sqlalchemy import bindparam, event, insert, update
+
+from .backend import Backend
+from .journal import Journal, Written
+from .ledger import LedgerWriter
+from .shcema import Base
+from .stats import Timing
+
+if TYPE_CHECKING:
+    from sqlalchemy import Table
+    from sqlalchemy.engine import Result
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+    from .ledger import Transfer
+
+__all__ = ('Database', 'DatabaseStats', 'Timing', 'UnitOfWork', 'current_unit_of_work', 'find_unit_of_work')
+
+
+logger = getLogger(__name__)
+
+_current_uow: ContextVar[Optional[UnitOfWork]]= ContextVar('current_uow', default=None)
+
+
+def current_unit_of_work()-> UnitOfWork:
+    """return the unit of work of running task.
+    Raises:
+        RuntimeError: not in `Database.unit_of_work()`.
+    """
+    uow = _current_uow.get()
+    if uow is None:
+        raise RuntimeError('save() must be called in Database.unit_of_work()')
+    return uow
+
+
+def find_unit_of_work()-> Optional[UnitOfWork]:
+    """return the unit of work of running task, or None if it is not in `Database.unit_of_work()`."""
+    return _current_uow.get()
+
+
+class DatabaseStats:
+    """pool wait time and query time of one `Database`."""
+
+    def __init__(self, engine: AsyncEngine):
+        self._engine = engine
+        self.pool_wait = Timing()
+        self.query = Timing()
+
+    def pool_status(self)-> str:
+        return self._engine.pool.status()
+
+    def reset(self):
+        self.pool_wait.reset()
+        self.query.reset()
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.query.add(perf_counter() - conn.info['query_start'].pop())
+
+
+class UnitOfWork:
+    """collect every `save()` and transfer of one command, and write them in one transaction at commit.
+    command commits before it replies (see `Context.commit()`), so locks are not held while it talks to discord.
+    in-memory changes are reverted by `on_rollback()` hooks if it is rollbacked or fails to commit.
+    connection is checked out from pool at first use, not at start.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._conn: Optional[AsyncConnection]= None
+        self._pending: dict[int, Any]= {}
+        self._deferred: list[Callable[[AsyncConnection], Awaitable[Any]]]= []
+        self._transfers: list[Transfer]= []
+        self._entries: list[dict[str, Any]]= []
+        self._written: list[Written]= []
+        self._stack = AsyncExitStack()
+        self._after_commit: list[Callable[[], Any]]= []
+        self._on_rollback: list[Callable[[], Any]]= []
+        self._rollbacked = False
+
+    def add(self, obj: Any):
+        self._pending[id(obj)] = obj
+
+    def defer(self, func: Callable[[AsyncConnection], Awaitable[Any]]):
+        """call `func` with connection at flush, after pending saves."""
+        self._deferred.append(func)
+
+    def submit(self, *transfers: Transfer):
+        """write `transfers` to ledger at flush, instead of `LedgerWriter.submit()`."""
+        self._transfers.extend(transfers)
+
+    async def hold(self, context: AsyncContextManager[Any])-> Any:
+        """enter `context` (e.g. locks of accounts) now, and exit it at commit or close."""
+        return await self._stack.enter_async_context(context)
+
+    def after_commit(self, func: Callable[[], Any]):
+        """call `func` after commit, e.g. to update in-memory index by saved objects. it is not called if rollbacked."""
+        self._after_commit.append(func)
+
+    def on_rollback(self, func: Callable[[], Any]):
+        """call `func` if this is rollbacked or not committed, e.g. to revert in-memory changes.
+        they are called in reverse order.
+        """
+        self._on_rollback.append(func)
+
+    def rollback(self):
+        """drop pending saves. statements already executed are rollbacked at close."""
+        self._pending.clear()
+        self._deferred.clear()
+        self._transfers.clear()
+        self._after_commit.clear()
+        self._rollbacked = True
+        self._run_hooks(reversed(self._on_rollback))
+        self._on_rollback.clear()
+
+    async def connection(self)-> AsyncConnection:
+        if self._conn is None:
+            self._conn = await self.db.connect()
+            await self._conn.begin()
+        return self._conn
+
+    async def flush(self):
+        if not self._pending and not self._deferred and not self._transfers:
+            return
+        conn = await self.connection()
+        by_table: dict[Table, list[Any]]= {}
+        for obj in self._pending.values():
+            by_table.setdefault(obj.__table__, []).append(obj)
+        deferred, self._deferred = self._deferred, []
+        transfers, self._transfers = self._transfers, []
+        self._pending.clear()
+        for table, objs in by_table.items():
+            self._written.extend(await persist(conn, table, objs))
+        self._entries.extend(await self.db.ledger.write(conn, transfers))
+        for func in deferred:
+            await func(conn)
+
+    async def commit(self):
+        """write every change in one transaction, and exit held contexts.
+        this can be used again after commit, and later changes are written in next transaction.
+        """
+        if self._rollbacked:
+            return
+        await self.flush()
+        if self._conn is not None:
+            await self._commit()
+            conn, self._conn = self._conn, None
+            await conn.close()
+        self._entries.clear()
+        self._written.clear()
+        self._on_rollback.clear()
+        hooks, self._after_commit = self._after_commit, []
+        self._run_hooks(hooks)
+        stack, self._stack = self._stack, AsyncExitStack()
+        await stack.aclose()
+
+    async def _commit(self):
+        journal = self.db.journal
+        lsn = None
+        if journal is not None and (self._entries or self._written):
+            lsn = await journal.prepare(self._entries, self._written)
+        try:
+            await self._conn.commit()
+        except BaseException:
+            if lsn is not None:
+                journal.abort(lsn)
+            raise
+        if lsn is not None:
+            journal.commit(lsn)
+
+    async def close(self):
+        self._pending.clear()
+        self._deferred.clear()
+        self._transfers.clear()
+        self._entries.clear()
+        self._written.clear()
+        self._after_commit.clear()
+        if self._on_rollback:  # not committed
+            self._run_hooks(reversed(self._on_rollback))
+            self._on_rollback.clear()
+        try:
+            if self._conn is not None:
+                await self._conn.close()  # rollback if not committed
+                self._conn = None
+        finally:
+            await self._stack.aclose()
+
+    @staticmethod
+    def _run_hooks(hooks: Iterable[Callable[[], Any]]):
+        for func in hooks:
+            try:
+                func()
+            except Exception:
+                logger.exception(f'failed to run hook {func!r} of unit of work')
+
+
+async def persist(conn: AsyncConnection, table: Table, objs: list[Any])-> list[Written]:
+    """insert new objects one by one (to get id), and update others by one executemany per set of columns,
+    since `to_row()` may leave out columns which are not changed.
+    return written rows for `Journal`.
+    """
+    written: list[Written]= []
+    olds: dict[tuple[str, ...], list[tuple[Any, dict[str, Any]]]]= {}
+    for obj in objs:
+        row = obj.to_row()
+        if obj.id is None:
+            result = await conn.execute(insert(table).values(row).returning(table.c.id))
+            obj.id = result.scalar_one()
+            written.append((table, {'id': obj.id, **row}, True))
+        else:
+            olds.setdefault(tuple(row), []).append((obj, row))
+    for group in olds.values():
+        await conn.execute(
+            update(table).where(table.c.id == bindparam('_id')),
+            [{'_id': obj.id, **row} for obj, row in group]
+        )
+        written.extend((table, {'id': obj.id, **row}, False) for obj, row in group)
+    return written
+
+
+class Database:
+    """async engine with bounded pool and statement cache.
+    Args:
+        url (str): sqlalchemy url of postgresql or sqlite (see `Backend`).
+            async driver is used if url has no driver (e.g. postgresql+asyncpg, sqlite+aiosqlite).
+        pool_size (int): connections kept in pool.
+        max_overflow (int): connections can be opened over pool_size.
+        pool_timeout (float): seconds to wait for free connection.
+        statement_cache_size (int): size of compiled statement cache and asyncpg prepared statement cache.
+        ledger_window (float): see `LedgerWriter`.
+        ledger_max_batch (int): see `LedgerWriter`.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        pool_size: int= 5,
+        max_overflow: int= 10,
+        pool_timeout: float= 30.0,
+        statement_cache_size: int= 500,
+        ledger_window: float= 0.002,
+        ledger_max_batch: int= 1000,
+    ):
+        self.backend = Backend.from_url(url)
+        self.engine: AsyncEngine= self.backend.create_engine(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            statement_cache_size=statement_cache_size,
+        )
+        self.stats = DatabaseStats(self.engine)
+        event.listen(self.engine.sync_engine, 'before_cursor_execute', self.stats._before_execute)
+        event.listen(self.engine.sync_engine, 'after_cursor_execute', self.stats._after_execute)
+        self.ledger = LedgerWriter(self, window=ledger_window, max_batch=ledger_max_batch)
+        self.journal: Optional[Journal]= None
+
+    @classmethod
+    def from_env(cls)-> Database:
+        return cls(
+            getenv('DATABASE_URL', 'sqlite:///data/market.db'),
+            pool_size=int(getenv('DATABASE_POOL_SIZE', 5)),
+            max_overflow=int(getenv('DATABASE_MAX_OVERFLOW', 10)),
+            pool_timeout=float(getenv('DATABASE_POOL_TIMEOUT', 30.0)),
+            statement_cache_size=int(getenv('DATABASE_STATEMENT_CACHE_SIZE', 500)),
+            ledger_window=float(getenv('LEDGER_WINDOW', 0.002)),
+            ledger_max_batch=int(getenv('LEDGER_MAX_BATCH', 1000)),
+        )
+
+    async def connect(self)-> AsyncConnection:
+        start = perf_counter()
+        conn = await self.engine.connect()
+        self.stats.pool_wait.add(perf_counter() - start)
+        return conn
+
+    @asynccontextmanager
+    async def unit_of_work(self)-> AsyncIterator[UnitOfWork]:
+        """nested call joins outer unit of work."""
+        uow = _current_uow.get()
+        if uow is not None:
+            yield uow
+            return
+        uow = UnitOfWork(self)
+        token = _current_uow.set(uow)
+        try:
+            yield uow
+            await uow.commit()
+        finally:
+            _current_uow.reset(token)
+            await uow.close()
+
+    async def execute(self, statement, parameters=None)-> Result:
+        """execute in current unit of work, or in own transaction if there is not."""
+        uow = _current_uow.get()
+        if uow is not None:
+            conn = await uow.connection()
+            return await conn.execute(statement, parameters)
+        async with self.transaction() as conn:
+            return await conn.execute(statement, parameters)
+
+    @asynccontextmanager
+    async def transaction(self)-> AsyncIterator[AsyncConnection]:
+        """connection with own transaction, independent from unit of work."""
+        conn = await self.connect()
+        try:
+            async with conn.begin():
+                yield conn
+        finally:
+            await conn.close()
+
+    async def create_all(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def close(self):
+        await self.ledger.drain()
+        await self.engine.dispose()
+        self.backend.close()
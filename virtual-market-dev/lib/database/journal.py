@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Optional, Protocol, Sequence
+
+if TYPE_CHECKING:
+    from sqlalchemy import Table
+
+__all__ = ('Journal', 'Written')
+
+
+Written = tuple['Table', dict[str, Any], bool]  # table, row with id, and whether it is inserted
+
+
+class Journal(Protocol):
+    """log of committed writes, told around commit of `UnitOfWork` and `LedgerWriter`.
+    `prepare()` is awaited just before commit, and one of `commit()` or `abort()` is called after it.
+    outcome of prepared one is unknown if process dies between them.
+    """
+
+    async def prepare(self, entries: Sequence[dict[str, Any]], rows: Sequence[Written])-> Optional[int]:
+        """return id of this write, or None if there is nothing to log."""
+        ...
+
+    def commit(self, lsn: int):
+        ...
+
+    def abort(self, lsn: int):
+        ...
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+from logging import getLogger
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Iterable, Optional, Protocol
+
+from sqlalchemy import bindparam, insert, update
+
+from ..util import wait_through_cancel
+from . import shcema
+from .stats import Timing
+from .summary import apply_summary, summarize
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncConnection
+
+    from .engine import Database
+
+__all__ = ('LedgerWriter', 'LedgerStats')
+
+
+logger = getLogger(__name__)
+
+class Transfer(Protocol):
+    def entries(self)-> Iterable[dict[str, Any]]:
+        ...
+
+    def deltas(self)-> Iterable[tuple[int, int]]:
+        ...
+
+
+class LedgerStats:
+    def __init__(self):
+        self.batches = 0
+        self.transfers = 0
+        self.commit = Timing()
+
+    @property
+    def average_batch(self)-> float:
+        return self.transfers / self.batches if self.batches else 0.0
+
+    def reset(self):
+        self.batches = 0
+        self.transfers = 0
+        self.commit.reset()
+
+    def __str__(self)-> str:
+        return f'{self.batches} batches, avg {self.average_batch:.1f} transfers, commit {self.commit}'
+
+
+class LedgerWriter:
+    """group commit of transfers.
+    transfers submitted while waiting `window` seconds (or until `max_batch`) are written in one transaction,
+    with one executemany insert to ledger, one balance update per touched account
+    and one summary update per touched bucket.
+    only one batch is committed at a time, so batch grows while database is slow.
+    Args:
+        db (Database): database to write.
+        window (float): seconds to wait other transfers after first one.
+        max_batch (int): max count of `submit()` calls in one batch.
+    """
+
+    def __init__(self, db: Database, *, window: float= 0.002, max_batch: int= 1000):
+        self.db = db
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = LedgerStats()
+        self._queue: list[tuple[tuple[Transfer, ...], asyncio.Future]]= []
+        self._worker: Optional[asyncio.Task]= None
+
+    async def submit(self, *transfers: Transfer):
+        """wait until `transfers` are committed. they are always in same batch.
+        if caller is cancelled, this still waits the batch, and raises `CancelledError` only if it is written.
+        so callers revert their changes on `Exception`, not on `BaseException`.
+        Raises:
+            Exception: raised while committing the batch. no entry of the batch is written.
+            CancelledError: caller is cancelled. transfers are written.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((transfers, future))
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+        await wait_through_cancel(future)
+
+    async def drain(self):
+        """wait until all submitted transfers are committed."""
+        while self._worker is not None:
+            await asyncio.shield(self._worker)
+
+    async def _run(self):
+        try:
+            while self._queue:
+                if len(self._queue) < self.max_batch:
+                    await asyncio.sleep(self.window)
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                await self._commit(batch)
+        except BaseException:
+            batch, self._queue = self._queue, []
+            self._fail(batch)
+            raise
+        finally:
+            self._worker = None
+
+    @staticmethod
+    async def write(conn: AsyncConnection, transfers: Iterable[Transfer])-> list[dict[str, Any]]:
+        """insert ledger entries of `transfers` and apply them to balances and summary in transaction of `conn`.
+        return the entries for `Journal`. `UnitOfWork` writes its transfers by this too.
+        """
+        entries = []
+        deltas: dict[int, int]= {}
+        for transfer in transfers:
+            entries.extend(transfer.entries())
+            for account_id, delta in transfer.deltas():
+                deltas[account_id] = deltas.get(account_id, 0) + delta
+        if not entries:
+            return entries
+        account = shcema.Account.__table__
+        await conn.execute(insert(shcema.Ledger.__table__), entries)
+        # sorted to lock rows in same order as other writers
+        params = [{'_id': k, 'delta': v} for k, v in sorted(deltas.items()) if v]
+        if params:
+            await conn.execute(
+                update(account)
+                .where(account.c.id == bindparam('_id'))
+                .values(balance=account.c.balance + bindparam('delta')),
+                params,
+            )
+        await apply_summary(conn, summarize(entries))
+        return entries
+
+    async def _commit(self, batch: list[tuple[tuple[Transfer, ...], asyncio.Future]]):
+        journal = self.db.journal
+        lsn = None
+        start = perf_counter()
+        try:
+            async with self.db.transaction() as conn:
+                entries = await self.write(conn, (transfer for transfers, _ in batch for transfer in transfers))
+                if journal is not None:
+                    lsn = await journal.prepare(entries, ())
+        except Exception as exc:
+            if lsn is not None:
+                journal.abort(lsn)
+            logger.exception(f'failed to commit batch of {len(batch)} submissions')
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        except BaseException:
+            if lsn is not None:
+                journal.abort(lsn)
+            self._fail(batch)
+            raise
+        else:
+            if lsn is not None:
+                journal.commit(lsn)
+            self.stats.commit.add(perf_counter() - start)
+            self.stats.batches += 1
+            self.stats.transfers += sum(len(transfers) for transfers, _ in batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    @staticmethod
+    def _fail(batch: list[tuple[tuple[Transfer, ...], asyncio.Future]]):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(RuntimeError('transfers are not written, since ledger writer is cancelled'))
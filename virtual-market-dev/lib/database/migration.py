@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from logging import getLogger
+from typing import TYPE_CHECKING
+
+from sqlalchemy import Boolean, Float, Integer, inspect, text, update
+from sqlalchemy.schema import CreateColumn
+
+from . import shcema
+
+if TYPE_CHECKING:
+    from sqlalchemy import Column
+
+    from .engine import Database
+
+__all__ = ('migrate_hot_keys',)
+
+
+logger = getLogger(__name__)
+
+currency = shcema.Currency.__table__
+
+
+def _extract(key: str, column: Column):
+    """typed value of `key` in ext, as sql expression."""
+    value = currency.c.ext[key]
+    if isinstance(column.type, Boolean):
+        return value.as_boolean()
+    if isinstance(column.type, Integer):
+        return value.as_integer()
+    if isinstance(column.type, Float):
+        return value.as_float()
+    return value.as_string()
+
+
+async def migrate_hot_keys(db: Database, *, backfill: bool= False)-> dict[str, int]:
+    """add columns and indexes of `Currency.hot_keys` which are not in database, and fill new columns from ext.
+    return key to count of filled rows. it does nothing if table is not created yet.
+    Args:
+        backfill (bool): fill existing columns too, e.g. after ext is written by other program.
+    """
+    filled: dict[str, int]= {}
+    async with db.transaction() as conn:
+        columns = await conn.run_sync(
+            lambda sync: {c['name'] for c in inspect(sync).get_columns('currency')}
+            if inspect(sync).has_table('currency') else None
+        )
+        if columns is None:
+            return filled
+        for key, column in shcema.Currency.hot_keys.items():
+            new = column.name not in columns
+            if new:
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                await conn.execute(text(f'ALTER TABLE currency ADD COLUMN {ddl}'))
+            for index in currency.indexes:
+                if column.name in index.columns:
+                    await conn.run_sync(index.create, checkfirst=True)
+            if new or backfill:
+                result = await conn.execute(update(currency).values({column: _extract(key, column)}))
+                filled[key] = result.rowcount
+                logger.info(f'filled {result.rowcount} rows of currency.{column.name}')
+        if conn.dialect.name == 'postgresql':
+            await conn.execute(text(shcema.CURRENCY_EXT_GIN))
+    return filled
@@ -1,10 +1,12 @@
-from sqlalchemy import BigInteger, Column, DateTime, Integer, String, Float, func
+from sqlalchemy import DDL, JSON, BigInteger, Boolean, Column, DateTime, Index, Integer, String, Float, event, func
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.declarative import declarative_base
 
 
 Base = declarative_base()
 
+Json = JSON().with_variant(postgresql.JSONB(), 'postgresql') #JSONB on postgresql, JSON (text) on others
+
 
 class Currency(Base):
     __tablename__ = "currency"
@@ -20,4 +22,122 @@ class Currency(Base):
     created_at = Column(DateTime, server_default=func.now())
     amount = Column(BigInteger) #amount of all currency. can inclease by owner.
 
-    ext = Column(postgresql.JSONB) #for addtional informations storage. this column must be use dict like.
+    ext = Column(Json) #for addtional informations storage. this column must be use dict like.
+
+    hot_keys = {} #key of ext to its column. see promote_key
+
+
+#for containment query (ext @> '{...}') of any key on postgresql. other databases scan ext.
+CURRENCY_EXT_GIN = 'CREATE INDEX IF NOT EXISTS ix_currency_ext ON currency USING gin (ext jsonb_path_ops)'
+event.listen(Currency.__table__, 'after_create', DDL(CURRENCY_EXT_GIN).execute_if(dialect='postgresql'))
+
+
+def promote_key(key: str, type_)-> Column:
+    """declare hot key of `Currency.ext`, which is filtered or sorted by query.
+    it is copied to indexed column `ext_<key>` of `type_` at every write, and ext is still the source of truth.
+    this must be called at import before tables are used. existing table needs `migrate_hot_keys()`.
+    key which is already promoted is not promoted again.
+    """
+    if key in Currency.hot_keys:
+        return Currency.hot_keys[key]
+    column = Column(f'ext_{key}', type_)
+    Currency.__table__.append_column(column)
+    Index(f'ix_currency_ext_{key}', column)
+    Currency.hot_keys[key] = column
+    return column
+
+
+HOT_KEY_TYPES = {'int': BigInteger, 'float': Float, 'str': String, 'bool': Boolean}
+
+
+def promote_keys(spec: str)-> list:
+    """promote keys declared as `key:type,key:type`, e.g. from env `CURRENCY_HOT_KEYS`.
+    type is one of `HOT_KEY_TYPES`, and `str` if it is omitted.
+    """
+    columns = []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        key, _, type_name = item.partition(':')
+        type_ = HOT_KEY_TYPES.get(type_name.strip() or 'str')
+        if type_ is None:
+            raise ValueError(f'unknown type of hot key {key.strip()!r}: {type_name}')
+        columns.append(promote_key(key.strip(), type_))
+    return columns
+
+
+class Bank(Base):
+    __tablename__ = "bank"
+
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(BigInteger)
+
+    name = Column(String) #name of bank
+    created_at = Column(DateTime, server_default=func.now())
+
+    ext = Column(Json) #same as Currency.ext
+
+
+class Account(Base):
+    __tablename__ = "account"
+
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(BigInteger, index=True) #discord user id
+    bank_id = Column(Integer, index=True)
+    c_id = Column(Integer) #currency of this account. one account has one currency.
+
+    balance = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+
+    ext = Column(Json) #same as Currency.ext
+
+
+class Ledger(Base):
+    __tablename__ = "ledger"
+    #append only. one transfer is written as two entries (debit and credit) with same transfer_id.
+
+    transfer_id = Column(BigInteger, primary_key=True) #snowflake, ordered by time
+    account_id = Column(Integer, primary_key=True, index=True)
+    counter_id = Column(Integer) #account of other side
+    bank_id = Column(Integer)
+    c_id = Column(Integer)
+
+    amount = Column(BigInteger) #credit is positive, debit is negative. sum of one transfer is 0 if not exchanged.
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class LedgerSummary(Base):
+    __tablename__ = "ledger_summary"
+    #materialized from ledger. updated with every ledger write, and can be rebuilt from ledger.
+
+    bank_id = Column(Integer, primary_key=True)
+    c_id = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True) #first transfer_id of period
+
+    volume = Column(BigInteger, nullable=False, default=0) #sum of debit amount
+    count = Column(Integer, nullable=False, default=0) #count of debit entries
+
+
+class RateTick(Base):
+    __tablename__ = "rate_tick"
+    #every change of Currency.rate. dropped after retention window.
+
+    id = Column(Integer, primary_key=True)
+    c_id = Column(Integer, index=True)
+    at = Column(BigInteger, index=True) #unix ms
+    rate = Column(Float(asdecimal=True))
+
+
+class RateCandle(Base):
+    __tablename__ = "rate_candle"
+    #ohlc of RateTick, updated with every tick.
+
+    c_id = Column(Integer, primary_key=True)
+    resolution = Column(Integer, primary_key=True) #seconds. 60, 3600 or 86400
+    bucket = Column(BigInteger, primary_key=True) #start of period in unix ms
+
+    open = Column(Float(asdecimal=True))
+    high = Column(Float(asdecimal=True))
+    low = Column(Float(asdecimal=True))
+    close = Column(Float(asdecimal=True))
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from time import time
+
+__all__ = ('TRANSFER_EPOCH', 'SEQUENCE_BITS', 'next_transfer_id', 'transfer_id_at', 'time_of_transfer_id')
+
+
+TRANSFER_EPOCH = 1609459200000  # 2021-01-01T00:00:00Z in ms
+SEQUENCE_BITS = 22
+_last_ms = 0
+_sequence = 0
+
+
+def next_transfer_id()-> int:
+    """snowflake like id. upper bits are ms from `TRANSFER_EPOCH`, lower 22 bits are sequence in same ms."""
+    global _last_ms, _sequence
+    ms = int(time() * 1000) - TRANSFER_EPOCH
+    if ms <= _last_ms:
+        _sequence += 1
+        if _sequence >> SEQUENCE_BITS:
+            _last_ms += 1
+            _sequence = 0
+        ms = _last_ms
+    else:
+        _last_ms = ms
+        _sequence = 0
+    return ms << SEQUENCE_BITS | _sequence
+
+
+def transfer_id_at(dt: datetime)-> int:
+    """smallest transfer id at `dt`."""
+    return (int(dt.timestamp() * 1000) - TRANSFER_EPOCH) << SEQUENCE_BITS
+
+
+def time_of_transfer_id(transfer_id: int)-> datetime:
+    return datetime.fromtimestamp(((transfer_id >> SEQUENCE_BITS) + TRANSFER_EPOCH) / 1000, timezone.utc)
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+__all__ = ('Timing',)
+
+
+class Timing:
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, elapsed: float):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    @property
+    def average(self)-> float:
+        return self.total / self.count if self.count else 0.0
+
+    def __str__(self)-> str:
+        return f'{self.count} times, avg {self.average * 1000:.2f}ms, max {self.max * 1000:.2f}ms'
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Iterable, Optional
+
+from sqlalchemy import delete, func, insert, select
+
+from . import shcema
+from .backend import upsert
+from .snowflake import SEQUENCE_BITS, transfer_id_at
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncConnection
+
+    from .engine import Database
+
+__all__ = ('BUCKET_MS', 'bucket_of', 'summarize', 'apply_summary', 'rebuild_summary', 'read_summary')
+
+
+BUCKET_MS = 60 * 60 * 1000  # one hour
+# bucket is first transfer id of period. TRANSFER_EPOCH is on the hour, so buckets are on the hour too.
+_BUCKET_SPAN = BUCKET_MS << SEQUENCE_BITS
+
+summary = shcema.LedgerSummary.__table__
+ledger = shcema.Ledger.__table__
+
+
+def bucket_of(transfer_id: int)-> int:
+    return transfer_id - transfer_id % _BUCKET_SPAN
+
+
+def summarize(entries: Iterable[dict[str, Any]])-> dict[tuple[int, int, int], list[int]]:
+    """`(bank_id, c_id, bucket)` to `[volume, count]` of debit entries.
+    entries without counter account (`counter_id` is 0, like fee of settlement) are not transfers, and are not counted.
+    """
+    sums: dict[tuple[int, int, int], list[int]]= {}
+    for entry in entries:
+        amount = entry['amount']
+        if amount >= 0 or not entry['counter_id']:
+            continue
+        key = (entry['bank_id'], entry['c_id'], bucket_of(entry['transfer_id']))
+        value = sums.get(key)
+        if value is None:
+            sums[key] = [-amount, 1]
+        else:
+            value[0] -= amount
+            value[1] += 1
+    return sums
+
+
+async def apply_summary(conn: AsyncConnection, sums: dict[tuple[int, int, int], list[int]]):
+    """add `sums` to summary table. must be called in same transaction as ledger insert."""
+    if not sums:
+        return
+    stmt = upsert(conn, summary)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[summary.c.bank_id, summary.c.c_id, summary.c.bucket],
+        set_={
+            'volume': summary.c.volume + stmt.excluded.volume,
+            'count': summary.c.count + stmt.excluded.count,
+        },
+    )
+    await conn.execute(stmt, [
+        {'bank_id': bank_id, 'c_id': c_id, 'bucket': bucket, 'volume': volume, 'count': count}
+        for (bank_id, c_id, bucket), (volume, count) in sorted(sums.items())
+    ])
+
+
+async def rebuild_summary(db: Database)-> int:
+    """regenerate summary table from whole ledger, and return count of rows."""
+    bucket = ledger.c.transfer_id - ledger.c.transfer_id % _BUCKET_SPAN
+    async with db.transaction() as conn:
+        await conn.execute(delete(summary))
+        await conn.execute(
+            insert(summary).from_select(
+                ['bank_id', 'c_id', 'bucket', 'volume', 'count'],
+                select(ledger.c.bank_id, ledger.c.c_id, bucket, func.sum(-ledger.c.amount), func.count())
+                .where(ledger.c.amount < 0, ledger.c.counter_id != 0)
+                .group_by(ledger.c.bank_id, ledger.c.c_id, bucket)
+            )
+        )
+        result = await conn.execute(select(func.count()).select_from(summary))
+        return result.scalar_one()
+
+
+async def read_summary(
+    db: Database,
+    bank_id: int,
+    since: Optional[datetime]= None,
+    until: Optional[datetime]= None,
+)-> dict[int, tuple[int, int]]:
+    """c_id to `(volume, count)` of buckets overlapping `[since, until)`."""
+    stmt = (
+        select(summary.c.c_id, func.sum(summary.c.volume), func.sum(summary.c.count))
+        .where(summary.c.bank_id == bank_id)
+        .group_by(summary.c.c_id)
+    )
+    if since is not None:
+        stmt = stmt.where(summary.c.bucket >= bucket_of(transfer_id_at(since)))
+    if until is not None:
+        stmt = stmt.where(summary.c.bucket < transfer_id_at(until))
+    result = await db.execute(stmt)
+    return {c_id: (int(volume), int(count)) for c_id, volume, count in result}
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import traceback
+from collections import OrderedDict
+from hashlib import sha1
+from logging import getLogger
+from time import time
+from typing import Awaitable, Callable
+
+from discord.ext import tasks
+
+__all__ = ('ErrorEntry', 'ErrorAggregator')
+
+
+logger = getLogger(__name__)
+
+STACK_DEPTH = 3  # innermost frames which tell where error is raised
+
+
+def fingerprint(exc: BaseException)-> str:
+    """short hash of type of `exc` and innermost frames of its traceback.
+    `original` of `CommandInvokeError` is used, so errors of one place have one fingerprint in any command.
+    """
+    exc = getattr(exc, 'original', exc)
+    frames = []
+    tb = exc.__traceback__
+    while tb is not None:
+        code = tb.tb_frame.f_code
+        frames.append((code.co_filename, code.co_name, tb.tb_lineno))
+        tb = tb.tb_next
+    key = (type(exc).__module__, type(exc).__qualname__, frames[-STACK_DEPTH:])
+    return sha1(repr(key).encode()).hexdigest()[:10]
+
+
+class ErrorEntry:
+    """errors of one fingerprint. traceback is of first one, and it is formatted only then."""
+
+    __slots__ = (
+        'fingerprint', 'where', 'summary', 'traceback', 'count', 'pending', 'reported', 'first_seen', 'last_seen'
+    )
+
+    def __init__(self, fingerprint: str, where: str, exc: BaseException):
+        self.fingerprint = fingerprint
+        self.where = where
+        self.summary = f'{type(exc).__name__}: {exc}'
+        self.traceback = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+        self.count = 0
+        self.pending = 0  # count since last digest
+        self.reported = False  # traceback is in some digest
+        self.first_seen = self.last_seen = time()
+
+
+class ErrorAggregator:
+    """errors of bot grouped by fingerprint, and sent as one digest every `interval` seconds.
+    digest has errors which happened since last one, with counts, and traceback of fingerprints which are new.
+    at most `max_size` fingerprints are kept, and least recently seen one is dropped over it.
+    Args:
+        report (Callable): coroutine function which sends entries of digest and count of dropped fingerprints.
+            it returns False if it can not send now, then entries are sent in next digest.
+        interval (float): seconds between digests.
+        max_size (int): max count of kept fingerprints.
+    """
+
+    def __init__(
+        self,
+        report: Callable[[list[ErrorEntry], int], Awaitable[bool]],
+        *,
+        interval: float= 60.0,
+        max_size: int= 256
+    ):
+        self.report = report
+        self.max_size = max_size
+        self.recorded = 0
+        self.dropped = 0
+        self._dropped_pending = 0
+        self._entries: OrderedDict[str, ErrorEntry]= OrderedDict()
+        self.digester = tasks.loop(seconds=interval)(self._periodic_digest)
+
+    def __len__(self)-> int:
+        return len(self._entries)
+
+    def record(self, exc: BaseException, where: str)-> ErrorEntry:
+        """count `exc`, which happened in `where` (e.g. name of command or event)."""
+        key = fingerprint(exc)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = ErrorEntry(key, where, exc)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.dropped += 1
+                self._dropped_pending += 1
+        else:
+            self._entries.move_to_end(key)
+            entry.last_seen = time()
+        entry.count += 1
+        entry.pending += 1
+        self.recorded += 1
+        return entry
+
+    def pending(self)-> list[ErrorEntry]:
+        """entries which happened since last digest, in order of first seen."""
+        return sorted((entry for entry in self._entries.values() if entry.pending), key=lambda entry: entry.first_seen)
+
+    async def digest(self)-> bool:
+        """send digest now. False if nothing is sent.
+        errors which are recorded while it is sent are kept for next digest.
+        """
+        entries = self.pending()
+        dropped = self._dropped_pending
+        if not entries and not dropped:
+            return False
+        counts = [entry.pending for entry in entries]
+        if not await self.report(entries, dropped):
+            return False
+        for entry, sent in zip(entries, counts):
+            entry.pending -= sent
+            entry.reported = True
+        self._dropped_pending -= dropped
+        return True
+
+    async def _periodic_digest(self):
+        try:
+            await self.digest()
+        except Exception:
+            logger.exception('failed to send error digest, retry at next loop')
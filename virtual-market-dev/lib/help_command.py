@@ -1,13 +1,117 @@
 from __future__ import annotations
 
-from typing import Union
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any, Callable, Iterable, Optional
 
+import discord
 from discord.ext import commands
 
-from .util import split_line
-from .wraped_embed import Embed
+from .util import iter_chunks
+from .wraped_embed import Embed, EmbedPaginator
 
-__all__ = ('Help',)
+__all__ = ('Help', 'HelpCache', 'help_cache')
+
+
+Check = Callable[[commands.Context], Any]
+
+
+class _Plan:
+    """commands of one category, and distinct checks of them.
+    each command has indexes of checks which it needs, so it is visible if every one of them passes.
+    """
+
+    __slots__ = ('checks', 'commands')
+
+    def __init__(self, command_list: Iterable[commands.Command], show_hidden: bool):
+        self.checks: list[tuple[Check, commands.Command]]= []  # check and first command which needs it
+        self.commands: list[tuple[commands.Command, tuple[int, ...]]]= []
+        indexes: dict[Check, int]= {}
+
+        def index(check: Check, command: commands.Command)-> int:
+            if check not in indexes:
+                indexes[check] = len(self.checks)
+                self.checks.append((check, command))
+            return indexes[check]
+
+        for command in command_list:
+            if (command.hidden and not show_hidden) or not command.enabled:
+                continue
+            needs = [index(_global_checks, command)]
+            if command.cog is not None:
+                cog_check = commands.Cog._get_overridden_method(command.cog.cog_check)
+                if cog_check is not None:
+                    needs.append(index(cog_check, command))
+            needs.extend(index(check, command) for check in command.checks)
+            self.commands.append((command, tuple(needs)))
+
+    def visible(self, results: Optional[tuple[bool, ...]])-> list[commands.Command]:
+        """commands which pass checks of `results`. every command is visible if `results` is None."""
+        if results is None:
+            return [command for command, _ in self.commands]
+        return [command for command, needs in self.commands if all(results[i] for i in needs)]
+
+
+async def _global_checks(ctx: commands.Context)-> bool:
+    """global checks (`Bot.check` and `Cog.bot_check`) are run once per help, with first visible command.
+    so they must not depend on `ctx.command`, or help shows same commands for every command.
+    """
+    return await ctx.bot.can_run(ctx)
+
+
+class HelpCache:
+    """rendered help of each cog, group or whole bot, per results of checks which apply to invoker.
+    checks of commands are collected once per category, and each distinct check is run once per help,
+    so help which was rendered before is found without walking commands nor building strings.
+    it must be invalidated when commands are changed, e.g. by `Owner.reload`.
+    global checks and `cog_check` are shared by commands, so they must not depend on `ctx.command`.
+    Args:
+        max_size (int): max count of rendered helps. least recently used one is dropped.
+    """
+
+    def __init__(self, max_size: int= 256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._plans: dict[Hashable, _Plan]= {}
+        self._rendered: OrderedDict[Hashable, Any]= OrderedDict()
+
+    def __len__(self)-> int:
+        return len(self._rendered)
+
+    def invalidate(self):
+        """drop everything. next help collects commands and checks again."""
+        self._plans.clear()
+        self._rendered.clear()
+
+    def plan(
+            self,
+            category: Hashable,
+            command_list: Callable[[], Iterable[commands.Command]],
+            show_hidden: bool
+    )-> _Plan:
+        plan = self._plans.get(category)
+        if plan is None:
+            plan = self._plans[category] = _Plan(command_list(), show_hidden)
+        return plan
+
+    def get(self, key: Hashable)-> Optional[Any]:
+        value = self._rendered.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._rendered.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._rendered[key] = value
+        self._rendered.move_to_end(key)
+        if len(self._rendered) > self.max_size:
+            self._rendered.popitem(last=False)
+
+
+help_cache = HelpCache()
 
 
 class Help(commands.HelpCommand):
@@ -18,11 +122,47 @@ class Help(commands.HelpCommand):
         self.command_attrs["help"] = "このBOTのヘルプコマンドです。"
         self.color: int= int(color)
 
-    async def create_category_tree(self, category: Union[commands.Cog, commands.Group]):
+    async def cached(
+            self,
+            category: Hashable,
+            command_list: Callable[[], Iterable[commands.Command]],
+            render: Callable[[list[commands.Command]], Any]
+    )-> Any:
+        """rendered help of `category` from `help_cache`, or `render(visible commands)` which is cached.
+        same as `filter_commands`, hidden commands are not shown and checks are verified by `verify_checks`.
+        each distinct check (global checks, `cog_check` and checks of commands) is run once,
+        with `ctx.command` of first command which needs it.
+        """
+        plan = help_cache.plan(category, command_list, self.show_hidden)
+        results = await self._check_results(plan)
+        key = (category, results, self.context.prefix, self.context.command.name)
+        rendered = help_cache.get(key)
+        if rendered is None:
+            rendered = render(plan.visible(results))
+            help_cache.set(key, rendered)
+        return rendered
+
+    async def _check_results(self, plan: _Plan)-> Optional[tuple[bool, ...]]:
+        if self.verify_checks is False or (self.verify_checks is None and not self.context.guild):
+            return None
+        ctx = self.context
+        original = ctx.command
+        results = []
+        try:
+            for check, command in plan.checks:
+                ctx.command = command
+                try:
+                    results.append(bool(await discord.utils.maybe_coroutine(check, ctx)))
+                except commands.CommandError:
+                    results.append(False)
+        finally:
+            ctx.command = original
+        return tuple(results)
+
+    def create_category_tree(self, cmds: list[commands.Command])-> str:
+        """commands of cog or group as tree, in order of `walk_commands()`."""
         content_line: list[str]= []
         lv: list[int]= []
-        command_list = category.walk_commands()
-        cmds: list[commands.Command]= await self.filter_commands(command_list, sort=False)
         for cmd in cmds:
             if cmd.root_parent is None:
                 content_line.append(f"`{self.get_command_signature(cmd)}` : {cmd.short_doc}")
@@ -31,46 +171,60 @@ class Help(commands.HelpCommand):
                 indent = '-' * cmd.parents.index(cmd.root_parent)
                 content_line.append(f"{indent}`{self.get_command_signature(cmd)}` : {cmd.short_doc}")
                 lv.append(len(indent))
-        if lv and min(lv):
-            for index, line in enumerate(content_line):
-                if line.startswith('-'*min(lv)):
-                    content_line[index] = line[min(lv):]
+        min_lv = min(lv, default=0)
+        if min_lv:
+            content_line = [line[min_lv:] if line.startswith('-' * min_lv) else line for line in content_line]
         return '\n'.join(content_line) or 'コマンドは存在しません。'
 
     async def send_bot_help(self, mapping):
-        embed = Embed(title='helpコマンド', color=self.color)
-        if self.context:
-            embed.description = self.context.bot.description
-        for cog in mapping:
-            if cog:
-                cog_name = cog.qualified_name
-            else:
-                cog_name = self.no_category
-            command_list = await self.filter_commands(mapping[cog], sort=True)
-            content = ''
-            for cmd in command_list:
-                content += f'`{self.context.prefix}{cmd.name}` - {cmd.short_doc}\n'
-            if content == '':
-                continue
-            for msg in split_line(content, 1000):
-                embed.add_field(name=cog_name, value=msg, inline=False)
-        embed.set_footer(text=self.get_ending_note())
-        await self.get_destination().send(embed=embed)
+        def command_list():
+            return [cmd for cmds in mapping.values() for cmd in cmds]
+
+        def render(cmds: list[commands.Command])-> EmbedPaginator:
+            visible = set(cmds)
+            embed = Embed(title='helpコマンド', color=self.color)
+            if self.context:
+                embed.description = self.context.bot.description
+            embed.set_footer(text=self.get_ending_note())
+            paginator = EmbedPaginator(embed)
+            for cog in mapping:
+                if cog:
+                    cog_name = cog.qualified_name
+                else:
+                    cog_name = self.no_category
+                content = ''
+                for cmd in sorted((cmd for cmd in mapping[cog] if cmd in visible), key=lambda c: c.name):
+                    content += f'`{self.context.prefix}{cmd.name}` - {cmd.short_doc}\n'
+                if content == '':
+                    continue
+                paginator.add_chunks(cog_name, iter_chunks(content, 1000))
+            return paginator
+
+        paginator = await self.cached(('bot',), command_list, render)
+        await paginator.send(self.get_destination())
 
     async def send_cog_help(self, cog):
-        embed = Embed(title=cog.qualified_name, description=cog.description, color=self.color)
-        for tree_str in split_line(await self.create_category_tree(cog), 1000):
-            embed.add_field(name="コマンドリスト", value=tree_str)
-        embed.set_footer(text=self.get_ending_note())
+        def render(cmds: list[commands.Command])-> Embed:
+            embed = Embed(title=cog.qualified_name, description=cog.description, color=self.color)
+            for tree_str in iter_chunks(self.create_category_tree(cmds), 1000):
+                embed.add_field(name="コマンドリスト", value=tree_str)
+            embed.set_footer(text=self.get_ending_note())
+            return embed
+
+        embed = await self.cached(('cog', cog.qualified_name), cog.walk_commands, render)
         await self.get_destination().send(embed=embed)
 
     async def send_group_help(self, group):
-        embed = Embed(title=self.get_command_signature(group), description=group.description, color=self.color)
-        if group.help:
-            embed.add_field(name="ヘルプテキスト", value=group.help, inline=False)
-        for tree_str in split_line(await self.create_category_tree(group), 1000):
-            embed.add_field(name="サブコマンドリスト", value=tree_str, inline=False)
-        embed.set_footer(text=self.get_ending_note())
+        def render(cmds: list[commands.Command])-> Embed:
+            embed = Embed(title=self.get_command_signature(group), description=group.description, color=self.color)
+            if group.help:
+                embed.add_field(name="ヘルプテキスト", value=group.help, inline=False)
+            for tree_str in iter_chunks(self.create_category_tree(cmds), 1000):
+                embed.add_field(name="サブコマンドリスト", value=tree_str, inline=False)
+            embed.set_footer(text=self.get_ending_note())
+            return embed
+
+        embed = await self.cached(('group', group.qualified_name), group.walk_commands, render)
         await self.get_destination().send(embed=embed)
 
     async def send_command_help(self, command):
@@ -1 +1,31 @@
+from .account import *
+from .bank import *
+from .cache import *
+from .columnar import *
+from .currency import *
+from .history import *
+from .instrument import *
+from .leaderboard import *
+from .lock import *
+from .lookup import *
+from .orderbook import *
+from .rate import *
+from .settlement import *
+from .snapshot import *
 
+__all__ = (
+    account.__all__
+    + bank.__all__
+    + cache.__all__
+    + columnar.__all__
+    + currency.__all__
+    + history.__all__
+    + ('instrument',)  # module is shadowed by class of same name
+    + leaderboard.__all__
+    + lock.__all__
+    + lookup.__all__
+    + orderbook.__all__
+    + rate.__all__
+    + settlement.__all__
+    + snapshot.__all__
+)
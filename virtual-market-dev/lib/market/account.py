@@ -1,41 +1,163 @@
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any, Optional
+
+from sqlalchemy import select
+
+from ..database import current_unit_of_work, find_unit_of_work
+from ..database import shcema
+from ..util import TTLCache
+
+if TYPE_CHECKING:
+    from ..database import Database
+    from .cache import AccountCache
+
+__all__ = ('Account', 'account_ids')
+
 
 class Account:
+    __table__ = shcema.Account.__table__
+    __slots__ = (
+        '_db', 'id', 'owner_id', 'bank_id', 'c_id', 'balance', 'created_at', '_ext', '_cache', '_cache_dirty',
+    )
 
     #initialize
 
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        db: Database,
+        *,
+        id: Optional[int]= None,
+        owner_id: int,
+        bank_id: int,
+        c_id: int,
+        balance: int= 0,
+        created_at=None,
+        ext: Optional[dict[str, Any]]= None,
+    ):
+        self._db = db
+        self.id = id
+        self.owner_id = owner_id
+        self.bank_id = bank_id
+        self.c_id = c_id
+        self.balance = balance
+        self.created_at = created_at
+        self._ext: Optional[dict[str, Any]]= dict(ext) if ext else None  # most accounts have no ext
+        self._cache: Optional[AccountCache]= None
+        self._cache_dirty = False
+
+    @classmethod
+    def from_schema(cls, db: Database, column)-> Account:
+        return cls(
+            db,
+            id=column.id,
+            owner_id=column.owner_id,
+            bank_id=column.bank_id,
+            c_id=column.c_id,
+            balance=column.balance,
+            created_at=column.created_at,
+            ext=column.ext,
+        )
+
+    @classmethod
+    def from_new(cls, db: Database, **kwargs)-> Account:
+        """create new account. it is inserted at `save()`.
+        ids of owner in `account_ids` are dropped after commit, so new account is found at once.
+        """
+        self = cls(db, **kwargs)
+        self.save()
+        current_unit_of_work().after_commit(lambda: account_ids.forget(self.owner_id, self.c_id))
+        return self
 
     @classmethod
-    def from_schema(cls, db, column):
-        pass
+    async def get(cls, db: Database, id: int)-> Optional[Account]:
+        result = await db.execute(select(cls.__table__).where(cls.__table__.c.id == id))
+        column = result.first()
+        return None if column is None else cls.from_schema(db, column)
 
     @classmethod
-    def from_new(cls, db):
-        pass
+    async def ids_of(cls, db: Database, owner_id: int, c_id: Optional[int]= None)-> list[int]:
+        """ids of accounts of `owner_id` (in currency `c_id`), in order of creation."""
+        table = cls.__table__
+        stmt = select(table.c.id).where(table.c.owner_id == owner_id).order_by(table.c.id)
+        if c_id is not None:
+            stmt = stmt.where(table.c.c_id == c_id)
+        result = await db.execute(stmt)
+        return list(result.scalars())
 
     #for save
 
+    def to_row(self)-> dict[str, Any]:
+        row = {
+            'owner_id': self.owner_id,
+            'bank_id': self.bank_id,
+            'c_id': self.c_id,
+            'ext': self._ext or {},
+        }
+        if self.id is None:  # after insert, balance is written only by ledger
+            row['balance'] = self.balance
+        return row
+
     def save(self):
-        pass
+        """write by current unit of work. cached account is dropped from cache if it is rollbacked,
+        since it is changed in place. out of unit of work, cached account is written back by `AccountCache.flush()`.
+        """
+        cache = self._cache
+        if cache is not None and find_unit_of_work() is None:
+            cache.mark_dirty(self)
+            return
+        uow = current_unit_of_work()
+        uow.add(self)
+        if cache is not None:
+            uow.on_rollback(lambda: cache.discard(self))
 
     #for property
 
     @property
-    def setting(self):
-        pass
+    def ext(self)-> dict[str, Any]:
+        if self._ext is None:
+            self._ext = {}
+        return self._ext
+
+    @property
+    def setting(self)-> dict[str, Any]:
+        return dict(self._ext or {})
 
     #for setting
 
-    def update_setting(self, new):
-        pass
+    def update_setting(self, new: dict[str, Any]):
+        self.ext.update(new)
+        self.save()
 
     #for transfer
+    #caller must hold `account_locks` of this account while it awaits between check and write.
+
+    def importer(self, new: int):
+        """receive `new` amount."""
+        if new < 0:
+            raise ValueError('amount must not be negative')
+        self.balance += new
+
+    def exporter(self, new: int):
+        """send `new` amount.
+        Raises:
+            ValueError: balance is not enough.
+        """
+        if new < 0:
+            raise ValueError('amount must not be negative')
+        if self.balance < new:
+            raise ValueError('balance is not enough')
+        self.balance -= new
+
+
+class AccountIds(TTLCache[tuple[int, Optional[int]], list[int]]):
+    """ids of accounts by `(owner_id, c_id)`, and by `(owner_id, None)` for every currency.
+    accounts created by `Account.from_new` are dropped at commit. accounts created by other process are found after ttl.
+    """
+
+    def forget(self, owner_id: int, c_id: int):
+        self.pop((owner_id, c_id))
+        self.pop((owner_id, None))
 
-    def importer(self, new):
-        pass
 
-    def exporter(self, new):
-        pass
+account_ids = AccountIds(max_size=4096, ttl=30.0)
@@ -1,43 +1,151 @@
 from __future__ import annotations
 
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Optional
+
+from sqlalchemy import select
+
+from ..database import current_unit_of_work, find_unit_of_work, read_summary
+from ..database import shcema
+from .instrument import instrument
+from .leaderboard import leaderboards
+from .lock import account_locks
+
+if TYPE_CHECKING:
+    from ..database import Database
+    from .account import Account
+
+__all__ = ('Bank',)
+
 
 class Bank:
+    __table__ = shcema.Bank.__table__
+    __slots__ = ('_db', 'id', 'owner_id', 'name', 'created_at', 'ext')
 
     #initialize
 
-    def __init__(self, db):
-        pass
+    def __init__(
+        self,
+        db: Database,
+        *,
+        id: Optional[int]= None,
+        owner_id: int,
+        name: str,
+        created_at=None,
+        ext: Optional[dict[str, Any]]= None,
+    ):
+        self._db = db
+        self.id = id
+        self.owner_id = owner_id
+        self.name = name
+        self.created_at = created_at
+        self.ext: dict[str, Any]= dict(ext or {})
+
+    @classmethod
+    def from_column(cls, db: Database, column)-> Bank:
+        return cls(
+            db,
+            id=column.id,
+            owner_id=column.owner_id,
+            name=column.name,
+            created_at=column.created_at,
+            ext=column.ext,
+        )
 
     @classmethod
-    def from_column(cls, db, column):
-        pass
+    def from_new(cls, db: Database, data: dict[str, Any])-> Bank:
+        """create new bank. it is inserted at `save()`."""
+        self = cls(db, **data)
+        self.save()
+        return self
 
     @classmethod
-    def from_new(cls, data):
-        pass
+    async def get(cls, db: Database, id: int)-> Optional[Bank]:
+        result = await db.execute(select(cls.__table__).where(cls.__table__.c.id == id))
+        column = result.first()
+        return None if column is None else cls.from_column(db, column)
 
     #for save
 
+    def to_row(self)-> dict[str, Any]:
+        return {
+            'owner_id': self.owner_id,
+            'name': self.name,
+            'ext': self.ext,
+        }
+
     def save(self):
-        pass
+        current_unit_of_work().add(self)
 
     #for property
 
     @property
-    def setting(self):
-        pass
+    def setting(self)-> dict[str, Any]:
+        return self.ext.copy()
 
     #for setting
 
-    def update_setting(self, new):
-        pass
+    def update_setting(self, new: dict[str, Any]):
+        self.ext.update(new)
+        self.save()
 
     #for periodically
 
-    def get_log_amount(self):
-        pass
+    async def get_log_amount(
+        self,
+        since: Optional[datetime]= None,
+        until: Optional[datetime]= None,
+    )-> dict[int, tuple[int, int]]:
+        """c_id to `(volume, count)` of transfers from this bank in hour buckets overlapping `[since, until)`.
+        this reads only summary table, not ledger.
+        """
+        return await read_summary(self._db, self.id, since, until)
 
     #for account
 
-    def move(self, before, after, amount):
-        pass
+    async def move(self, before: Account, after: Account, amount: int, *, exchange: bool= False)-> instrument:
+        """move `amount` from `before` to `after`, and wait until it is written to ledger.
+        both accounts are locked until then. balances are restored if writing is failed.
+        if caller is cancelled, it is still written and balances are kept.
+        in unit of work, it is written at commit of it instead, and accounts are locked until it ends
+        (see `AccountLocks.hold_until_end`). balances are restored if it is rollbacked.
+        loaded leaderboards are updated after it is written.
+        Args:
+            exchange (bool): allow `after` to have other currency. see `instrument.from_new`.
+        Raises:
+            ValueError: `before` is not in this bank, currencies are different, or balance is not enough.
+        """
+        if before.bank_id != self.id:
+            raise ValueError('account is not in this bank')
+        transfer = instrument.from_new(self._db, before, after, amount, before.c_id, exchange=exchange)
+        uow = find_unit_of_work()
+        if uow is not None:
+            await account_locks.hold_until_end(uow, before.id, after.id)
+            before.exporter(transfer.amount)
+            after.importer(transfer.to_amount)
+            uow.submit(transfer)
+
+            def revert():
+                before.balance += transfer.amount
+                after.balance -= transfer.to_amount
+
+            def update_boards():
+                leaderboards.update(before)
+                leaderboards.update(after)
+
+            uow.on_rollback(revert)
+            uow.after_commit(update_boards)
+            return transfer
+        async with account_locks.hold(before.id, after.id):
+            before.exporter(transfer.amount)
+            after.importer(transfer.to_amount)
+            try:
+                await transfer.commit()
+            except Exception:
+                before.balance += transfer.amount
+                after.balance -= transfer.to_amount
+                raise
+            finally:
+                leaderboards.update(before)
+                leaderboards.update(after)
+        return transfer
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from logging import getLogger
+from typing import TYPE_CHECKING, Optional
+
+from discord.ext import tasks
+
+from ..database.engine import persist
+from .account import Account
+
+if TYPE_CHECKING:
+    from ..database import Database
+
+__all__ = ('AccountCache',)
+
+
+logger = getLogger(__name__)
+
+
+class AccountCache:
+    """write-back cache of `Account` keyed by account id.
+    `Account.save()` of cached account only marks it dirty,
+    and `flusher` writes dirty rows in one bulk update periodically.
+    Args:
+        db (Database): database to load and flush.
+        max_size (int): max count of cached accounts. least recently used one is evicted.
+        flush_interval (float): seconds between flushes.
+    """
+
+    def __init__(self, db: Database, *, max_size: int= 10000, flush_interval: float= 5.0):
+        self.db = db
+        self.max_size = max_size
+        self._accounts: OrderedDict[int, Account]= OrderedDict()
+        self._dirty: set[int]= set()
+        self._evicted: dict[int, Account]= {}  # evicted but not flushed yet
+        self.hits = 0
+        self.misses = 0
+        self.flusher = tasks.loop(seconds=flush_interval)(self._periodic_flush)
+
+    def __len__(self)-> int:
+        return len(self._accounts)
+
+    def __contains__(self, id: int)-> bool:
+        return id in self._accounts
+
+    @property
+    def dirty_count(self)-> int:
+        return len(self._dirty) + len(self._evicted)
+
+    async def get(self, id: int)-> Optional[Account]:
+        account = self._accounts.get(id)
+        if account is not None:
+            self.hits += 1
+            self._accounts.move_to_end(id)
+            return account
+        self.misses += 1
+        account = self._evicted.pop(id, None)
+        if account is None:
+            account = await Account.get(self.db, id)
+            if account is None:
+                return None
+            cached = self._accounts.get(id)
+            if cached is not None:  # loaded by other task while waiting
+                return cached
+        self.add(account)
+        if account._cache_dirty:
+            self._dirty.add(id)
+        return account
+
+    def peek(self, id: int)-> Optional[Account]:
+        """cached account of `id` (including evicted but not flushed one), without loading nor reordering."""
+        account = self._accounts.get(id)
+        return self._evicted.get(id) if account is None else account
+
+    def add(self, account: Account):
+        """add saved account (its id is not None) to cache."""
+        account._cache = self
+        self._accounts[account.id] = account
+        self._accounts.move_to_end(account.id)
+        while len(self._accounts) > self.max_size:
+            self._evict()
+
+    def _evict(self):
+        id, account = self._accounts.popitem(last=False)
+        if id in self._dirty:
+            self._dirty.discard(id)
+            self._evicted[id] = account
+        else:
+            account._cache = None
+
+    def mark_dirty(self, account: Account):
+        account._cache_dirty = True
+        if account.id in self._accounts:
+            self._dirty.add(account.id)
+        else:
+            self._evicted[account.id] = account
+
+    def discard(self, account: Account):
+        """drop `account`, e.g. its changes are rollbacked. it is loaded again at next `get()`.
+        changes of it which are not flushed yet are dropped too.
+        """
+        if self._accounts.get(account.id) is account:
+            del self._accounts[account.id]
+        elif self._evicted.get(account.id) is not account:
+            return
+        self._evicted.pop(account.id, None)
+        self._dirty.discard(account.id)
+        account._cache = None
+        account._cache_dirty = False
+
+    async def flush(self)-> int:
+        """write dirty accounts in one transaction, and return count of rows."""
+        pending = {id: self._accounts[id] for id in self._dirty if id in self._accounts}
+        pending.update(self._evicted)
+        if not pending:
+            return 0
+        accounts = list(pending.values())
+        dirty, evicted = self._dirty, self._evicted
+        self._dirty, self._evicted = set(), {}
+        for account in accounts:
+            account._cache_dirty = False
+        try:
+            async with self.db.transaction() as conn:
+                await persist(conn, Account.__table__, accounts)
+        except BaseException:
+            for account in accounts:
+                account._cache_dirty = True
+            self._dirty |= dirty
+            self._evicted = {**evicted, **self._evicted}
+            raise
+        for account in evicted.values():
+            if not account._cache_dirty:
+                account._cache = None
+        logger.debug(f'flushed {len(accounts)} accounts')
+        return len(accounts)
+
+    async def _periodic_flush(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception('failed to flush accounts, retry at next loop')
+
+    def clear(self):
+        """drop all cached accounts. call after `flush()`."""
+        for account in self._accounts.values():
+            account._cache = None
+        self._accounts.clear()
+        self._dirty.clear()
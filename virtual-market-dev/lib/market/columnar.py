@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from heapq import nsmallest
+from typing import TYPE_CHECKING, Iterable, Optional
+
+if TYPE_CHECKING:
+    from .account import Account
+
+__all__ = ('AccountColumns',)
+
+
+class AccountColumns:
+    """accounts as typed arrays, for bulk scan of many accounts.
+    rows are sorted by id, so lookup is binary search and no index is kept.
+    this is a read model. `Account` and ledger are still the source of truth.
+    """
+
+    __slots__ = ('ids', 'owner_ids', 'bank_ids', 'c_ids', 'balances')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.owner_ids = array('q')
+        self.bank_ids = array('i')
+        self.c_ids = array('i')
+        self.balances = array('q')
+
+    @classmethod
+    def from_accounts(cls, accounts: Iterable[Account])-> AccountColumns:
+        self = cls()
+        for account in sorted(accounts, key=lambda account: account.id):
+            self.ids.append(account.id)
+            self.owner_ids.append(account.owner_id)
+            self.bank_ids.append(account.bank_id)
+            self.c_ids.append(account.c_id)
+            self.balances.append(account.balance)
+        return self
+
+    def __len__(self)-> int:
+        return len(self.ids)
+
+    def index(self, id: int)-> Optional[int]:
+        index = bisect_left(self.ids, id)
+        if index < len(self.ids) and self.ids[index] == id:
+            return index
+        return None
+
+    def upsert(self, account: Account):
+        """set row of `account`. insert is O(n), so use `from_accounts()` for bulk load."""
+        if not self.insert(account.id, account.owner_id, account.bank_id, account.c_id, account.balance):
+            self.balances[self.index(account.id)] = account.balance
+
+    def insert(self, id: int, owner_id: int, bank_id: int, c_id: int, balance: int)-> bool:
+        """add row if `id` is not in columns, and return whether it is added. this is O(n) too."""
+        index = bisect_left(self.ids, id)
+        if index < len(self.ids) and self.ids[index] == id:
+            return False
+        self.ids.insert(index, id)
+        self.owner_ids.insert(index, owner_id)
+        self.bank_ids.insert(index, bank_id)
+        self.c_ids.insert(index, c_id)
+        self.balances.insert(index, balance)
+        return True
+
+    def balance(self, id: int)-> Optional[int]:
+        index = self.index(id)
+        return None if index is None else self.balances[index]
+
+    def add_balance(self, id: int, delta: int):
+        """
+        Raises:
+            KeyError: account of `id` is not in columns.
+        """
+        index = self.index(id)
+        if index is None:
+            raise KeyError(id)
+        self.balances[index] += delta
+
+    def total(self, c_id: int, bank_id: Optional[int]= None)-> int:
+        """sum of balances of currency `c_id` (in bank `bank_id`)."""
+        balances, c_ids, bank_ids = self.balances, self.c_ids, self.bank_ids
+        if bank_id is None:
+            return sum(b for b, c in zip(balances, c_ids) if c == c_id)
+        return sum(b for b, c, k in zip(balances, c_ids, bank_ids) if c == c_id and k == bank_id)
+
+    def top(self, c_id: int, n: int, bank_id: Optional[int]= None)-> list[tuple[int, int]]:
+        """`(id, balance)` of `n` largest balances of currency `c_id` (in bank `bank_id`), by id for same balance."""
+        rows = zip(self.ids, self.balances, self.c_ids, self.bank_ids)
+        found = nsmallest(n, (
+            (-balance, id) for id, balance, c, k in rows if c == c_id and (bank_id is None or k == bank_id)
+        ))
+        return [(id, -balance) for balance, id in found]
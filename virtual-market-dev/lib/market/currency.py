@@ -1,36 +1,199 @@
 from __future__ import annotations
 
+import json
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+from sqlalchemy import String, select, type_coerce
+from sqlalchemy.dialects import postgresql
+
+from ..database import current_unit_of_work
+from ..database import shcema
+from .history import record_rate
+from .lookup import currency_index
+from .rate import cross_rates
+
+if TYPE_CHECKING:
+    from ..database import Database
+
+__all__ = ('Currency',)
+
 
 class Currency:
+    __table__ = shcema.Currency.__table__
+    __slots__ = (
+        '_db', 'id', 'c_id', 'owner_id', 'bank_id', 'name', 'code', 'rate', 'amount', 'created_at',
+        '_ext', '_ext_raw', '_hot',
+    )
 
     #initialize
 
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        db: Database,
+        *,
+        id: Optional[int]= None,
+        c_id: int,
+        owner_id: int,
+        bank_id: int,
+        name: str,
+        code: str,
+        rate: Decimal,
+        amount: int= 0,
+        created_at=None,
+        ext: Optional[dict[str, Any]]= None,
+    ):
+        self._db = db
+        self.id = id
+        self.c_id = c_id
+        self.owner_id = owner_id
+        self.bank_id = bank_id
+        self.name = name
+        self.code = code
+        self.rate = Decimal(rate)
+        self.amount = amount
+        self.created_at = created_at
+        self._ext: Optional[dict[str, Any]]= dict(ext or {})
+        self._ext_raw: Union[str, dict[str, Any], None]= None  # ext is decoded from this at first use
+        self._hot: dict[str, Any]= {}  # values of hot keys read from their columns
 
     @classmethod
-    def from_schema(cls, db, column):
-        pass
+    def from_schema(cls, db: Database, column)-> Currency:
+        """`column` is a row of `Currency.select()`, or of whole table."""
+        cross_rates.set_rate(column.c_id, column.rate)
+        self = cls(
+            db,
+            id=column.id,
+            c_id=column.c_id,
+            owner_id=column.onwer_id,
+            bank_id=column.bank_id,
+            name=column.name,
+            code=column.code,
+            rate=column.rate,
+            amount=column.amount,
+            created_at=column.created_at,
+        )
+        self._ext = None
+        self._ext_raw = column.ext
+        self._hot = {key: getattr(column, c.name) for key, c in shcema.Currency.hot_keys.items()}
+        return self
 
     @classmethod
-    def from_new(cls, db):
-        pass
+    def from_new(cls, db: Database, **kwargs)-> Currency:
+        """create new currency. it is inserted at `save()`, and its rate is removed if it is rollbacked."""
+        self = cls(db, **kwargs)
+        known = self.c_id in cross_rates
+        cross_rates.set_rate(self.c_id, self.rate)
+        self.save()
+        if not known:
+            current_unit_of_work().on_rollback(lambda: cross_rates.remove(self.c_id))
+        record_rate(self.c_id, self.rate)
+        return self
+
+    @classmethod
+    def select(cls):
+        """select of every column. ext is read as text, so it is not decoded until it is used."""
+        return select(*(
+            type_coerce(column, String).label('ext') if column.name == 'ext' else column
+            for column in cls.__table__.c
+        ))
+
+    @classmethod
+    async def get(cls, db: Database, c_id: int)-> Optional[Currency]:
+        result = await db.execute(cls.select().where(cls.__table__.c.c_id == c_id))
+        column = result.first()
+        return None if column is None else cls.from_schema(db, column)
+
+    @classmethod
+    def ext_condition(cls, db: Database, key: str, value: Any):
+        """where clause of `ext[key] == value`.
+        hot key is searched by index of its column. others use gin index on postgresql, and scan ext on others.
+        """
+        column = shcema.Currency.hot_keys.get(key)
+        if column is not None:
+            return column == value
+        if db.backend.name == 'postgresql':
+            return type_coerce(cls.__table__.c.ext, postgresql.JSONB).contains({key: value})
+        element = cls.__table__.c.ext[key]
+        if isinstance(value, bool):
+            return element.as_boolean() == value
+        if isinstance(value, int):
+            return element.as_integer() == value
+        if isinstance(value, float):
+            return element.as_float() == value
+        return element.as_string() == value
+
+    @classmethod
+    async def find(cls, db: Database, key: str, value: Any)-> list[Currency]:
+        """currencies whose ext has `value` at `key`. see `ext_condition()`."""
+        result = await db.execute(cls.select().where(cls.ext_condition(db, key, value)))
+        return [cls.from_schema(db, column) for column in result]
 
     #for save
 
+    def to_row(self)-> dict[str, Any]:
+        row = {
+            'c_id': self.c_id,
+            'onwer_id': self.owner_id,
+            'bank_id': self.bank_id,
+            'name': self.name,
+            'code': self.code,
+            'rate': self.rate,
+            'amount': self.amount,
+        }
+        if self._ext is not None:  # not decoded means not changed
+            row['ext'] = self._ext
+            for key, column in shcema.Currency.hot_keys.items():
+                row[column.name] = self._ext.get(key)
+        return row
+
     def save(self):
-        pass
+        """write at commit of current unit of work. `currency_index` is updated after commit."""
+        uow = current_unit_of_work()
+        uow.add(self)
+        uow.after_commit(lambda: currency_index.update(self))
+        uow.on_rollback(lambda: currency_index.rollback(self))
 
     #for property
 
     @property
-    def setting(self):
-        pass
+    def ext(self)-> dict[str, Any]:
+        if self._ext is None:
+            raw = self._ext_raw
+            self._ext = (raw if isinstance(raw, dict) else json.loads(raw) if raw else None) or {}
+            self._ext_raw = None
+        return self._ext
+
+    def get_ext(self, key: str, default: Any= None)-> Any:
+        """value of `key` in ext. hot key is read from its column without decoding ext."""
+        if self._ext is None and key in self._hot:
+            value = self._hot[key]
+            return default if value is None else value
+        return self.ext.get(key, default)
+
+    @property
+    def setting(self)-> dict[str, Any]:
+        return self.ext.copy()
 
     #for setting
 
-    def update_setting(self, new):
-        pass
+    def update_setting(self, new: dict[str, Any]):
+        self.ext.update(new)
+        self.save()
+
+    def new_rate(self, new: Decimal):
+        """set rate of this and `cross_rates`. they are restored if unit of work is rollbacked."""
+        new = Decimal(new)
+        if new <= 0:
+            raise ValueError('rate must be positive')
+        old = self.rate
+
+        def revert():
+            self.rate = old
+            cross_rates.set_rate(self.c_id, old)
 
-    def new_rate(self, new):
-        pass
+        self.rate = new
+        cross_rates.set_rate(self.c_id, new)
+        self.save()
+        current_unit_of_work().on_rollback(revert)
+        record_rate(self.c_id, new)
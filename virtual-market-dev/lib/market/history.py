@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from logging import getLogger
+from time import time
+from typing import TYPE_CHECKING, Optional
+
+from discord.ext import tasks
+from sqlalchemy import case, delete, select
+
+from ..database import current_unit_of_work, shcema, upsert
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncConnection
+
+    from ..database import Database
+
+__all__ = ('RESOLUTIONS', 'Candle', 'RateHistory', 'record_rate')
+
+
+logger = getLogger(__name__)
+
+RESOLUTIONS = (60, 3600, 86400)  # 1m, 1h, 1d
+
+tick = shcema.RateTick.__table__
+candle = shcema.RateCandle.__table__
+
+
+class Candle:
+    __slots__ = ('bucket', 'open', 'high', 'low', 'close', 'count')
+
+    def __init__(self, bucket: int, open: Decimal, high: Decimal, low: Decimal, close: Decimal, count: int):
+        self.bucket = bucket
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.count = count
+
+    @property
+    def time(self)-> datetime:
+        return datetime.fromtimestamp(self.bucket / 1000, timezone.utc)
+
+
+def record_rate(c_id: int, rate: Decimal, at: Optional[int]= None):
+    """append tick and update candles of every resolution in current unit of work.
+    Args:
+        at (int): unix ms. now if it is None.
+    """
+    if at is None:
+        at = int(time() * 1000)
+
+    async def write(conn: AsyncConnection):
+        await conn.execute(tick.insert().values(c_id=c_id, at=at, rate=rate))
+        stmt = upsert(conn, candle)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[candle.c.c_id, candle.c.resolution, candle.c.bucket],
+            set_={
+                'high': case((excluded.high > candle.c.high, excluded.high), else_=candle.c.high),
+                'low': case((excluded.low < candle.c.low, excluded.low), else_=candle.c.low),
+                'close': excluded.close,
+                'count': candle.c.count + 1,
+            },
+        )
+        await conn.execute(stmt, [
+            {
+                'c_id': c_id,
+                'resolution': resolution,
+                'bucket': at - at % (resolution * 1000),
+                'open': rate,
+                'high': rate,
+                'low': rate,
+                'close': rate,
+                'count': 1,
+            }
+            for resolution in RESOLUTIONS
+        ])
+
+    current_unit_of_work().defer(write)
+
+
+class RateHistory:
+    """read candles, and drop old ticks and candles periodically.
+    Args:
+        db (Database): database.
+        tick_retention (timedelta): ticks older than this are dropped.
+        candle_retention (dict[int, timedelta]): candles of resolution older than this are dropped.
+            resolution which is not in this is kept forever.
+        prune_interval (float): seconds between prunes.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        *,
+        tick_retention: timedelta= timedelta(days=7),
+        candle_retention: Optional[dict[int, timedelta]]= None,
+        prune_interval: float= 3600.0,
+    ):
+        self.db = db
+        self.tick_retention = tick_retention
+        self.candle_retention = {60: timedelta(days=30)} if candle_retention is None else candle_retention
+        self.pruner = tasks.loop(seconds=prune_interval)(self._periodic_prune)
+
+    async def chart(
+        self,
+        c_id: int,
+        resolution: int,
+        since: datetime,
+        until: Optional[datetime]= None,
+    )-> list[Candle]:
+        """candles in `[since, until)`. this reads only candles, not ticks.
+        Raises:
+            ValueError: resolution is not in `RESOLUTIONS`.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f'resolution must be one of {RESOLUTIONS}')
+        since_ms = int(since.timestamp() * 1000)
+        stmt = (
+            select(candle.c.bucket, candle.c.open, candle.c.high, candle.c.low, candle.c.close, candle.c.count)
+            .where(candle.c.c_id == c_id)
+            .where(candle.c.resolution == resolution)
+            .where(candle.c.bucket >= since_ms - since_ms % (resolution * 1000))
+            .order_by(candle.c.bucket)
+        )
+        if until is not None:
+            stmt = stmt.where(candle.c.bucket < int(until.timestamp() * 1000))
+        result = await self.db.execute(stmt)
+        return [Candle(*row) for row in result]
+
+    async def prune(self)-> int:
+        """drop ticks and candles out of retention, and return count of rows."""
+        now = int(time() * 1000)
+        async with self.db.transaction() as conn:
+            result = await conn.execute(
+                delete(tick).where(tick.c.at < now - int(self.tick_retention.total_seconds() * 1000))
+            )
+            count = result.rowcount
+            for resolution, retention in self.candle_retention.items():
+                result = await conn.execute(
+                    delete(candle)
+                    .where(candle.c.resolution == resolution)
+                    .where(candle.c.bucket < now - int(retention.total_seconds() * 1000))
+                )
+                count += result.rowcount
+        return count
+
+    async def _periodic_prune(self):
+        try:
+            count = await self.prune()
+        except Exception:
+            logger.exception('failed to prune rate history')
+        else:
+            logger.debug(f'pruned {count} rows of rate history')
@@ -1,17 +1,135 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+from ..database import next_transfer_id
+from .rate import cross_rates
+
+if TYPE_CHECKING:
+    from ..database import Database
+    from .account import Account
+
+__all__ = ('instrument',)
+
+
 class instrument:
+    """one transfer between two accounts. written to ledger as debit and credit entries.
+    on exchange, `to_amount` of `to_c_id` is credited for `amount` of `c_id`.
+    `bank_id` and `to_bank_id` are banks of each account, so each entry is summarized by bank of its account.
+    """
+
+    __slots__ = (
+        '_db', 'id', 'from_id', 'to_id', 'bank_id', 'c_id', 'amount', 'to_bank_id', 'to_c_id', 'to_amount',
+        'created_at',
+    )
+
+    def __init__(
+        self,
+        db: Database,
+        *,
+        id: int,
+        from_id: int,
+        to_id: int,
+        bank_id: int,
+        c_id: int,
+        amount: int,
+        to_bank_id: Optional[int]= None,
+        to_c_id: Optional[int]= None,
+        to_amount: Optional[int]= None,
+        created_at=None,
+    ):
+        self._db = db
+        self.id = id
+        self.from_id = from_id
+        self.to_id = to_id
+        self.bank_id = bank_id
+        self.c_id = c_id
+        self.amount = amount
+        self.to_bank_id = bank_id if to_bank_id is None else to_bank_id
+        self.to_c_id = c_id if to_c_id is None else to_c_id
+        self.to_amount = amount if to_amount is None else to_amount
+        self.created_at = created_at
+
     @classmethod
-    def from_column(cls, db, column):
-        pass
+    def from_column(cls, db: Database, column)-> instrument:
+        """create from one ledger entry. either debit or credit is ok.
+        other side of exchange is not known from one entry, so it is same as given side.
+        """
+        if column.amount < 0:
+            from_id, to_id = column.account_id, column.counter_id
+        else:
+            from_id, to_id = column.counter_id, column.account_id
+        return cls(
+            db,
+            id=column.transfer_id,
+            from_id=from_id,
+            to_id=to_id,
+            bank_id=column.bank_id,
+            c_id=column.c_id,
+            amount=abs(column.amount),
+            created_at=column.created_at,
+        )
 
     @classmethod
     def from_new(
-        cls, 
-        db, 
-        from_ac, # partial account instance
-        to_ac, # partial acount instance
-        amount, 
-        currency, 
-        *, 
-        exchange=False,
-    ):
-        pass
+        cls,
+        db: Database,
+        from_ac: Account, # partial account instance
+        to_ac: Account, # partial acount instance
+        amount: int,
+        currency: int, # c_id
+        *,
+        exchange: bool= False,
+    )-> instrument:
+        """
+        Args:
+            exchange (bool): convert `amount` of `currency` to currency of `to_ac` by `cross_rates`.
+        Raises:
+            ValueError: amount is not positive or too small to exchange, accounts are same, or currency is not match.
+            KeyError: rate of currency is not loaded.
+        """
+        if amount <= 0:
+            raise ValueError('amount must be positive')
+        if from_ac.id == to_ac.id:
+            raise ValueError('can not transfer to same account')
+        if from_ac.c_id != currency:
+            raise ValueError('currency is different')
+        to_amount = amount
+        if to_ac.c_id != currency:
+            if not exchange:
+                raise ValueError('currency is different')
+            to_amount = cross_rates.convert(amount, currency, to_ac.c_id)
+            if to_amount <= 0:
+                raise ValueError('amount is too small to exchange')
+        return cls(
+            db,
+            id=next_transfer_id(),
+            from_id=from_ac.id,
+            to_id=to_ac.id,
+            bank_id=from_ac.bank_id,
+            c_id=currency,
+            amount=amount,
+            to_bank_id=to_ac.bank_id,
+            to_c_id=to_ac.c_id,
+            to_amount=to_amount,
+        )
+
+    #for ledger
+
+    def entries(self)-> Iterator[dict[str, Any]]:
+        yield {
+            'transfer_id': self.id, 'account_id': self.from_id, 'counter_id': self.to_id,
+            'bank_id': self.bank_id, 'c_id': self.c_id, 'amount': -self.amount,
+        }
+        yield {
+            'transfer_id': self.id, 'account_id': self.to_id, 'counter_id': self.from_id,
+            'bank_id': self.to_bank_id, 'c_id': self.to_c_id, 'amount': self.to_amount,
+        }
+
+    def deltas(self)-> Iterator[tuple[int, int]]:
+        yield self.from_id, -self.amount
+        yield self.to_id, self.to_amount
+
+    async def commit(self):
+        """wait until this is written to ledger. see `LedgerWriter.submit()` for errors."""
+        await self._db.ledger.submit(self)
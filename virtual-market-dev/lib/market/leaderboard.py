@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left, insort
+from logging import getLogger
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import select
+
+from ..database import shcema
+
+if TYPE_CHECKING:
+    from ..database import Database
+    from .account import Account
+    from .columnar import AccountColumns
+
+__all__ = ('TopK', 'Leaderboards', 'leaderboards')
+
+
+logger = getLogger(__name__)
+
+BoardKey = tuple[Optional[int], int]  # (bank_id or None for every bank, c_id)
+
+
+class TopK:
+    """accounts of largest balances, kept up to `capacity`.
+    every account which is not kept has balance not larger than `floor`.
+    `floor` is None while every account of the board is kept.
+    entry which goes below `floor` is dropped, because some other account may be larger than it.
+    when less than `size` entries are left, board is `stale` and must be rebuilt from database.
+    Args:
+        size (int): count of entries which reads need.
+        capacity (int): max count of kept entries. entries over `size` are slack for drops.
+    """
+
+    __slots__ = ('size', 'capacity', 'floor', '_balances', '_sorted')
+
+    def __init__(self, size: int, capacity: int):
+        self.size = size
+        self.capacity = max(size, capacity)
+        self.floor: Optional[int]= None
+        self._balances: dict[int, int]= {}
+        self._sorted: list[tuple[int, int]]= []  # (-balance, id)
+
+    def __len__(self)-> int:
+        return len(self._sorted)
+
+    def __contains__(self, id: int)-> bool:
+        return id in self._balances
+
+    @property
+    def stale(self)-> bool:
+        return self.floor is not None and len(self._sorted) < self.size
+
+    def load(self, rows: list[tuple[int, int]]):
+        """replace entries by `(id, balance)` of largest balances, which are at most `capacity`."""
+        self._balances = dict(rows)
+        self._sorted = sorted((-balance, id) for id, balance in self._balances.items())
+        if len(self._sorted) < self.capacity:
+            self.floor = None
+        else:
+            self.floor = -self._sorted[-1][0]
+
+    def update(self, id: int, balance: int):
+        """apply new balance of account `id`."""
+        old = self._balances.get(id)
+        if old is not None:
+            if old == balance:
+                return
+            self._remove(id, old)
+            if self.floor is not None and balance < self.floor:
+                return
+        elif self.floor is not None and balance <= self.floor:
+            return
+        self._balances[id] = balance
+        insort(self._sorted, (-balance, id))
+        if len(self._sorted) > self.capacity:
+            balance, id = self._sorted.pop()
+            del self._balances[id]
+            self.floor = -balance if self.floor is None else max(self.floor, -balance)
+
+    def remove(self, id: int):
+        """forget account `id`, e.g. it is deleted."""
+        balance = self._balances.get(id)
+        if balance is not None:
+            self._remove(id, balance)
+
+    def top(self, n: int, offset: int= 0)-> list[tuple[int, int]]:
+        """`(id, balance)` of rank `offset` to `offset + n`."""
+        return [(id, -balance) for balance, id in self._sorted[offset:offset + n]]
+
+    def _remove(self, id: int, balance: int):
+        del self._balances[id]
+        index = bisect_left(self._sorted, (-balance, id))
+        del self._sorted[index]
+
+
+class Leaderboards:
+    """top-K accounts by balance per currency, and per currency in each bank.
+    board is loaded from database at first read, and `Bank.move` updates loaded boards.
+    if `columns` is set (by `MarketSnapshot.recover()`), board is loaded from it instead of database,
+    since it has same committed balances.
+    boards which nobody reads are not kept, so updates of them cost only dict lookup.
+    Args:
+        size (int): max rank which can be read.
+        slack (int): extra entries kept for accounts which decrease, before rebuild is needed.
+    """
+
+    def __init__(self, *, size: int= 100, slack: int= 100):
+        self.size = size
+        self.slack = slack
+        self._boards: dict[BoardKey, TopK]= {}
+        self._loading: dict[BoardKey, dict[int, int]]= {}  # updates while loading
+        self._locks: dict[BoardKey, asyncio.Lock]= {}
+        self.columns: Optional[AccountColumns]= None
+        self.rebuilds = 0
+
+    def __len__(self)-> int:
+        return len(self._boards)
+
+    def invalidate(self):
+        """drop every board. next read loads again."""
+        self._boards.clear()
+
+    #for update
+
+    def update(self, account: Account):
+        """apply balance of `account` to boards of its currency."""
+        for key in ((None, account.c_id), (account.bank_id, account.c_id)):
+            board = self._boards.get(key)
+            if board is not None:
+                board.update(account.id, account.balance)
+            pending = self._loading.get(key)
+            if pending is not None:
+                pending[account.id] = account.balance
+
+    def remove(self, account: Account):
+        for key in ((None, account.c_id), (account.bank_id, account.c_id)):
+            board = self._boards.get(key)
+            if board is not None:
+                board.remove(account.id)
+
+    #for read
+
+    async def top(
+        self, db: Database, c_id: int, *, bank_id: Optional[int]= None, limit: int= 10, offset: int= 0
+    )-> list[tuple[int, int]]:
+        """`(account id, balance)` of largest balances of currency `c_id` (in bank `bank_id`).
+        Raises:
+            ValueError: `offset + limit` is larger than `size`.
+        """
+        if offset + limit > self.size:
+            raise ValueError(f'only top {self.size} can be read')
+        board = await self.board(db, c_id, bank_id=bank_id)
+        return board.top(limit, offset)
+
+    async def board(self, db: Database, c_id: int, *, bank_id: Optional[int]= None)-> TopK:
+        """board of currency `c_id` (in bank `bank_id`), which is loaded or rebuilt if needed."""
+        key = (bank_id, c_id)
+        board = self._boards.get(key)
+        if board is not None and not board.stale:
+            return board
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            board = self._boards.get(key)
+            if board is None or board.stale:
+                board = await self._rebuild(db, key)
+        return board
+
+    async def _rebuild(self, db: Database, key: BoardKey)-> TopK:
+        bank_id, c_id = key
+        table = shcema.Account.__table__
+        board = TopK(self.size, self.size + self.slack)
+        if self.columns is not None:
+            board.load(self.columns.top(c_id, board.capacity, bank_id))
+            self._boards[key] = board
+            self.rebuilds += 1
+            return board
+        stmt = (
+            select(table.c.id, table.c.balance)
+            .where(table.c.c_id == c_id)
+            .order_by(table.c.balance.desc(), table.c.id)
+            .limit(board.capacity)
+        )
+        if bank_id is not None:
+            stmt = stmt.where(table.c.bank_id == bank_id)
+        self._loading[key] = pending = {}
+        try:
+            result = await db.execute(stmt)
+            board.load([tuple(row) for row in result])
+        finally:
+            del self._loading[key]
+        for id, balance in pending.items():  # moved while loading
+            board.update(id, balance)
+        self._boards[key] = board
+        self.rebuilds += 1
+        logger.debug(f'rebuilt leaderboard {key} with {len(board)} entries')
+        return board
+
+
+leaderboards = Leaderboards()
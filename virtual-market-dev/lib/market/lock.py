@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, AsyncIterator, Optional
+
+from ..database import Timing
+
+if TYPE_CHECKING:
+    from ..database import UnitOfWork
+
+__all__ = ('AccountLocks', 'account_locks')
+
+
+class _Entry:
+    __slots__ = ('lock', 'users', 'owner')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+        self.owner: Any= None
+
+
+class AccountLocks:
+    """per account lock.
+    locks are acquired in order of account id, so transfers over some accounts can not deadlock.
+    lock is created at first use, and dropped when no task uses or waits it.
+    Args:
+        max_tracked (int): max count of accounts whose wait time is kept.
+    """
+
+    def __init__(self, *, max_tracked: int= 1000):
+        self._locks: dict[int, _Entry]= {}
+        self.max_tracked = max_tracked
+        self.wait = Timing()  # only contended acquisitions
+        self.waits: OrderedDict[int, Timing]= OrderedDict()
+
+    def __len__(self)-> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, *ids: int, owner: Optional[Any]= None)-> AsyncIterator[None]:
+        """lock accounts of `ids` while in this context.
+        Args:
+            owner (Any): holder of locks. accounts which are already locked by same owner are not locked again.
+                owner must not wait account whose id is lower than one it holds, since it can deadlock.
+                such account is locked only if no other task uses it.
+        Raises:
+            RuntimeError: account of lower id than held one is locked by other task.
+        """
+        highest = None if owner is None else self.highest(owner)
+        acquired: list[tuple[int, _Entry]]= []
+        try:
+            for id in sorted(set(ids)):
+                entry = self._locks.get(id)
+                if entry is None:
+                    entry = self._locks[id] = _Entry()
+                elif owner is not None and entry.owner is owner:
+                    continue
+                entry.users += 1
+                try:
+                    if highest is not None and id < highest and entry.users > 1:
+                        raise RuntimeError(f'account {id} is locked by other transfer, retry later')
+                    await self._acquire(id, entry)
+                except BaseException:
+                    self._unuse(id, entry)
+                    raise
+                entry.owner = owner
+                acquired.append((id, entry))
+            yield
+        finally:
+            for id, entry in reversed(acquired):
+                entry.owner = None
+                entry.lock.release()
+                self._unuse(id, entry)
+
+    async def hold_until_end(self, uow: UnitOfWork, *ids: int):
+        """lock accounts of `ids` until `uow` is committed or ends, so its changes can be reverted safely at rollback.
+        accounts which `uow` already holds are not locked again. see `hold()` for accounts of lower id than them.
+        """
+        await uow.hold(self.hold(*ids, owner=uow))
+
+    def highest(self, owner: Any)-> Optional[int]:
+        """highest id of accounts locked by `owner`."""
+        return max((id for id, entry in self._locks.items() if entry.owner is owner), default=None)
+
+    async def _acquire(self, id: int, entry: _Entry):
+        if not entry.lock.locked():
+            await entry.lock.acquire()
+            return
+        start = perf_counter()
+        await entry.lock.acquire()
+        elapsed = perf_counter() - start
+        self.wait.add(elapsed)
+        timing = self.waits.get(id)
+        if timing is None:
+            timing = self.waits[id] = Timing()
+            if len(self.waits) > self.max_tracked:
+                self.waits.popitem(last=False)
+        else:
+            self.waits.move_to_end(id)
+        timing.add(elapsed)
+
+    def _unuse(self, id: int, entry: _Entry):
+        entry.users -= 1
+        if not entry.users:
+            del self._locks[id]
+
+    def most_contended(self, n: int= 10)-> list[tuple[int, Timing]]:
+        return sorted(self.waits.items(), key=lambda item: item[1].total, reverse=True)[:n]
+
+    def reset(self):
+        self.wait.reset()
+        self.waits.clear()
+
+
+account_locks = AccountLocks()
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left, insort
+from difflib import get_close_matches
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from ..database import Database
+    from .currency import Currency
+
+__all__ = ('CurrencyIndex', 'currency_index')
+
+
+class CurrencyIndex:
+    """every currency by c_id, code and case-folded name, for resolving user input without query.
+    codes and names are also kept in one sorted list for prefix search.
+    it is loaded from database at first use after `invalidate()`, and commit of `Currency.save()` keeps it up to date.
+    if some currencies have same code or name, the last saved one is found by it.
+    """
+
+    def __init__(self):
+        self._by_id: dict[int, Currency]= {}
+        self._by_code: dict[str, int]= {}
+        self._by_name: dict[str, int]= {}
+        self._keys: dict[int, tuple[str, str]]= {}  # c_id to (code, name) it is indexed by
+        self._sorted: list[tuple[str, int]]= []  # (code or name, c_id)
+        self._loaded = False
+        self._lock: Optional[asyncio.Lock]= None
+
+    def __len__(self)-> int:
+        return len(self._by_id)
+
+    @property
+    def loaded(self)-> bool:
+        return self._loaded
+
+    async def ensure(self, db: Database):
+        """load every currency if it is not loaded."""
+        if self._loaded:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._loaded:
+                return
+            from .currency import Currency  # currency imports this module
+
+            result = await db.execute(Currency.select())
+            self._clear()
+            for column in result:
+                self._add(Currency.from_schema(db, column))
+            self._sorted.sort()
+            self._loaded = True
+
+    def invalidate(self):
+        """drop everything. next lookup loads again."""
+        self._clear()
+        self._loaded = False
+
+    def update(self, currency: Currency):
+        """add or reindex `currency`. it is ignored while not loaded, because it is loaded with others later."""
+        if not self._loaded:
+            return
+        if currency.c_id in self._by_id:
+            self._remove_keys(currency.c_id)
+        self._add(currency, sort=True)
+
+    def rollback(self, currency: Currency):
+        """`currency` is not saved. if it is indexed object itself, which may be changed, index is loaded again."""
+        if self._by_id.get(currency.c_id) is currency:
+            self.invalidate()
+
+    def remove(self, c_id: int):
+        if c_id in self._by_id:
+            self._remove_keys(c_id)
+            del self._by_id[c_id]
+
+    #for lookup
+
+    async def get(self, db: Database, c_id: int)-> Optional[Currency]:
+        await self.ensure(db)
+        return self._by_id.get(c_id)
+
+    async def by_code(self, db: Database, code: str)-> Optional[Currency]:
+        await self.ensure(db)
+        c_id = self._by_code.get(code.casefold())
+        return None if c_id is None else self._by_id[c_id]
+
+    async def by_name(self, db: Database, name: str)-> Optional[Currency]:
+        await self.ensure(db)
+        c_id = self._by_name.get(name.casefold())
+        return None if c_id is None else self._by_id[c_id]
+
+    async def resolve(self, db: Database, text: str)-> Optional[Currency]:
+        """currency of c_id, code or name (in this order) which is `text`."""
+        await self.ensure(db)
+        if text.isdecimal() and int(text) in self._by_id:
+            return self._by_id[int(text)]
+        key = text.casefold()
+        c_id = self._by_code.get(key)
+        if c_id is None:
+            c_id = self._by_name.get(key)
+        return None if c_id is None else self._by_id[c_id]
+
+    async def complete(self, db: Database, prefix: str, limit: int= 25)-> list[Currency]:
+        """currencies whose code or name starts with `prefix`, in order of the key."""
+        await self.ensure(db)
+        prefix = prefix.casefold()
+        result: dict[int, Currency]= {}
+        keys = self._sorted
+        index = bisect_left(keys, (prefix,))
+        while index < len(keys) and len(result) < limit:
+            key, c_id = keys[index]
+            if not key.startswith(prefix):
+                break
+            result.setdefault(c_id, self._by_id[c_id])
+            index += 1
+        return list(result.values())
+
+    async def suggest(self, db: Database, text: str, limit: int= 5, cutoff: float= 0.6)-> list[Currency]:
+        """currencies whose code or name is similar to `text`, for typo. prefix matches come first."""
+        result = {currency.c_id: currency for currency in await self.complete(db, text, limit)}
+        if len(result) < limit:
+            keys = {**self._by_code, **self._by_name}
+            for key in get_close_matches(text.casefold(), keys, limit * 2, cutoff):
+                result.setdefault(keys[key], self._by_id[keys[key]])
+        return list(result.values())[:limit]
+
+    def _clear(self):
+        self._by_id.clear()
+        self._by_code.clear()
+        self._by_name.clear()
+        self._keys.clear()
+        self._sorted.clear()
+
+    def _add(self, currency: Currency, sort: bool= False):
+        code, name = (currency.code or '').casefold(), (currency.name or '').casefold()
+        c_id = currency.c_id
+        self._by_id[c_id] = currency
+        self._by_code[code] = c_id
+        self._by_name[name] = c_id
+        self._keys[c_id] = (code, name)
+        if sort:
+            insort(self._sorted, (code, c_id))
+            insort(self._sorted, (name, c_id))
+        else:
+            self._sorted.append((code, c_id))
+            self._sorted.append((name, c_id))
+
+    def _remove_keys(self, c_id: int):
+        code, name = self._keys.pop(c_id)
+        if self._by_code.get(code) == c_id:
+            del self._by_code[code]
+        if self._by_name.get(name) == c_id:
+            del self._by_name[name]
+        for key in (code, name):
+            index = bisect_left(self._sorted, (key, c_id))
+            if index < len(self._sorted) and self._sorted[index] == (key, c_id):
+                del self._sorted[index]
+
+
+currency_index = CurrencyIndex()
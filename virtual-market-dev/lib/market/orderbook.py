@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import asyncio
+from heapq import heapify, heappop, heappush
+from itertools import count
+from typing import TYPE_CHECKING, Literal, Optional
+
+from ..database import find_unit_of_work
+from ..util import wait_through_cancel
+from .instrument import instrument
+from .lock import account_locks
+
+if TYPE_CHECKING:
+    from ..database import Database
+    from .account import Account
+
+__all__ = ('BUY', 'SELL', 'Order', 'Fill', 'OrderBook', 'Exchange')
+
+
+BUY = 'buy'
+SELL = 'sell'
+Side = Literal['buy', 'sell']
+
+
+class Order:
+    """limit order to buy or sell `quantity` of base currency at `price` of quote currency per one.
+    `base_account` and `quote_account` are accounts of owner, they are used at settlement.
+    Raises:
+        ValueError: side is unknown, price or quantity is not positive, or account is None.
+    """
+
+    __slots__ = ('id', 'side', 'price', 'quantity', 'remaining', 'cancelled', 'base_account', 'quote_account')
+
+    def __init__(
+        self,
+        side: Side,
+        price: int,
+        quantity: int,
+        base_account: Account,
+        quote_account: Account,
+    ):
+        if side not in (BUY, SELL):
+            raise ValueError('side must be buy or sell')
+        if price <= 0 or quantity <= 0:
+            raise ValueError('price and quantity must be positive')
+        if base_account is None or quote_account is None:
+            raise ValueError('order must have base and quote accounts')
+        self.id: Optional[int]= None  # set by `OrderBook.place()`, also used as time priority
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.remaining = quantity
+        self.cancelled = False
+        self.base_account = base_account
+        self.quote_account = quote_account
+
+    @property
+    def paying_account(self)-> Account:
+        """quote account of buyer, or base account of seller."""
+        return self.quote_account if self.side == BUY else self.base_account
+
+    def crosses(self, other: Order)-> bool:
+        """fill with `other` would transfer from an account to itself, e.g. both are orders of one owner."""
+        return self.base_account.id == other.base_account.id or self.quote_account.id == other.quote_account.id
+
+
+class Fill:
+    """`quantity` of `maker` (resting order) and `taker` are matched at `price` of maker."""
+
+    __slots__ = ('maker', 'taker', 'price', 'quantity')
+
+    def __init__(self, maker: Order, taker: Order, price: int, quantity: int):
+        self.maker = maker
+        self.taker = taker
+        self.price = price
+        self.quantity = quantity
+
+    def instruments(self, db: Database, base: int, quote: int)-> tuple[instrument, instrument]:
+        """base currency from seller to buyer, and quote currency from buyer to seller."""
+        buyer, seller = (self.taker, self.maker) if self.taker.side == BUY else (self.maker, self.taker)
+        return (
+            instrument.from_new(db, seller.base_account, buyer.base_account, self.quantity, base),
+            instrument.from_new(db, buyer.quote_account, seller.quote_account, self.quantity * self.price, quote),
+        )
+
+
+class OrderBook:
+    """limit order book of one currency pair, matched by price-time priority.
+    bids and asks are heaps of `(key, id, order)`. cancel only marks order,
+    and cancelled orders are dropped when they reach top or when they are more than living ones.
+    entry is dead also when its id is not id of order, e.g. placing of order is undone, and it is dropped same way.
+    resting order which `crosses` new order is cancelled when it is matched, and is not restored by `undo`.
+    """
+
+    def __init__(self, base: int, quote: int):
+        self.base = base
+        self.quote = quote
+        self._bids: list[tuple[int, int, Order]]= []  # key is -price
+        self._asks: list[tuple[int, int, Order]]= []  # key is price
+        self._orders: dict[int, Order]= {}
+        self._ids = count()
+        self._cancelled = 0
+
+    def __len__(self)-> int:
+        return len(self._orders)
+
+    def get(self, id: int)-> Optional[Order]:
+        return self._orders.get(id)
+
+    @property
+    def best_bid(self)-> Optional[int]:
+        self._drop_cancelled(self._bids)
+        return self._bids[0][2].price if self._bids else None
+
+    @property
+    def best_ask(self)-> Optional[int]:
+        self._drop_cancelled(self._asks)
+        return self._asks[0][2].price if self._asks else None
+
+    def place(self, order: Order)-> list[Fill]:
+        """match `order` with resting orders, and rest remaining of it in book."""
+        order.id = next(self._ids)
+        if order.side == BUY:
+            own, opposite = self._bids, self._asks
+        else:
+            own, opposite = self._asks, self._bids
+        fills = []
+        while order.remaining and opposite:
+            if _dead(opposite[0]):
+                heappop(opposite)
+                self._cancelled -= 1
+                continue
+            maker = opposite[0][2]
+            if (maker.price > order.price) if order.side == BUY else (maker.price < order.price):
+                break
+            if maker.crosses(order):
+                heappop(opposite)
+                del self._orders[maker.id]
+                maker.cancelled = True
+                continue
+            quantity = min(order.remaining, maker.remaining)
+            order.remaining -= quantity
+            maker.remaining -= quantity
+            fills.append(Fill(maker, order, maker.price, quantity))
+            if not maker.remaining:
+                heappop(opposite)
+                del self._orders[maker.id]
+        if order.remaining:
+            self._push(own, order)
+        return fills
+
+    def cancel(self, id: int)-> Optional[Order]:
+        order = self._orders.pop(id, None)
+        if order is None:
+            return None
+        order.cancelled = True
+        self._cancelled += 1
+        if self._cancelled > len(self._orders):
+            self._compact()
+        return order
+
+    def undo(self, order: Order, fills: list[Fill]):
+        """revert `place(order)` which returned `fills`, so `order` can be placed again.
+        makers get back their time priority.
+        """
+        if self._orders.pop(order.id, None) is not None:  # entry in heap is dead by id below
+            self._cancelled += 1
+        order.id = None
+        order.remaining = order.quantity
+        for fill in fills:
+            maker = fill.maker
+            if maker.cancelled:
+                continue
+            if not maker.remaining:
+                self._push(self._bids if maker.side == BUY else self._asks, maker)
+            maker.remaining += fill.quantity
+        if self._cancelled > len(self._orders):
+            self._compact()
+
+    def depth(self, side: Side, levels: int= 10)-> list[tuple[int, int]]:
+        """aggregated `(price, quantity)` of best `levels` prices. this is O(n log n)."""
+        heap = self._bids if side == BUY else self._asks
+        result: list[tuple[int, int]]= []
+        for entry in sorted(heap):
+            if _dead(entry):
+                continue
+            order = entry[2]
+            if result and result[-1][0] == order.price:
+                result[-1] = (order.price, result[-1][1] + order.remaining)
+            elif len(result) == levels:
+                break
+            else:
+                result.append((order.price, order.remaining))
+        return result
+
+    def _push(self, heap: list[tuple[int, int, Order]], order: Order):
+        key = -order.price if order.side == BUY else order.price
+        heappush(heap, (key, order.id, order))
+        self._orders[order.id] = order
+
+    def _drop_cancelled(self, heap: list[tuple[int, int, Order]]):
+        while heap and _dead(heap[0]):
+            heappop(heap)
+            self._cancelled -= 1
+
+    def _compact(self):
+        self._bids = [entry for entry in self._bids if not _dead(entry)]
+        self._asks = [entry for entry in self._asks if not _dead(entry)]
+        heapify(self._bids)
+        heapify(self._asks)
+        self._cancelled = 0
+
+
+def _dead(entry: tuple[int, int, Order])-> bool:
+    order = entry[2]
+    return order.cancelled or order.id != entry[1]
+
+
+class Exchange:
+    """order books of every pair, and settlement of fills through ledger."""
+
+    def __init__(self, db: Database):
+        self.db = db
+        self._books: dict[tuple[int, int], OrderBook]= {}
+
+    def book(self, base: int, quote: int)-> OrderBook:
+        book = self._books.get((base, quote))
+        if book is None:
+            book = self._books[(base, quote)] = OrderBook(base, quote)
+        return book
+
+    async def trade(self, base: int, quote: int, order: Order)-> list[instrument]:
+        """place `order` and settle its fills in one ledger submission.
+        makers which can not pay any more are cancelled, and `order` is placed again without them.
+        makers of same accounts as `order` are cancelled by book, so one owner never trades with self.
+        if caller is cancelled, fills are still settled and kept in book.
+        in unit of work, fills are written at commit of it, and book is reverted if it is rollbacked.
+        Raises:
+            ValueError: balance of account of `order` is not enough. book is reverted.
+        """
+        book = self.book(base, quote)
+        while True:
+            fills = book.place(order)
+            if not fills:
+                return []
+            try:
+                transfers, unfunded = await wait_through_cancel(asyncio.ensure_future(self.settle(book, fills)))
+            except Exception:
+                book.undo(order, fills)
+                raise
+            if not unfunded:
+                uow = find_unit_of_work()
+                if uow is not None:
+                    uow.on_rollback(lambda: book.undo(order, fills))
+                return transfers
+            book.undo(order, fills)
+            for maker in unfunded:
+                book.cancel(maker.id)
+
+    async def settle(self, book: OrderBook, fills: list[Fill])-> tuple[list[instrument], list[Order]]:
+        """settle `fills` of one taker, or return makers which can not pay them without settling any.
+        in unit of work, they are written at commit of it (see `Bank.move`).
+        Raises:
+            ValueError: balance of account of taker is not enough.
+        """
+        transfers = [t for fill in fills for t in fill.instruments(self.db, book.base, book.quote)]
+        accounts: dict[int, Account]= {}
+        for fill in fills:
+            for order in (fill.maker, fill.taker):
+                accounts[order.base_account.id] = order.base_account
+                accounts[order.quote_account.id] = order.quote_account
+        uow = find_unit_of_work()
+        if uow is not None:
+            await account_locks.hold_until_end(uow, *accounts)
+            unfunded = self._apply(fills, transfers, accounts)
+            if unfunded:
+                return [], unfunded
+            uow.submit(*transfers)
+            uow.on_rollback(lambda: self._revert(transfers, accounts))
+            return transfers, []
+        async with account_locks.hold(*accounts):
+            unfunded = self._apply(fills, transfers, accounts)
+            if unfunded:
+                return [], unfunded
+            try:
+                await self.db.ledger.submit(*transfers)
+            except Exception:  # cancellation is raised only after they are written
+                self._revert(transfers, accounts)
+                raise
+        return transfers, []
+
+    @staticmethod
+    def _apply(fills: list[Fill], transfers: list[instrument], accounts: dict[int, Account])-> list[Order]:
+        """apply `transfers` to balances, or return makers which can not pay them without applying any."""
+        debits: dict[int, int]= {}
+        for transfer in transfers:
+            debits[transfer.from_id] = debits.get(transfer.from_id, 0) + transfer.amount
+        short = {id for id, amount in debits.items() if accounts[id].balance < amount}
+        if short:
+            id = fills[0].taker.paying_account.id
+            if id in short:
+                raise ValueError(f'balance of account {id} is not enough')
+            return [fill.maker for fill in fills if fill.maker.paying_account.id in short]
+        for transfer in transfers:
+            accounts[transfer.from_id].balance -= transfer.amount
+            accounts[transfer.to_id].balance += transfer.to_amount
+        return []
+
+    @staticmethod
+    def _revert(transfers: list[instrument], accounts: dict[int, Account]):
+        for transfer in transfers:
+            accounts[transfer.from_id].balance += transfer.amount
+            accounts[transfer.to_id].balance -= transfer.to_amount
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from fractions import Fraction
+from typing import Iterable, Union
+
+__all__ = ('CrossRates', 'cross_rates')
+
+
+class CrossRates:
+    """rate of every currency pair.
+    `Currency.rate` is rate for vbc, so rate of `src` to `dst` is `src.rate / dst.rate`.
+    it is kept as exact fraction. pair is computed at first use and kept until rate of either side is changed,
+    so setting rates of many currencies does not compute every pair.
+    """
+
+    def __init__(self):
+        self._rates: dict[int, Fraction]= {}
+        self._matrix: dict[int, dict[int, Fraction]]= {}  # computed pairs
+        self._columns: dict[int, set[int]]= {}  # dst to srcs which have computed pair of it
+
+    def __len__(self)-> int:
+        return len(self._rates)
+
+    def __contains__(self, c_id: int)-> bool:
+        return c_id in self._rates
+
+    def set_rate(self, c_id: int, rate: Union[Decimal, int, str]):
+        """add or update rate for vbc of currency `c_id`."""
+        new = Fraction(Decimal(rate))
+        if new <= 0:
+            raise ValueError('rate must be positive')
+        if self._rates.get(c_id) == new:
+            return
+        self._rates[c_id] = new
+        self._forget(c_id)
+
+    def remove(self, c_id: int):
+        del self._rates[c_id]
+        self._forget(c_id)
+
+    def _forget(self, c_id: int):
+        """drop computed pairs of `c_id`. only pairs which have it are visited."""
+        for dst in self._matrix.pop(c_id, ()):
+            column = self._columns[dst]
+            column.discard(c_id)
+            if not column:
+                del self._columns[dst]
+        for src in self._columns.pop(c_id, ()):
+            row = self._matrix[src]
+            del row[c_id]
+            if not row:
+                del self._matrix[src]
+
+    def rate(self, src: int, dst: int)-> Fraction:
+        """
+        Raises:
+            KeyError: rate of `src` or `dst` is not set.
+        """
+        row = self._matrix.get(src)
+        rate = None if row is None else row.get(dst)
+        if rate is None:
+            rate = self._rates[src] / self._rates[dst]
+            self._matrix.setdefault(src, {})[dst] = rate
+            self._columns.setdefault(dst, set()).add(src)
+        return rate
+
+    def convert(self, amount: int, src: int, dst: int)-> int:
+        """convert `amount` of `src` to `dst`. fraction is rounded down."""
+        rate = self.rate(src, dst)
+        return amount * rate.numerator // rate.denominator
+
+    def convert_many(self, amounts: Iterable[int], src: int, dst: int)-> list[int]:
+        """convert many amounts by same rate at once."""
+        rate = self.rate(src, dst)
+        numerator, denominator = rate.numerator, rate.denominator
+        if denominator == 1:
+            return [amount * numerator for amount in amounts]
+        return [amount * numerator // denominator for amount in amounts]
+
+
+cross_rates = CrossRates()
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from array import array
+from logging import getLogger
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Sequence
+
+from discord.ext import tasks
+from sqlalchemy import select
+
+from ..database import next_transfer_id, shcema
+from .leaderboard import leaderboards
+from .lock import account_locks
+from .lookup import currency_index
+from .rate import cross_rates
+
+try:
+    import numpy as np
+except ImportError:  # typed arrays are used instead
+    np = None
+
+if TYPE_CHECKING:
+    from ..database import Database
+    from .cache import AccountCache
+
+__all__ = ('SettlementRule', 'Settlement', 'SettlementEngine')
+
+
+logger = getLogger(__name__)
+
+BPS = 10000
+
+
+class SettlementRule:
+    """interest and fee of one bank per settlement, read from `Bank.setting`.
+    keys are `interest_bps` (interest in basis points of balance), `fee` (amount taken from every account)
+    and `fee_c_id` (currency of `fee`. it is converted to currency of each account by `cross_rates`.
+    fee is in currency of each account if it is not set).
+    fee is never more than balance after interest.
+    """
+
+    __slots__ = ('interest_bps', 'fee', 'fee_c_id')
+
+    def __init__(self, interest_bps: int= 0, fee: int= 0, fee_c_id: Optional[int]= None):
+        self.interest_bps = interest_bps
+        self.fee = fee
+        self.fee_c_id = fee_c_id
+
+    @classmethod
+    def from_setting(cls, setting: dict[str, Any])-> Optional[SettlementRule]:
+        """rule of bank, or None if bank has no interest nor fee."""
+        self = cls(
+            int(setting.get('interest_bps', 0)),
+            int(setting.get('fee', 0)),
+            None if setting.get('fee_c_id') is None else int(setting['fee_c_id']),
+        )
+        if self.fee < 0:
+            raise ValueError('fee must not be negative')
+        return self if self.interest_bps or self.fee else None
+
+    def fee_in(self, c_id: int)-> int:
+        """fee in currency `c_id`. 0 if rate of either currency is not known."""
+        if not self.fee or self.fee_c_id is None or self.fee_c_id == c_id:
+            return self.fee
+        try:
+            return cross_rates.convert(self.fee, self.fee_c_id, c_id)
+        except KeyError:
+            logger.warning(f'rate of {self.fee_c_id} or {c_id} is not known, fee is skipped')
+            return 0
+
+
+class Settlement:
+    """balance changes of one settlement run. it is a `Transfer` of `LedgerWriter`,
+    so every change is written in one transaction, with one bulk balance update and one ledger insert.
+    each change is a ledger entry without counter account (`counter_id` is 0).
+    """
+
+    __slots__ = ('id', 'ids', 'bank_ids', 'c_ids', 'amounts')
+
+    def __init__(self, ids: Sequence[int], bank_ids: Sequence[int], c_ids: Sequence[int], amounts: Sequence[int]):
+        self.id = next_transfer_id()
+        self.ids = ids
+        self.bank_ids = bank_ids
+        self.c_ids = c_ids
+        self.amounts = amounts
+
+    def __len__(self)-> int:
+        return len(self.ids)
+
+    @classmethod
+    def compute(
+        cls,
+        rules: dict[int, SettlementRule],
+        ids: Sequence[int],
+        bank_ids: Sequence[int],
+        c_ids: Sequence[int],
+        balances: Sequence[int],
+    )-> Settlement:
+        """apply `rules` (by bank id) to accounts given as columns, and keep only changed accounts."""
+        if np is not None:
+            return cls._compute_numpy(rules, ids, bank_ids, c_ids, balances)
+        return cls._compute_array(rules, ids, bank_ids, c_ids, balances)
+
+    @classmethod
+    def _compute_numpy(cls, rules, ids, bank_ids, c_ids, balances)-> Settlement:
+        ids = np.asarray(ids, dtype=np.int64)
+        bank_ids = np.asarray(bank_ids, dtype=np.int64)
+        c_ids = np.asarray(c_ids, dtype=np.int64)
+        balances = np.asarray(balances, dtype=np.int64)
+        # rule is looked up once per (bank, currency) and spread to accounts
+        groups, inverse = np.unique((bank_ids << 32) | c_ids, return_inverse=True)
+        bps = np.empty(len(groups), dtype=np.int64)
+        fees = np.empty(len(groups), dtype=np.int64)
+        for i, key in enumerate(groups.tolist()):
+            rule = rules[key >> 32]
+            bps[i] = rule.interest_bps
+            fees[i] = rule.fee_in(key & 0xFFFFFFFF)
+        bps, fees = bps[inverse], fees[inverse]
+        # floor(balance * bps / BPS) without overflow of int64
+        interest = balances // BPS * bps + balances % BPS * bps // BPS
+        after = balances + interest
+        deltas = interest - np.minimum(fees, np.maximum(after, 0))
+        changed = np.nonzero(deltas)[0]
+        return cls(
+            ids[changed].tolist(), bank_ids[changed].tolist(), c_ids[changed].tolist(), deltas[changed].tolist()
+        )
+
+    @classmethod
+    def _compute_array(cls, rules, ids, bank_ids, c_ids, balances)-> Settlement:
+        groups: dict[tuple[int, int], tuple[int, int]]= {}
+        out_ids, out_banks, out_c_ids, out_deltas = array('q'), array('q'), array('q'), array('q')
+        for id, bank_id, c_id, balance in zip(ids, bank_ids, c_ids, balances):
+            group = groups.get((bank_id, c_id))
+            if group is None:
+                rule = rules[bank_id]
+                group = groups[bank_id, c_id] = (rule.interest_bps, rule.fee_in(c_id))
+            bps, fee = group
+            interest = balance * bps // BPS
+            delta = interest - min(fee, max(balance + interest, 0))
+            if delta:
+                out_ids.append(id)
+                out_banks.append(bank_id)
+                out_c_ids.append(c_id)
+                out_deltas.append(delta)
+        return cls(out_ids, out_banks, out_c_ids, out_deltas)
+
+    #for ledger
+
+    def entries(self)-> Iterator[dict[str, Any]]:
+        id = self.id
+        for account_id, bank_id, c_id, delta in zip(self.ids, self.bank_ids, self.c_ids, self.amounts):
+            yield {
+                'transfer_id': id, 'account_id': account_id, 'counter_id': 0,
+                'bank_id': bank_id, 'c_id': c_id, 'amount': delta,
+            }
+
+    def deltas(self)-> Iterator[tuple[int, int]]:
+        return zip(self.ids, self.amounts)
+
+
+class SettlementEngine:
+    """apply interest and fee of every bank periodically.
+    `account_locks` of every account to settle are held while balances are read again,
+    computed in one vectorized pass (numpy if it is installed), written through ledger as one bulk update
+    in one transaction, and applied to cached accounts. so fee is never more than current balance,
+    and a run is settled whole or not at all. transfers of these accounts wait until the run ends.
+    Args:
+        db (Database): database to read and write.
+        accounts (AccountCache): cache whose accounts are kept in sync.
+        interval (float): seconds between settlements. first one is after `interval`, not at start.
+    """
+
+    def __init__(self, db: Database, accounts: AccountCache, *, interval: float= 3600.0):
+        self.db = db
+        self.accounts = accounts
+        self.settler = tasks.loop(seconds=interval)(self._periodic_settle)
+
+    async def rules(self)-> dict[int, SettlementRule]:
+        table = shcema.Bank.__table__
+        result = await self.db.execute(select(table.c.id, table.c.ext))
+        rules = {}
+        for id, ext in result:
+            try:
+                rule = SettlementRule.from_setting(ext or {})
+            except (TypeError, ValueError):
+                logger.warning(f'setting of bank {id} is invalid, it is not settled')
+                continue
+            if rule is not None:
+                rules[id] = rule
+        return rules
+
+    async def settle(self)-> int:
+        """run one settlement, and return count of changed accounts."""
+        start = perf_counter()
+        rules = await self.rules()
+        if not rules:
+            return 0
+        if any(rule.fee_c_id is not None for rule in rules.values()):
+            await currency_index.ensure(self.db)  # loads rates of every currency
+        table = shcema.Account.__table__
+        condition = (table.c.bank_id.in_(rules), table.c.balance > 0)
+        result = await self.db.execute(select(table.c.id).where(*condition))
+        candidates = set(result.scalars())
+        async with account_locks.hold(*candidates):
+            # transfers of these accounts are written or reverted, so balances are read again.
+            # accounts which have balance since first read are not locked, and settled at next run.
+            locked = perf_counter()
+            result = await self.db.execute(
+                select(table.c.id, table.c.bank_id, table.c.c_id, table.c.balance).where(*condition)
+            )
+            ids, bank_ids, c_ids, balances = array('q'), array('q'), array('q'), array('q')
+            for id, bank_id, c_id, balance in result:
+                if id not in candidates:
+                    continue
+                ids.append(id)
+                bank_ids.append(bank_id)
+                c_ids.append(c_id)
+                balances.append(balance)
+            loaded = perf_counter()
+
+            settlement = Settlement.compute(rules, ids, bank_ids, c_ids, balances)
+            computed = perf_counter()
+            if settlement:
+                await self.db.ledger.submit(settlement)
+                for id, delta in settlement.deltas():
+                    account = self.accounts.peek(id)
+                    if account is not None:
+                        account.balance += delta
+        if settlement:
+            leaderboards.invalidate()
+        written = perf_counter()
+        logger.info(
+            f'settled {len(settlement)}/{len(ids)} accounts of {len(rules)} banks in {(written - start) * 1000:.1f}ms'
+            f' (lock {(locked - start) * 1000:.1f}ms, load {(loaded - locked) * 1000:.1f}ms,'
+            f' compute {(computed - loaded) * 1000:.1f}ms with {"numpy" if np is not None else "array"},'
+            f' write {(written - computed) * 1000:.1f}ms)'
+        )
+        return len(settlement)
+
+    async def _periodic_settle(self):
+        if self.settler.current_loop == 0:  # loop runs at once when started
+            return
+        try:
+            await self.settle()
+        except Exception:
+            logger.exception('failed to settle, retry at next loop')
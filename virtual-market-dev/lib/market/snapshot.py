@@ -0,0 +1,496 @@
+from __future__ import annotations
+
+import asyncio
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from decimal import Decimal
+from logging import getLogger
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Sequence, Union
+
+from discord.ext import tasks
+from sqlalchemy import select
+
+from ..database import shcema
+from .columnar import AccountColumns
+from .leaderboard import leaderboards
+from .rate import cross_rates
+
+if TYPE_CHECKING:
+    from ..database import Database, Written
+
+__all__ = ('MarketState', 'TransferLog', 'MarketSnapshot')
+
+
+logger = getLogger(__name__)
+
+account = shcema.Account.__table__
+currency = shcema.Currency.__table__
+ledger = shcema.Ledger.__table__
+
+# snapshot: header, columns of accounts, c_ids of rates, rates as text separated by newline,
+# pairs of account id and delta of orphans, crc32 of all before.
+MAGIC = b'VMSNAP02'
+_HEADER = struct.Struct('<8sIqqqq')  # magic, segment, counts of accounts and rates, bytes of rate text, count of orphans
+_CRC = struct.Struct('<I')
+# log record: kind, lsn, bytes of payload, payload, crc32 of them.
+_RECORD = struct.Struct('<cqI')
+_BATCH = struct.Struct('<III')  # counts of entries, accounts and rates in payload of BEGIN
+_ENTRY = struct.Struct('<qqq')  # transfer_id, account_id, amount
+_ACCOUNT = struct.Struct('<qqqqq')  # id, owner_id, bank_id, c_id, balance
+_RATE = struct.Struct('<qH')  # c_id, bytes of rate text
+BEGIN, COMMIT, ABORT = b'B', b'C', b'X'
+
+_SWAP = sys.byteorder != 'little'  # files are little endian
+
+Entry = tuple[int, int, int]
+AccountRow = tuple[int, int, int, int, int]
+Batch = tuple[list[Entry], list[AccountRow], list[tuple[int, Decimal]]]
+
+
+class MarketState:
+    """balances of every account and rates of every currency.
+    this is a read model kept by `TransferLog`, for fast startup. database is still the source of truth.
+    """
+
+    __slots__ = ('accounts', 'rates', '_orphans')
+
+    def __init__(
+        self,
+        accounts: Optional[AccountColumns]= None,
+        rates: Optional[dict[int, Decimal]]= None,
+        orphans: Optional[dict[int, int]]= None,
+    ):
+        self.accounts = AccountColumns() if accounts is None else accounts
+        self.rates: dict[int, Decimal]= {} if rates is None else rates
+        self._orphans: dict[int, int]= {} if orphans is None else orphans  # deltas of accounts which are not known yet
+
+    @classmethod
+    async def load(cls, db: Database)-> MarketState:
+        """full reload from database."""
+        self = cls()
+        await self.catch_up(db)
+        result = await db.execute(select(currency.c.c_id, currency.c.rate))
+        self.rates = {c_id: Decimal(rate) for c_id, rate in result}
+        return self
+
+    async def catch_up(self, db: Database)-> int:
+        """add accounts of database which are newer than any account in state, and return count of them."""
+        ids = self.accounts.ids
+        stmt = (
+            select(account.c.id, account.c.owner_id, account.c.bank_id, account.c.c_id, account.c.balance)
+            .order_by(account.c.id)
+        )
+        if ids:
+            stmt = stmt.where(account.c.id > ids[-1])
+        result = await db.execute(stmt)
+        count = 0
+        for id, owner_id, bank_id, c_id, balance in result:
+            # balance in database already has every committed delta
+            self._orphans.pop(id, None)
+            self.accounts.insert(id, owner_id or 0, bank_id or 0, c_id or 0, balance)
+            count += 1
+        return count
+
+    def apply(self, entries: Sequence[Entry], accounts: Sequence[AccountRow], rates: Sequence[tuple[int, Decimal]]):
+        columns = self.accounts
+        for id, owner_id, bank_id, c_id, balance in accounts:
+            columns.insert(id, owner_id, bank_id, c_id, balance + self._orphans.pop(id, 0))
+        for _, account_id, amount in entries:
+            index = columns.index(account_id)
+            if index is None:
+                # ledger of account can be committed before the account itself
+                self._orphans[account_id] = self._orphans.get(account_id, 0) + amount
+            else:
+                columns.balances[index] += amount
+        for c_id, rate in rates:
+            self.rates[c_id] = rate
+
+
+def _encode_batch(entries: Sequence[Entry], accounts: Sequence[AccountRow], rates: Sequence[tuple[int, Decimal]])-> bytes:
+    parts = [_BATCH.pack(len(entries), len(accounts), len(rates))]
+    parts.extend(_ENTRY.pack(*entry) for entry in entries)
+    parts.extend(_ACCOUNT.pack(*row) for row in accounts)
+    for c_id, rate in rates:
+        text = str(rate).encode()
+        parts.append(_RATE.pack(c_id, len(text)))
+        parts.append(text)
+    return b''.join(parts)
+
+
+def _decode_batch(payload: bytes)-> Batch:
+    n_entries, n_accounts, n_rates = _BATCH.unpack_from(payload)
+    offset = _BATCH.size
+    end = offset + n_entries * _ENTRY.size
+    entries = list(_ENTRY.iter_unpack(payload[offset:end]))
+    offset, end = end, end + n_accounts * _ACCOUNT.size
+    accounts = list(_ACCOUNT.iter_unpack(payload[offset:end]))
+    offset = end
+    rates = []
+    for _ in range(n_rates):
+        c_id, length = _RATE.unpack_from(payload, offset)
+        offset += _RATE.size
+        rates.append((c_id, Decimal(payload[offset:offset + length].decode())))
+        offset += length
+    return entries, accounts, rates
+
+
+def _encode_record(kind: bytes, lsn: int, payload: bytes= b'')-> bytes:
+    head = _RECORD.pack(kind, lsn, len(payload))
+    return head + payload + _CRC.pack(zlib.crc32(payload, zlib.crc32(head)))
+
+
+def read_log(path: Path)-> Iterator[tuple[bytes, int, bytes]]:
+    """`(kind, lsn, payload)` of records in log file. it stops at torn or broken record."""
+    data = path.read_bytes()
+    offset = 0
+    while offset + _RECORD.size <= len(data):
+        kind, lsn, length = _RECORD.unpack_from(data, offset)
+        end = offset + _RECORD.size + length
+        if end + _CRC.size > len(data):
+            break
+        (crc,) = _CRC.unpack_from(data, end)
+        if crc != zlib.crc32(data[offset:end]):
+            break
+        yield kind, lsn, data[offset + _RECORD.size:end]
+        offset = end + _CRC.size
+    if offset != len(data):
+        logger.warning(f'ignored {len(data) - offset} bytes of broken tail of {path.name}')
+
+
+class TransferLog:
+    """write-ahead log of `MarketState`, as `Journal` of `Database`.
+    BEGIN record (entries of ledger, new accounts and rates) is written before commit,
+    and COMMIT or ABORT after it. state is changed at COMMIT.
+    log is split to numbered segments, and segments before snapshot are removed.
+    Args:
+        directory (Path): directory of segment files `wal-{segment}.log`.
+        state (MarketState): state to apply committed writes.
+        segment (int): segment to append.
+        lsn (int): id of next write.
+        fsync (bool): fsync each BEGIN. without it, writes can be lost at power failure (not at crash).
+            fsync runs in executor, and BEGINs written while one runs share next one.
+    """
+
+    def __init__(self, directory: Path, state: MarketState, *, segment: int, lsn: int= 0, fsync: bool= True):
+        self.directory = directory
+        self.state = state
+        self.fsync = fsync
+        self.segment = segment
+        self._lsn = lsn
+        self._pending: dict[int, tuple[bytes, Batch]]= {}
+        self._file = open(self.path(segment), 'ab')
+        self._writes = 0
+        self._synced = 0  # writes which are on disk
+        self._syncing: Optional[asyncio.Future]= None
+
+    def path(self, segment: int)-> Path:
+        return self.directory / f'wal-{segment:08d}.log'
+
+    async def prepare(self, entries: Sequence[dict[str, Any]], rows: Sequence[Written])-> Optional[int]:
+        batch: Batch= (
+            [(entry['transfer_id'], entry['account_id'], entry['amount']) for entry in entries],
+            [
+                (row['id'], row['owner_id'] or 0, row['bank_id'] or 0, row['c_id'] or 0, row['balance'])
+                for table, row, inserted in rows if table is account and inserted
+            ],
+            [(row['c_id'], Decimal(row['rate'])) for table, row, _ in rows if table is currency],
+        )
+        if not any(batch):
+            return None
+        lsn = self._lsn
+        self._lsn += 1
+        record = _encode_record(BEGIN, lsn, _encode_batch(*batch))
+        self._write(record)
+        self._pending[lsn] = (record, batch)
+        if self.fsync:
+            try:
+                await self._sync()
+            except BaseException:
+                self.abort(lsn)
+                raise
+        return lsn
+
+    def commit(self, lsn: int):
+        _, batch = self._pending.pop(lsn)
+        self.state.apply(*batch)
+        self._end(COMMIT, lsn)
+
+    def abort(self, lsn: int):
+        del self._pending[lsn]
+        self._end(ABORT, lsn)
+
+    async def rotate(self)-> tuple[int, list[bytes]]:
+        """start next segment, and return it with snapshot of state which has every write before it.
+        prepared writes are copied to it. state is encoded when segment is switched, before any await,
+        so writes committed while new segment is synced are only in it, and replayed once.
+        """
+        while self._syncing is not None:  # fsync of old file
+            await asyncio.shield(self._syncing)
+        self._file.close()
+        self.segment += 1
+        self._file = open(self.path(self.segment), 'ab')
+        self._write(b''.join(record for record, _ in self._pending.values()))
+        parts = _encode_snapshot(self.state, self.segment)
+        if self.fsync:
+            await self._sync()
+        return self.segment, parts
+
+    def close(self):
+        self._file.close()
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._file.flush()
+        self._writes += 1
+
+    async def _sync(self):
+        """wait until every write before this call is on disk."""
+        target = self._writes
+        while self._synced < target:
+            if self._syncing is None:
+                self._syncing = asyncio.ensure_future(self._fsync())
+            await asyncio.shield(self._syncing)
+
+    async def _fsync(self):
+        writes = self._writes
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, self._file.fileno())
+        finally:
+            self._syncing = None
+        self._synced = max(self._synced, writes)
+
+    def _end(self, kind: bytes, lsn: int):
+        # write is already decided in database. if this is lost, it is resolved at recovery.
+        try:
+            self._write(_encode_record(kind, lsn))
+        except OSError:
+            logger.exception(f'failed to write end of {lsn} to transfer log')
+
+
+def _encode_snapshot(state: MarketState, segment: int)-> list[bytes]:
+    columns = []
+    for name in AccountColumns.__slots__:
+        column = getattr(state.accounts, name)
+        if _SWAP:
+            column = array(column.typecode, column)
+            column.byteswap()
+        columns.append(column.tobytes())
+    c_ids = array('q', state.rates)
+    if _SWAP:
+        c_ids.byteswap()
+    text = '\n'.join(str(rate) for rate in state.rates.values()).encode()
+    orphans = array('q', (value for item in state._orphans.items() for value in item))
+    if _SWAP:
+        orphans.byteswap()
+    head = _HEADER.pack(MAGIC, segment, len(state.accounts), len(state.rates), len(text), len(state._orphans))
+    return [head, *columns, c_ids.tobytes(), text, orphans.tobytes()]
+
+
+def _write_snapshot(path: Path, parts: list[bytes]):
+    """write atomically. old snapshot is kept until new one is on disk."""
+    crc = 0
+    for part in parts:
+        crc = zlib.crc32(part, crc)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'wb') as f:
+        f.writelines(parts)
+        f.write(_CRC.pack(crc))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _read_snapshot(path: Path)-> tuple[MarketState, int]:
+    """load snapshot by mmap (read if it is not supported).
+    Raises:
+        ValueError: file is broken.
+    """
+    with open(path, 'rb') as f:
+        try:
+            data: Union[mmap.mmap, bytes]= mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            data = f.read()
+    view = memoryview(data)
+    try:
+        if len(view) < _HEADER.size + _CRC.size:
+            raise ValueError('snapshot is too short')
+        (crc,) = _CRC.unpack_from(view, len(view) - _CRC.size)
+        if crc != zlib.crc32(view[:-_CRC.size]):
+            raise ValueError('crc of snapshot is not match')
+        magic, segment, n_accounts, n_rates, n_text, n_orphans = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('not a snapshot')
+        columns = AccountColumns()
+        offset = _HEADER.size
+        for name in AccountColumns.__slots__:
+            column = getattr(columns, name)
+            end = offset + n_accounts * column.itemsize
+            column.frombytes(view[offset:end])
+            offset = end
+        c_ids = array('q')
+        end = offset + n_rates * c_ids.itemsize
+        c_ids.frombytes(view[offset:end])
+        offset, end = end, end + n_text
+        text = bytes(view[offset:end]).decode()
+        orphans = array('q')
+        orphans.frombytes(view[end:end + 2 * n_orphans * orphans.itemsize])
+    finally:
+        view.release()
+        if isinstance(data, mmap.mmap):
+            data.close()
+    if _SWAP:
+        for name in AccountColumns.__slots__:
+            getattr(columns, name).byteswap()
+        c_ids.byteswap()
+        orphans.byteswap()
+    rates = dict(zip(c_ids, map(Decimal, text.split('\n')))) if n_rates else {}
+    return MarketState(columns, rates, dict(zip(orphans[::2], orphans[1::2]))), segment
+
+
+class MarketSnapshot:
+    """periodic snapshot of `MarketState` and `TransferLog` of writes since it.
+    startup loads snapshot and replays only the log, instead of reading every account from database.
+    Args:
+        db (Database): database. `recover()` sets `db.journal`.
+        directory (str): directory of snapshot and log files.
+        interval (float): seconds between snapshots.
+        fsync (bool): see `TransferLog`.
+    """
+
+    def __init__(self, db: Database, directory: str, *, interval: float= 300.0, fsync: bool= True):
+        self.db = db
+        self.directory = Path(directory)
+        self.fsync = fsync
+        self.state: Optional[MarketState]= None
+        self.log: Optional[TransferLog]= None
+        self.snapshotter = tasks.loop(seconds=interval)(self._periodic_write)
+
+    @property
+    def path(self)-> Path:
+        return self.directory / 'snapshot.bin'
+
+    def segments(self)-> list[tuple[int, Path]]:
+        return sorted((int(path.stem[4:]), path) for path in self.directory.glob('wal-*.log'))
+
+    async def recover(self)-> MarketState:
+        """load snapshot and replay log after it, or load from database if there is no snapshot.
+        writes which are prepared but not ended in log are resolved by database.
+        rates are set to `cross_rates`, and accounts are used by `leaderboards`.
+        """
+        start = perf_counter()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        state = None
+        if self.path.exists():
+            try:
+                state, segment = await loop.run_in_executor(None, _read_snapshot, self.path)
+            except ValueError:
+                logger.exception('failed to load market snapshot, load from database')
+        if state is None:
+            state = await MarketState.load(self.db)
+            segments = self.segments()
+            next_segment = segments[-1][0] + 1 if segments else 0
+            lsn = 0
+            logger.info(
+                f'market state loaded from database in {(perf_counter() - start) * 1000:.1f}ms '
+                f'({len(state.accounts)} accounts, {len(state.rates)} rates)'
+            )
+        else:
+            snapshot_time = perf_counter() - start
+            replayed, in_doubt, lsn = await self._replay(state, segment)
+            new = await state.catch_up(self.db)
+            segments = self.segments()
+            next_segment = max(segments[-1][0] + 1 if segments else 0, segment)
+            logger.info(
+                f'market state recovered in {(perf_counter() - start) * 1000:.1f}ms '
+                f'(snapshot {snapshot_time * 1000:.1f}ms with {len(state.accounts)} accounts, '
+                f'{replayed} writes replayed, {in_doubt} in doubt, {new} accounts from database)'
+            )
+        for c_id, rate in state.rates.items():
+            cross_rates.set_rate(c_id, rate)
+        leaderboards.columns = state.accounts
+        leaderboards.invalidate()
+        self.state = state
+        self.log = TransferLog(self.directory, state, segment=next_segment, lsn=lsn, fsync=self.fsync)
+        self.db.journal = self.log
+        return state
+
+    async def _replay(self, state: MarketState, segment: int)-> tuple[int, int, int]:
+        """apply committed writes of segments from `segment`, and return counts of them, in doubt ones and next lsn."""
+        pending: dict[int, Batch]= {}
+        replayed = 0
+        lsn = 0
+        for number, path in self.segments():
+            if number < segment:
+                continue
+            for kind, record_lsn, payload in read_log(path):
+                lsn = max(lsn, record_lsn + 1)
+                if kind == BEGIN:
+                    pending[record_lsn] = _decode_batch(payload)
+                elif kind == COMMIT and record_lsn in pending:
+                    state.apply(*pending.pop(record_lsn))
+                    replayed += 1
+                else:
+                    pending.pop(record_lsn, None)
+        for batch in pending.values():
+            if await self._committed(batch):
+                state.apply(*batch)
+                replayed += 1
+        return replayed, len(pending), lsn
+
+    async def _committed(self, batch: Batch)-> bool:
+        entries, accounts, rates = batch
+        if entries:
+            transfer_id, account_id, _ = entries[0]
+            stmt = select(ledger.c.transfer_id).where(ledger.c.transfer_id == transfer_id, ledger.c.account_id == account_id)
+        elif accounts:
+            stmt = select(account.c.id).where(account.c.id == accounts[0][0])
+        else:
+            # rates can not be told from others, so take them from database
+            result = await self.db.execute(
+                select(currency.c.c_id, currency.c.rate).where(currency.c.c_id.in_([c_id for c_id, _ in rates]))
+            )
+            rates[:] = [(c_id, Decimal(rate)) for c_id, rate in result]
+            return True
+        result = await self.db.execute(stmt)
+        return result.first() is not None
+
+    async def write(self)-> int:
+        """write snapshot and remove log before it, and return size of snapshot.
+        state is captured at once, so writes can go on while file is written.
+        """
+        start = perf_counter()
+        segment, parts = await self.log.rotate()
+        await asyncio.get_running_loop().run_in_executor(None, _write_snapshot, self.path, parts)
+        for number, path in self.segments():
+            if number < segment:
+                path.unlink()
+        size = sum(map(len, parts)) + _CRC.size
+        logger.info(f'wrote market snapshot of {size} bytes in {(perf_counter() - start) * 1000:.1f}ms')
+        return size
+
+    def close(self):
+        if self.db.journal is self.log:
+            self.db.journal = None
+        if self.state is not None and leaderboards.columns is self.state.accounts:
+            leaderboards.columns = None
+        if self.log is not None:
+            self.log.close()
+
+    async def _periodic_write(self):
+        try:
+            await self.write()
+        except Exception:
+            logger.exception('failed to write market snapshot')
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+from bisect import bisect_left
+from logging import getLogger
+from math import isfinite
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Optional
+
+from discord.ext import tasks
+
+if TYPE_CHECKING:
+    from .context import Context
+
+__all__ = ('Histogram', 'Metrics', 'MetricsServer')
+
+
+logger = getLogger(__name__)
+
+# 0.5ms to about 65s, doubling
+DEFAULT_BOUNDS = tuple(0.0005 * 2 ** i for i in range(18))
+
+
+class Histogram:
+    """counts of observed values in fixed buckets. observe is one bisect, so it can be left on.
+    quantiles are estimated by linear interpolation in bucket.
+    """
+
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'max')
+
+    def __init__(self, bounds: tuple[float, ...]= DEFAULT_BOUNDS):
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.bounds) + 1)  # last is over every bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def average(self)-> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def quantile(self, q: float)-> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                low = self.bounds[index - 1] if index else 0.0
+                high = self.bounds[index] if index < len(self.bounds) else self.max
+                return min(low + (high - low) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def __str__(self)-> str:
+        return (
+            f'{self.count} times, p50 {self.quantile(0.5) * 1000:.2f}ms, p95 {self.quantile(0.95) * 1000:.2f}ms, '
+            f'p99 {self.quantile(0.99) * 1000:.2f}ms, max {self.max * 1000:.2f}ms'
+        )
+
+
+class Metrics:
+    """runtime metrics of bot.
+    commands are timed from `before_invoke` to end of `Bot.invoke`, so writes of unit of work are included.
+    event loop lag is time until `asyncio.sleep(0)` returns, sampled by `sampler` every `lag_interval` seconds.
+    other values (gateway latency, pool, caches) are read from gauges only when they are shown.
+    Args:
+        lag_interval (float): seconds between samples of event loop lag.
+    """
+
+    def __init__(self, *, lag_interval: float= 1.0):
+        self.commands: dict[str, Histogram]= {}
+        self.errors: dict[str, int]= {}
+        self.loop_lag = Histogram(tuple(0.0001 * 2 ** i for i in range(18)))
+        self.gauges: dict[str, tuple[str, str, Callable[[], float]]]= {}  # name to help, type and func
+        self.sampler = tasks.loop(seconds=lag_interval)(self._sample)
+
+    def reset(self):
+        self.commands.clear()
+        self.errors.clear()
+        self.loop_lag.reset()
+
+    #for record
+
+    async def before_invoke(self, ctx: Context):
+        ctx.invoked_at = perf_counter()
+
+    def after_invoke(self, ctx: Context):
+        """record command of `ctx` if it has passed `before_invoke`."""
+        if ctx.invoked_at is None:
+            return
+        name = ctx.command.qualified_name
+        histogram = self.commands.get(name)
+        if histogram is None:
+            histogram = self.commands[name] = Histogram()
+        histogram.observe(perf_counter() - ctx.invoked_at)
+        if ctx.command_failed:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def gauge(self, name: str, help: str, func: Callable[[], float], type: str= 'gauge'):
+        """add value which is read by `func` when shown. `name` should be in prometheus style.
+        Args:
+            type (str): prometheus type. `counter` for monotonic values (`*_total`), `gauge` for others.
+        Raises:
+            ValueError: type is not `gauge` nor `counter`.
+        """
+        if type not in ('gauge', 'counter'):
+            raise ValueError(f'unknown type of metric {name}: {type}')
+        self.gauges[name] = (help, type, func)
+
+    def remove_gauge(self, name: str):
+        self.gauges.pop(name, None)
+
+    async def _sample(self):
+        start = perf_counter()
+        await asyncio.sleep(0)
+        self.loop_lag.observe(perf_counter() - start)
+
+    #for show
+
+    def read_gauges(self)-> dict[str, float]:
+        values = {}
+        for name, (_, _, func) in self.gauges.items():
+            try:
+                values[name] = float(func())
+            except Exception:
+                logger.debug(f'failed to read gauge {name}', exc_info=True)
+        return values
+
+    def slowest(self, limit: int= 10)-> list[tuple[str, Histogram]]:
+        """commands in order of p95 latency."""
+        return sorted(self.commands.items(), key=lambda item: item[1].quantile(0.95), reverse=True)[:limit]
+
+    def render_prometheus(self)-> str:
+        """every metric in prometheus text exposition format."""
+        lines = [
+            '# HELP command_latency_seconds latency of command from before_invoke to end of invoke.',
+            '# TYPE command_latency_seconds histogram',
+        ]
+        for name, histogram in sorted(self.commands.items()):
+            lines.extend(_histogram_lines('command_latency_seconds', histogram, f'command="{_escape(name)}"'))
+        lines.append('# HELP command_errors_total count of failed commands.')
+        lines.append('# TYPE command_errors_total counter')
+        for name, count in sorted(self.errors.items()):
+            lines.append(f'command_errors_total{{command="{_escape(name)}"}} {count}')
+        lines.append('# HELP event_loop_lag_seconds time until asyncio.sleep(0) returns.')
+        lines.append('# TYPE event_loop_lag_seconds histogram')
+        lines.extend(_histogram_lines('event_loop_lag_seconds', self.loop_lag, ''))
+        values = self.read_gauges()
+        for name, (help, type, _) in sorted(self.gauges.items()):
+            if name not in values or not isfinite(values[name]):
+                continue
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {type}')
+            lines.append(f'{name} {values[name]!r}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str)-> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str)-> list[str]:
+    prefix = f'{labels},' if labels else ''
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.bounds, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{prefix}le="{bound!r}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+    suffix = f'{{{labels}}}' if labels else ''
+    lines.append(f'{name}_sum{suffix} {histogram.sum!r}')
+    lines.append(f'{name}_count{suffix} {histogram.count}')
+    return lines
+
+
+class MetricsServer:
+    """plain http server which answers `Metrics.render_prometheus()` to any GET request.
+    it is for local scraping, so it binds to localhost by default.
+    """
+
+    def __init__(self, metrics: Metrics, port: int, host: str= '127.0.0.1'):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer]= None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f'metrics are served at http://{self.host}:{self.port}/metrics')
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 5.0)
+            if request.startswith(b'GET '):
+                status, body = '200 OK', self.metrics.render_prometheus().encode()
+            else:
+                status, body = '405 Method Not Allowed', b''
+            writer.write(
+                f'HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -6,23 +6,29 @@ https://github.com/Rapptz/discord.py
 """
 from __future__ import annotations
 
+import asyncio
 import datetime
-from collections.abc import Generator
-from typing import TYPE_CHECKING, Literal, TypeVar
+from collections import OrderedDict
+from collections.abc import Generator, Hashable, Iterator
+from time import monotonic
+from typing import TYPE_CHECKING, Generic, Literal, TypeVar
 
 if TYPE_CHECKING:
-    from typing import Optional, Union
+    from typing import Optional, TextIO, Union
 
 
 __all__ = (
     'YAML_DUMP_CONFIG',
     'split_line',
+    'iter_chunks',
     'get_unique_list',
     'maybe_int',
     'TimestampStyle',
     'format_dt',
     'docstring_updater',
     'utcnow',
+    'wait_through_cancel',
+    'TTLCache',
 )
 
 
@@ -34,23 +40,96 @@ YAML_DUMP_CONFIG = {
 
 
 T = TypeVar('T')
+K = TypeVar('K', bound=Hashable)
 
 
 def split_line(string: str, num: int)-> Generator[str]:
-    string, num = str(string), int(num)
-    if len(string) <= num:
-        yield string
-        return
-    str1, str2 = string[:num], string[num:]
-    str1_split = str1.splitlines(keepends=True)
-    if len(str1_split) > 1:
-        str1 = ''.join(str1_split[:-1])
-        str2 = str1_split[-1] + str2
-    yield str1
-    if len(str2) > num:
-        yield from split_line(str2, num)
+    """chunks of `string` which are at most `num` characters. it is `iter_chunks` without fences."""
+    return iter_chunks(str(string), int(num))
+
+
+FENCE = '```'
+
+
+def iter_chunks(
+        source: Union[str, TextIO],
+        limit: int= 2000,
+        *,
+        fences: bool= False,
+        read_size: int= 1 << 16
+)-> Iterator[str]:
+    """split `source` into chunks of at most `limit` characters, lazily and in one pass.
+    chunk ends at last line break in it, or is cut at `limit` if one line is longer than it.
+    `source` is str or file-like object, which is read by `read_size` characters.
+    default `limit` is max length of message content of discord. value of embed field is 1024.
+    Args:
+        fences (bool): if it is True, chunk which ends inside code block is closed with fence,
+            and next chunk opens it again with same language, so each chunk is shown as code.
+            fences take some of `limit`, so chunks are a bit shorter.
+            if fence line is longer than quarter of `limit`, it is opened again only with language or without it.
+    Raises:
+        ValueError: `fences` is True and `limit` is shorter than 16.
+    """
+    if fences and limit < 4 * (len(FENCE) + 1):
+        raise ValueError(f'limit {limit} is too short for fences')
+    if isinstance(source, str):
+        blocks: Iterator[str]= iter((source,))
     else:
-        yield str2
+        blocks = iter(lambda: source.read(read_size), '')
+    buffer, start = '', 0
+    opened: Optional[str]= None  # fence line of code block which is open at `start`
+    reserve = len(FENCE) + 1 if fences else 0
+    quarter = limit // 4
+    for block in blocks:
+        # only rest of last block (shorter than `limit`) is copied. str is never copied, since it is one block.
+        buffer = buffer[start:] + block if buffer else block
+        start = 0
+        while True:
+            head = _reopen(opened, quarter) if opened is not None else ''
+            size = limit - len(head) - reserve
+            if len(buffer) - start <= size:
+                break
+            end = start + size
+            cut = buffer.rfind('\n', start, end) + 1
+            if cut <= start:
+                cut = end
+            chunk = buffer[start:cut]
+            start = cut
+            if fences:
+                opened = _fence_after(chunk, opened)
+                chunk = head + chunk
+                if opened is not None:
+                    chunk += FENCE if chunk.endswith('\n') else f'\n{FENCE}'
+            yield chunk
+    if start < len(buffer) or not buffer:
+        chunk = buffer[start:]
+        yield _reopen(opened, quarter) + chunk if opened is not None else chunk
+
+
+def _reopen(opened: str, limit: int)-> str:
+    """head of chunk which opens code block of fence line `opened` again, with at most `limit` characters."""
+    for line in (opened, opened.split(maxsplit=1)[0]):
+        if len(line) < limit:
+            return f'{line}\n'
+    return f'{FENCE}\n'
+
+
+def _fence_after(chunk: str, opened: Optional[str])-> Optional[str]:
+    """fence line of code block which is open after `chunk`, if code block of `opened` is open before it."""
+    index = chunk.find(FENCE)
+    while index != -1:
+        line_start = chunk.rfind('\n', 0, index) + 1
+        line_end = chunk.find('\n', index)
+        if line_end == -1:
+            line_end = len(chunk)
+        if not chunk[line_start:index].strip():  # fence is at start of line
+            line = chunk[index:line_end].rstrip()
+            if opened is not None:
+                opened = None
+            elif line.count(FENCE) == 1:  # ```code``` in one line does not open
+                opened = line
+        index = chunk.find(FENCE, line_end)
+    return opened
 
 
 def get_unique_list(
@@ -148,3 +227,57 @@ def utcnow() -> datetime.datetime:
         The current aware datetime in UTC.
     """
     return datetime.datetime.now(datetime.timezone.utc)
+
+
+async def wait_through_cancel(future: asyncio.Future[T])-> T:
+    """wait `future` even if caller is cancelled, and raise `CancelledError` after it is done.
+    if `future` is failed, its error is raised instead, so caller knows whether it is done or not.
+    """
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        while not future.done():
+            try:
+                await asyncio.shield(future)
+            except asyncio.CancelledError:
+                pass
+        future.result()
+        raise
+
+
+class TTLCache(Generic[K, T]):
+    """bounded cache whose values expire `ttl` seconds after they are set.
+    least recently set value is dropped when it is full.
+    """
+
+    def __init__(self, max_size: int= 1024, ttl: float= 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, T]]= OrderedDict()
+
+    def __len__(self)-> int:
+        return len(self._data)
+
+    def get(self, key: K)-> Optional[T]:
+        item = self._data.get(key)
+        if item is None or item[0] < monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: K, value: T):
+        self._data[key] = (monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
@@ -2,13 +2,18 @@ from __future__ import annotations
 
 import datetime
 from enum import IntEnum
-from typing import Union, overload
+from typing import TYPE_CHECKING, Iterable, Optional, Union, overload
 
 from discord.colour import Colour
 from discord.embeds import Embed as Embed_
 from discord.embeds import EmbedProxy, EmptyEmbed, _EmptyEmbed
+from discord.http import Route
 
-__all__ = ('Embed', 'EmbedLimit')
+if TYPE_CHECKING:
+    from discord import File, Message
+    from discord.abc import Messageable
+
+__all__ = ('Embed', 'EmbedLimit', 'EmbedTemplate', 'EmbedPaginator')
 
 
 class EmbedLimit(IntEnum):
@@ -19,6 +24,8 @@ class EmbedLimit(IntEnum):
     field_value = 1024
     footer_text = 2048
     author_name = 256
+    total = 6000  # of every embed in one message
+    embeds = 10  # per message
 
 
 class Embed(Embed_):
@@ -65,6 +72,11 @@ class Embed(Embed_):
 
     @classmethod
     def from_dict(cls, data: dict)-> Embed:
+        cls._check(data)
+        return super().from_dict(data)
+
+    @staticmethod
+    def _check(data: dict):
         if len(data.get('title', '')) >= EmbedLimit.title:
             raise ValueError('title is too long')
 
@@ -92,10 +104,19 @@ class Embed(Embed_):
         ):
             raise ValueError('author name is too long')
 
-        return super().from_dict(data)
+    def validate(self)-> Embed:
+        """check every limit, for embed whose attributes are set directly.
+        Raises:
+            ValueError: some part is over limit.
+        """
+        self._check(self.to_dict())
+        return self
 
     def copy(self)-> Embed:
-        return Embed.from_dict(self.to_dict())
+        """copy without `to_dict()` nor checks. every value is checked when it is set by methods.
+        nested dicts are shared because methods replace them, except fields which `set_field_at` changes.
+        """
+        return _restore(self.__class__, _slot_values(self))
 
     def __len__(self)-> int:
         return super().__len__()
@@ -258,3 +279,163 @@ class Embed(Embed_):
 
     def to_dict(self)-> dict:
         return super().to_dict()
+
+
+_SLOTS = Embed.__slots__
+_MISSING = object()
+
+
+def _slot_values(embed: Embed)-> tuple[tuple[str, object], ...]:
+    """`(name, value)` of set slots. unset slot is costly to look up, so templates keep this."""
+    values = []
+    for name in _SLOTS:
+        value = getattr(embed, name, _MISSING)
+        if value is not _MISSING:
+            values.append((name, value))
+    return tuple(values)
+
+
+def _restore(cls: type[Embed], values: tuple[tuple[str, object], ...])-> Embed:
+    new = object.__new__(cls)
+    for name, value in values:
+        setattr(new, name, value)
+    fields = getattr(new, '_fields', None)
+    if fields is not None:
+        new._fields = [field.copy() for field in fields]
+    return new
+
+
+class EmbedTemplate:
+    """embed which is built and validated once. `build()` is fast copy of it with title and description.
+    Args:
+        embed (Embed): prototype. it must not be changed after this is made.
+        title_prefix (str): put before title given to `build()`.
+    Raises:
+        ValueError: `embed` is over some limit.
+    """
+
+    __slots__ = ('embed', 'title_prefix', '_values')
+
+    def __init__(self, embed: Embed, title_prefix: str= ''):
+        self.embed = embed.validate()
+        self.title_prefix = title_prefix
+        self._values = _slot_values(embed)
+
+    def build(
+        self,
+        title: Union[str, _EmptyEmbed]= EmptyEmbed,
+        description: Union[str, _EmptyEmbed]= EmptyEmbed,
+    )-> Embed:
+        """
+        Raises:
+            ValueError: title or description is too long.
+        """
+        embed = _restore(self.embed.__class__, self._values)
+        if title is not EmptyEmbed:
+            title = f'{self.title_prefix}{title!s}'
+            if len(title) >= EmbedLimit.title:
+                raise ValueError('title is too long')
+            embed.title = title
+        if description is not EmptyEmbed:
+            description = str(description)
+            if len(description) >= EmbedLimit.description:
+                raise ValueError('description is too long')
+            embed.description = description
+        return embed
+
+
+class EmbedPaginator:
+    """pack fields into as few embeds as possible, and embeds into as few messages as possible.
+    new page is started when next field is over field count or total size of embed.
+    each message has up to 10 pages whose total size is in limit of one message.
+    Args:
+        base (Union[Embed, EmbedTemplate]): every page is copy of this, with fields added.
+    Raises:
+        ValueError: `base` is too large to add any field.
+    """
+
+    def __init__(self, base: Union[Embed, EmbedTemplate]):
+        self.base = base if isinstance(base, EmbedTemplate) else EmbedTemplate(base)
+        self._base_size = len(self.base.embed)
+        self._base_fields = len(self.base.embed.fields)
+        if self._base_size >= EmbedLimit.total or self._base_fields >= EmbedLimit.fields:
+            raise ValueError('base embed is too large')
+        self.pages: list[Embed]= []
+        self._size = 0  # of last page
+
+    def __len__(self)-> int:
+        return len(self.pages)
+
+    def add_field(self, *, name: str, value: str, inline: bool= True)-> EmbedPaginator:
+        """
+        Raises:
+            ValueError: name or value is too long for one field.
+        """
+        name, value = str(name), str(value)
+        size = len(name) + len(value)
+        if (
+            not self.pages
+            or self._size + size > EmbedLimit.total
+            or len(self.pages[-1].fields) >= EmbedLimit.fields
+        ):
+            if self._base_size + size > EmbedLimit.total:
+                raise ValueError('field is too large')
+            self.pages.append(self.base.build())
+            self._size = self._base_size
+        self.pages[-1].add_field(name=name, value=value, inline=inline)
+        self._size += size
+        return self
+
+    def add_chunks(
+        self, name: str, chunks: Iterable[str], *, prefix: str= '', suffix: str= '', inline: bool= False
+    )-> EmbedPaginator:
+        """add each chunk as field named `name`, e.g. `prefix='```py\\n', suffix='```'` for code block."""
+        for chunk in chunks:
+            self.add_field(name=name, value=f'{prefix}{chunk}{suffix}', inline=inline)
+        return self
+
+    def messages(self)-> list[list[Embed]]:
+        """pages grouped by message."""
+        pages = self.pages or [self.base.build()]
+        messages: list[list[Embed]]= []
+        size = 0
+        for page in pages:
+            page_size = len(page)
+            if not messages or size + page_size > EmbedLimit.total or len(messages[-1]) >= EmbedLimit.embeds:
+                messages.append([])
+                size = 0
+            messages[-1].append(page)
+            size += page_size
+        return messages
+
+    async def send(
+        self,
+        destination: Messageable,
+        *,
+        reference: Optional[Message]= None,
+        files: Optional[list[File]]= None,
+    )-> list[Message]:
+        """send pages in `messages()`. `reference` is set to first message.
+        files are sent with first message if it has one page, otherwise in another message after pages.
+        """
+        channel = await destination._get_channel()
+        state = destination._state
+        sent: list[Message]= []
+        for embeds in self.messages():
+            if len(embeds) == 1:
+                kwargs = {} if files is None else {'files': files}
+                sent.append(await destination.send(embed=embeds[0], reference=reference, **kwargs))
+                files = None
+            else:  # send() of discord.py 1.7 takes only one embed
+                payload = {'embeds': [embed.to_dict() for embed in embeds]}
+                if reference is not None:
+                    payload['message_reference'] = reference.to_message_reference_dict()
+                if state.allowed_mentions is not None:
+                    payload['allowed_mentions'] = state.allowed_mentions.to_dict()
+                route = Route('POST', '/channels/{channel_id}/messages', channel_id=channel.id)
+                data = await state.http.request(route, json=payload)
+                sent.append(state.create_message(channel=channel, data=data))
+            reference = None
+        if files:
+            sent.append(await destination.send(files=files))
+        return sent
@@ -1,20 +1,78 @@
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
 
 from dotenv import load_dotenv
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 
-def setup_logger():
-    logging.getLogger('discord').setLevel(logging.WARNING)
-    logging.getLogger('sqlalchemy').setLevel(logging.WARNING)
-    logging.getLogger('cog').setLevel(logging.NOTSET)
-    logging.getLogger('lib').setLevel(logging.NOTSET)
-    logging.getLogger('bot').setLevel(logging.NOTSET)
-    log = logging.getLogger()
-    log.setLevel(logging.NOTSET)
+DEFAULT_LOG_LEVELS = 'discord=WARNING,sqlalchemy=WARNING'
+
+
+class JsonFormatter(logging.Formatter):
+    """one json object per line, with time, logger name, level, message and traceback."""
+
+    def format(self, record: logging.LogRecord)-> str:
+        data = {
+            'time': self.formatTime(record),
+            'name': record.name,
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class _QueueHandler(QueueHandler):
+    """`QueueHandler` which keeps message and traceback apart, so listener can format them as json too."""
+
+    def prepare(self, record: logging.LogRecord)-> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None  # traceback is not kept alive by queue
+        return record
+
+
+def parse_levels(value: str)-> dict[str, int]:
+    """levels of loggers from `name=LEVEL,name=LEVEL`. empty name is root logger."""
+    levels = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, _, level = item.rpartition('=')
+        number = logging.getLevelName(level.strip().upper())
+        if not isinstance(number, int):
+            raise ValueError(f'unknown level of logger {name.strip()!r}: {level}')
+        levels[name.strip()] = number
+    return levels
+
+
+def setup_logger()-> QueueListener:
+    """log records are put on queue, and written to file and stderr by thread of returned listener.
+    env:
+        LOG_LEVEL: level of root logger. default is INFO, so debug logs of `lib` and `cogs` are dropped at once.
+        LOG_LEVELS: levels of other loggers, like `lib=DEBUG,cogs.market=DEBUG`.
+        LOG_FORMAT: `text` (default) or `json` (one object per line) for file.
+    """
+    levels = parse_levels(f"{DEFAULT_LOG_LEVELS},{os.getenv('LOG_LEVEL', 'INFO')}")
+    levels.update(parse_levels(os.getenv('LOG_LEVELS', '')))
+    for name, level in levels.items():
+        logging.getLogger(name or None).setLevel(level)
+
     fh = RotatingFileHandler(
         filename='log/bot.log',
         encoding='utf-8',
@@ -25,10 +83,16 @@ def setup_logger():
     sh = logging.StreamHandler()
     sh.setLevel(logging.INFO)
     fmt = logging.Formatter('{asctime};{name};{levelname};{message}', style='{')
-    fh.setFormatter(fmt)
+    fh.setFormatter(JsonFormatter() if os.getenv('LOG_FORMAT', 'text') == 'json' else fmt)
     sh.setFormatter(fmt)
-    log.addHandler(fh)
-    log.addHandler(sh)
+
+    queue = SimpleQueue()
+    listener = QueueListener(queue, fh, sh, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # records left in queue are written at exit
+    log = logging.getLogger()
+    log.addHandler(_QueueHandler(queue))
+    return listener
 
 
 def main():